@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+"""
+BENCHMARK: Connection setup cost per check-in and per GPS fix
+Replays check-ins (notify_guardian: load the student, create the guardian's
+notification) and GPS fixes (save_bus_location: insert the fix, move the
+bus) through database_sync_to_async from concurrent asyncio tasks, the way
+the consumers run them, once with CONN_MAX_AGE=0 (a new connection for every
+call) and once with persistent connections and health checks. Prints
+connections opened, the time spent opening them and per-operation latency.
+Then sends guardian notification polls through Django's ASGI handler, where
+every request runs on its own thread, and prints connections opened per
+request and how many are still open once the requests have finished.
+
+Uses SQLite (benchmarks/bench.sqlite3) by default, with the SQLITE_PRAGMAS
+profile run on every connect; set DATABASE_URL to measure PostgreSQL.
+
+Usage: python benchmarks/bench_connections.py [--operations 2000] [--concurrency 16] [--requests 400]
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django
+
+django.setup()
+
+from channels.db import database_sync_to_async
+from channels.testing import HttpCommunicator
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.asgi import get_asgi_application
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from schooltransport.models import Bus, BusLocation, Notification, School, Student
+
+STUDENTS = 200
+BUSES = 20
+PERSISTENT_AGE = 600
+
+connect_ms = []
+
+
+def timed_connect(original):
+    """Wrap DatabaseWrapper.connect to time every new connection, pragmas included"""
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            connect_ms.append((time.perf_counter() - started) * 1000)
+    return connect
+
+
+def reset_database():
+    if connection.vendor == 'sqlite':
+        path = settings.DATABASES['default']['NAME']
+        connection.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        call_command('migrate', verbosity=0)
+    else:
+        call_command('migrate', verbosity=0)
+        call_command('flush', interactive=False, verbosity=0)
+
+    admin = User.objects.create(username='bench_admin')
+    school = School.objects.create(
+        admin=admin, name='Benchmark Academy', location='Nairobi', latitude=-1.2865,
+        longitude=36.8172, phone_number='+254700000000', email='bench@example.com',
+        registration_number='BENCH/1',
+    )
+    Bus.objects.bulk_create([Bus(school=school, registration_number=f'KBZ {i:03}') for i in range(BUSES)])
+    bus_ids = list(Bus.objects.values_list('id', flat=True))
+    User.objects.bulk_create([User(username=f'bench_user{i}') for i in range(2 * STUDENTS)])
+    users = list(User.objects.filter(username__startswith='bench_user').order_by('id'))
+    Student.objects.bulk_create([
+        Student(school=school, user=users[i], guardian=users[STUDENTS + i], bus_id=bus_ids[i % BUSES],
+                registration_number=f'ADM{i:04}', first_name='Student', last_name=str(i),
+                date_of_birth='2015-01-01', class_name='4')
+        for i in range(STUDENTS)
+    ])
+    connection.close()
+    return list(Student.objects.values_list('id', flat=True)), bus_ids
+
+
+@database_sync_to_async
+def check_in(student_id):
+    """What StudentCheckinConsumer.notify_guardian does for a boarding"""
+    student = Student.objects.select_related('guardian').get(id=student_id)
+    Notification.objects.create(recipient=student.guardian, student=student, notification_type='boarded',
+                                title='Student Transportation Alert', message='Boarded the bus')
+
+
+@database_sync_to_async
+def gps_fix(bus_id, latitude, longitude):
+    """What BusTrackingConsumer.save_bus_location does for a fix"""
+    BusLocation.objects.create(bus_id=bus_id, latitude=latitude, longitude=longitude, speed=30)
+    Bus.objects.filter(id=bus_id).update(current_latitude=latitude, current_longitude=longitude,
+                                         updated_at=timezone.now())
+
+
+async def replay(operations, concurrency, student_ids, bus_ids):
+    rng = random.Random(42)
+    timings = {'check-in': [], 'gps fix': []}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(kind):
+        async with semaphore:
+            started = time.perf_counter()
+            if kind == 'check-in':
+                await check_in(rng.choice(student_ids))
+            else:
+                await gps_fix(rng.choice(bus_ids), -1.2865 + rng.uniform(-0.05, 0.05), 36.8172)
+            timings[kind].append((time.perf_counter() - started) * 1000)
+
+    # Roughly the morning mix: one check-in for every four fixes
+    kinds = ['check-in' if i % 5 == 0 else 'gps fix' for i in range(operations)]
+    started = time.perf_counter()
+    await asyncio.gather(*(one(kind) for kind in kinds))
+    return timings, time.perf_counter() - started
+
+
+def run(label, max_age, operations, concurrency, student_ids, bus_ids):
+    settings.DATABASES['default']['CONN_MAX_AGE'] = max_age
+    settings.DATABASES['default']['CONN_HEALTH_CHECKS'] = bool(max_age)
+    connections.close_all()
+    connect_ms.clear()
+
+    timings, elapsed = asyncio.run(replay(operations, concurrency, student_ids, bus_ids))
+    connections.close_all()
+
+    print(f'\n[{label}] CONN_MAX_AGE={max_age}: {operations / elapsed:,.0f} ops/s')
+    print(f'  connections opened: {len(connect_ms):,} ({len(connect_ms) / operations:.2f} per op, '
+          f'{statistics.mean(connect_ms) if connect_ms else 0:.2f} ms each, {sum(connect_ms):,.0f} ms total)')
+    for kind, values in timings.items():
+        values.sort()
+        print(f'  {kind:<9} p50 {statistics.median(values):7.2f} ms   p95 {values[int(len(values) * 0.95) - 1]:7.2f} ms')
+
+
+def guardian_session():
+    """Session cookie of a logged-in guardian, for requests through the ASGI handler"""
+    guardian = Student.objects.select_related('guardian').first().guardian
+    session = SessionStore()
+    session[SESSION_KEY] = str(guardian.pk)
+    session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    session[HASH_SESSION_KEY] = guardian.get_session_auth_hash()
+    session.save()
+    connection.close()
+    return f'sessionid={session.session_key}'.encode()
+
+
+def open_connections():
+    """Database connections still open in the process, any thread"""
+    gc.collect()
+    return sum(1 for o in gc.get_objects() if isinstance(o, BaseDatabaseWrapper) and o.connection is not None)
+
+
+async def replay_http(requests, concurrency, cookie):
+    application = get_asgi_application()
+    timings = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            communicator = HttpCommunicator(application, 'GET', '/notifications/',
+                                            headers=[(b'host', b'localhost'), (b'cookie', cookie)])
+            response = await communicator.get_response(timeout=30)
+            assert response['status'] == 200, response['status']
+            timings.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return timings
+
+
+def run_http(max_age, requests, concurrency, cookie):
+    settings.DATABASES['default']['CONN_MAX_AGE'] = max_age
+    settings.DATABASES['default']['CONN_HEALTH_CHECKS'] = bool(max_age)
+    connections.close_all()
+    connect_ms.clear()
+
+    timings = sorted(asyncio.run(replay_http(requests, concurrency, cookie)))
+    print(f'\n[ASGI requests] CONN_MAX_AGE={max_age}: {len(connect_ms) / requests:.2f} connections per request, '
+          f'{open_connections()} still open afterwards')
+    print(f'  request   p50 {statistics.median(timings):7.2f} ms   p95 {timings[int(len(timings) * 0.95) - 1]:7.2f} ms')
+    connections.close_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--operations', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=400)
+    args = parser.parse_args()
+
+    settings.GEOFENCE_ON_FIX = settings.ETA_UPDATE_ON_FIX = settings.TRIP_SEGMENT_ON_FIX = False
+    wrapper = type(connections['default'])
+    wrapper.connect = timed_connect(wrapper.connect)
+
+    print('=' * 70)
+    print(f'BENCHMARK: connection reuse on {connection.vendor}, {args.operations:,} operations, '
+          f'{args.concurrency} concurrent')
+    print('=' * 70)
+
+    student_ids, bus_ids = reset_database()
+    run('per call', 0, args.operations, args.concurrency, student_ids, bus_ids)
+    run('persistent', PERSISTENT_AGE, args.operations, args.concurrency, student_ids, bus_ids)
+
+    cookie = guardian_session()
+    run_http(0, args.requests, args.concurrency, cookie)
+    run_http(PERSISTENT_AGE, args.requests, args.concurrency, cookie)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+BENCHMARK: NumPy geo kernels against per-row Python math
+Times distance, bearing, nearest-stop and route projection for a synthetic
+fleet around Nairobi, once with the scalar helpers in a Python loop and once
+with the array functions in schooltransport.geo, and checks both agree.
+
+Usage: python benchmarks/bench_geo.py [--buses 2000] [--stops 30] [--repeat 20]
+"""
+
+import argparse
+import math
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schooltransport.geo import (
+    EARTH_RADIUS_M, bearing_array, bearing_deg, haversine_array, haversine_m, nearest_points, project_onto_polylines,
+)
+
+CENTRE = (-1.2865, 36.8172)
+
+
+def make_fleet(buses, stops, seed=42):
+    """One fix per bus near its own random-walk route of `stops` vertices"""
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 0.004, (buses, stops, 2))
+    routes = np.asarray(CENTRE) + rng.uniform(-0.1, 0.1, (buses, 1, 2)) + steps.cumsum(axis=1)
+    fixes = routes[np.arange(buses), rng.integers(0, stops, buses)] + rng.normal(0, 0.0005, (buses, 2))
+    return fixes, routes
+
+
+def python_projection(fix, vertices):
+    """Reference loop: the same planar projection, one segment at a time"""
+    lat0, lng0 = math.radians(fix[0]), math.radians(fix[1])
+    scale = math.cos(lat0) * EARTH_RADIUS_M
+    best = None
+    for (a_lat, a_lng), (b_lat, b_lng) in zip(vertices, vertices[1:]):
+        ax, ay = (math.radians(a_lng) - lng0) * scale, (math.radians(a_lat) - lat0) * EARTH_RADIUS_M
+        bx, by = (math.radians(b_lng) - lng0) * scale, (math.radians(b_lat) - lat0) * EARTH_RADIUS_M
+        dx, dy = bx - ax, by - ay
+        length_sq = dx * dx + dy * dy
+        t = min(1.0, max(0.0, -(ax * dx + ay * dy) / length_sq)) if length_sq else 0.0
+        d = math.hypot(ax + t * dx, ay + t * dy)
+        if best is None or d < best:
+            best = d
+    return best
+
+
+def build_cases(fixes, routes):
+    first_stops = routes[:, 0]
+    all_stops = routes.reshape(-1, 2)
+    lat, lng = fixes[:, 0], fixes[:, 1]
+    polylines = [route.tolist() for route in routes]
+    fix_list, stop_list = fixes.tolist(), first_stops.tolist()
+    all_list = all_stops.tolist()
+
+    return [
+        ('haversine', lambda: [haversine_m(a, b, c, d) for (a, b), (c, d) in zip(fix_list, stop_list)],
+         lambda: haversine_array(lat, lng, first_stops[:, 0], first_stops[:, 1])),
+        ('bearing', lambda: [bearing_deg(a, b, c, d) for (a, b), (c, d) in zip(fix_list, stop_list)],
+         lambda: bearing_array(lat, lng, first_stops[:, 0], first_stops[:, 1])),
+        ('nearest stop', lambda: [min(range(len(all_list)), key=lambda i: haversine_m(f[0], f[1], *all_list[i]))
+                                  for f in fix_list[:50]],
+         lambda: nearest_points(lat[:50], lng[:50], all_stops[:, 0], all_stops[:, 1])[0]),
+        ('polyline projection', lambda: [python_projection(f, p) for f, p in zip(fix_list, polylines)],
+         lambda: project_onto_polylines(fixes, polylines)[2]),
+    ]
+
+
+def timed(func, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--buses', type=int, default=2000)
+    parser.add_argument('--stops', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    fixes, routes = make_fleet(args.buses, args.stops)
+
+    print('=' * 70)
+    print(f'BENCHMARK: geo kernels, {args.buses:,} buses x {args.stops} stops')
+    print('=' * 70)
+    print(f'{"kernel":<22}{"python":>12}{"numpy":>12}{"speedup":>10}{"max diff":>14}')
+
+    for name, python_func, numpy_func in build_cases(fixes, routes):
+        # The loops are slow; time them fewer times
+        python_ms, expected = timed(python_func, max(1, args.repeat // 10))
+        numpy_ms, actual = timed(numpy_func, args.repeat)
+        diff = float(np.max(np.abs(np.asarray(expected, float) - np.asarray(actual, float))))
+        print(f'{name:<22}{python_ms:>10.2f}ms{numpy_ms:>10.2f}ms{python_ms / numpy_ms:>9.1f}x{diff:>14.3g}')
+
+    print('\nnearest stop compares 50 buses against every stop in the fleet.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+BENCHMARK: Startup import time and memory with lazy heavy dependencies
+Starts fresh interpreters that set up Django and import the URLconf,
+consumers and biometric module, once with the defaults (NumPy, PIL, OpenCV,
+scikit-image, Twilio and Firebase load on first use, see
+schooltransport/lazy.py) and once with PRELOAD_MODULES loading them all at
+startup, as the module-level imports used to. Reports wall time, peak RSS,
+the -X importtime total and which heavy modules were loaded, and by whom.
+The lazy run also times the first biometric/array call, where the deferred
+import cost lands.
+
+Usage: python benchmarks/bench_imports.py [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['numpy', 'PIL.Image', 'cv2', 'skimage', 'requests', 'twilio', 'firebase_admin']
+
+CHILD = '''
+import json, os, resource, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+import django
+django.setup()
+import schooltransport.urls, schooltransport.consumers, schooltransport.biometric
+startup = time.perf_counter() - started
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+sys.stderr.write({marker!r} + '\\n')
+loaded = [name for name in {heavy!r} if name in sys.modules]
+
+from schooltransport import biometric, geo
+started = time.perf_counter()
+biometric.np.zeros(1)
+biometric.Image.new('L', (1, 1))
+geo.haversine_array(0.0, 0.0, 1.0, 1.0)
+first_use = time.perf_counter() - started
+print(json.dumps({{'startup': startup, 'rss_kb': rss, 'loaded': loaded, 'first_use': first_use,
+                  'rss_after_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+'''
+
+STARTUP_DONE = '-- startup done --'
+IMPORTTIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run_child(preload):
+    env = dict(os.environ, PRELOAD_MODULES=preload)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD.format(root=ROOT, heavy=HEAVY_MODULES, marker=STARTUP_DONE)],
+        env=env, capture_output=True, text=True, cwd=ROOT, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] imported before startup finished, children first"""
+    rows = []
+    for line in stderr.splitlines():
+        if line == STARTUP_DONE:
+            break
+        match = IMPORTTIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def importer_of(rows, module):
+    """The module whose import pulled `module` in: the next row at a shallower depth"""
+    for index, (name, _, cumulative_us, depth) in enumerate(rows):
+        if name == module:
+            for parent, _, _, parent_depth in rows[index + 1:]:
+                if parent_depth < depth:
+                    return cumulative_us, parent
+            return cumulative_us, '(top level)'
+    return None, None
+
+
+def report(label, preload, repeat):
+    runs = [run_child(preload) for _ in range(repeat)]
+    results = [result for result, _ in runs]
+    rows = runs[-1][1]
+    import_ms = statistics.median(sum(self_us for _, self_us, _, _ in run_rows) / 1000 for _, run_rows in runs)
+
+    print(f'\n[{label}] PRELOAD_MODULES={preload or "(unset)"}')
+    print(f'  startup        {statistics.median(r["startup"] for r in results) * 1000:8.0f} ms (median of {repeat})')
+    print(f'  importtime sum {import_ms:8.0f} ms over {len(rows)} modules')
+    print(f'  peak RSS       {statistics.median(r["rss_kb"] for r in results) / 1024:8.1f} MB at startup, '
+          f'{statistics.median(r["rss_after_kb"] for r in results) / 1024:.1f} MB after first use')
+    print(f'  first use      {statistics.median(r["first_use"] for r in results) * 1000:8.1f} ms '
+          f'(biometric NumPy/PIL call plus a geo array call)')
+    print(f'  heavy modules loaded at startup: {", ".join(results[-1]["loaded"]) or "none"}')
+    for module in results[-1]['loaded']:
+        cumulative_us, parent = importer_of(rows, module)
+        if cumulative_us is not None:
+            print(f'    {module:<15} {cumulative_us / 1000:7.1f} ms  imported by {parent}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('=' * 70)
+    print(f'BENCHMARK: startup imports, {args.repeat} fresh interpreters per mode')
+    print('=' * 70)
+
+    report('lazy', '', args.repeat)
+    report('preloaded', 'biometric,geo,notifications', args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+"""
+BENCHMARK: Composite indexes for hot StudentAttendance, Notification and Message lookups
+Seeds a scratch database (1M rows per table by default), then runs the
+queries behind student_status, get_notifications and get_messages without
+and with the indexes declared on those models (migration 0005: a composite
+attendance index, a partial index on unread notifications and a conversation
+index keyed by id to match get_messages' cursor paging), printing EXPLAIN
+QUERY PLAN output and latencies for both. The schema is fully migrated; the
+indexes are dropped for the first run and created again for the second.
+
+Usage: python benchmarks/bench_indexes.py [--rows 1000000] [--repeat 200]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, time as dtime, timedelta, timezone as dt_timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Q
+
+from schooltransport.models import Bus, Message, Notification, School, Student, StudentAttendance
+
+INDEXED_MODELS = (StudentAttendance, Notification, Message)
+CHUNK = 50_000
+
+STUDENTS = 2000
+BUSES = 50
+GUARDIANS = 1500
+
+
+def reset_database():
+    path = settings.DATABASES['default']['NAME']
+    connection.close()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    call_command('migrate', verbosity=0)
+    set_indexes(create=False)
+
+
+def set_indexes(create):
+    """Drop or create the composite indexes of the benchmarked models"""
+    with connection.schema_editor() as editor:
+        for model in INDEXED_MODELS:
+            for index in model._meta.indexes:
+                if create:
+                    editor.add_index(model, index)
+                else:
+                    editor.remove_index(model, index)
+
+
+def insert_rows(table, columns, rows):
+    sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join(["%s"] * len(columns))})'
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), CHUNK):
+            with transaction.atomic():
+                cursor.executemany(sql, rows[start:start + CHUNK])
+
+
+def to_db(value):
+    return connection.ops.adapt_datetimefield_value(value)
+
+
+def seed(rows):
+    """Create the fleet and `rows` attendance, notification and message rows"""
+    rng = random.Random(42)
+    admin = User.objects.create(username='bench_admin')
+    school = School.objects.create(
+        admin=admin, name='Benchmark Academy', location='Nairobi', latitude=-1.2865,
+        longitude=36.8172, phone_number='+254700000000', email='bench@example.com',
+        registration_number='BENCH/1',
+    )
+
+    User.objects.bulk_create(
+        [User(username=f'bench_guardian{i}') for i in range(GUARDIANS)]
+        + [User(username=f'bench_attendant{i}') for i in range(BUSES)]
+        + [User(username=f'bench_student{i}') for i in range(STUDENTS)],
+        batch_size=1000,
+    )
+    guardians = list(User.objects.filter(username__startswith='bench_guardian').values_list('id', flat=True))
+    attendants = list(User.objects.filter(username__startswith='bench_attendant').values_list('id', flat=True))
+    student_users = list(User.objects.filter(username__startswith='bench_student').values_list('id', flat=True))
+
+    Bus.objects.bulk_create([
+        Bus(school=school, registration_number=f'KBN {i:03d}B', attendant_id=attendants[i])
+        for i in range(BUSES)
+    ])
+    buses = list(Bus.objects.values_list('id', flat=True))
+
+    Student.objects.bulk_create([
+        Student(
+            school=school, user_id=user_id, guardian_id=guardians[i % GUARDIANS],
+            bus_id=buses[i % BUSES], registration_number=f'BENCH/{i}',
+            date_of_birth=date(2014, 1, 1), class_name='Grade 5', parent_phone='+254700000001',
+        )
+        for i, user_id in enumerate(student_users)
+    ], batch_size=1000)
+    students = list(Student.objects.values_list('id', 'bus_id', 'guardian_id'))
+
+    today = date.today()
+    days = max(rows // (2 * len(students)), 1)
+
+    started = time.perf_counter()
+    attendance = []
+    for day in range(days):
+        current = today - timedelta(days=day)
+        morning = datetime.combine(current, dtime(6, 30), tzinfo=dt_timezone.utc)
+        for student_id, bus_id, _ in students:
+            boarded = morning + timedelta(seconds=rng.randint(0, 3600))
+            alighted = boarded + timedelta(minutes=rng.randint(20, 60))
+            attendance.append((student_id, bus_id, 'boarded', True, 95.0, to_db(boarded), str(current)))
+            attendance.append((student_id, bus_id, 'alighted', True, 95.0, to_db(alighted), str(current)))
+    insert_rows('student_attendance',
+                ['student_id', 'bus_id', 'status', 'biometric_verified', 'biometric_confidence', 'timestamp', 'date'],
+                attendance[:rows])
+
+    now = datetime.now(dt_timezone.utc)
+    notifications = []
+    for i in range(rows):
+        student_id, bus_id, guardian_id = students[i % len(students)]
+        created = to_db(now - timedelta(minutes=i))
+        notifications.append((guardian_id, 'boarded', 'Student Transportation Alert', 'Boarded the bus',
+                              student_id, bus_id, rng.random() < 0.02, created, created))
+    insert_rows('notifications',
+                ['recipient_id', 'notification_type', 'title', 'message', 'student_id', 'bus_id',
+                 'is_read', 'created_at', 'updated_at'],
+                notifications)
+
+    messages = []
+    for i in range(rows):
+        _, bus_id, guardian_id = students[i % len(students)]
+        attendant_id = attendants[buses.index(bus_id)]
+        sender, recipient = (guardian_id, attendant_id) if i % 2 else (attendant_id, guardian_id)
+        messages.append((sender, recipient, bus_id, 'On our way', to_db(now - timedelta(seconds=i * 7)), True))
+    insert_rows('messages',
+                ['sender_id', 'recipient_id', 'bus_id', 'message_text', 'timestamp', 'is_read'],
+                messages)
+
+    print(f'Seeded {len(attendance[:rows]):,} attendance, {rows:,} notification and '
+          f'{rows:,} message rows in {time.perf_counter() - started:.1f}s')
+    return students, attendants, buses
+
+
+def build_queries(students, attendants, buses, today):
+    """Querysets issued by the three views, with randomly chosen keys"""
+    rng = random.Random(7)
+
+    def student_status():
+        student_id, bus_id, _ = rng.choice(students)
+        return StudentAttendance.objects.filter(
+            student_id=student_id, bus_id=bus_id, date=today
+        ).order_by('-timestamp')[:1]
+
+    def get_notifications():
+        _, _, guardian_id = rng.choice(students)
+        return Notification.objects.filter(
+            recipient_id=guardian_id, is_read=False
+        ).order_by('-created_at')[:10]
+
+    def get_messages():
+        _, bus_id, guardian_id = rng.choice(students)
+        attendant_id = attendants[buses.index(bus_id)]
+        # Latest page, as get_messages fetches it without a cursor
+        return Message.objects.filter(
+            Q(sender_id=guardian_id, recipient_id=attendant_id) |
+            Q(sender_id=attendant_id, recipient_id=guardian_id)
+        ).order_by('-id')[:settings.MESSAGES_PAGE_SIZE + 1]
+
+    return {
+        'student_status': student_status,
+        'get_notifications': get_notifications,
+        'get_messages': get_messages,
+    }
+
+
+def measure(queries, repeat):
+    results = {}
+    for name, make_query in queries.items():
+        print(f'\n  {name} plan:')
+        for line in make_query().explain().splitlines():
+            print(f'    {line}')
+
+        timings = []
+        for _ in range(repeat):
+            queryset = make_query()
+            started = time.perf_counter()
+            list(queryset)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results[name] = (statistics.median(timings), timings[int(len(timings) * 0.95) - 1])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Rows per table')
+    parser.add_argument('--repeat', type=int, default=200, help='Executions per query')
+    args = parser.parse_args()
+
+    print('=' * 70)
+    print('BENCHMARK: hot path composite indexes')
+    print('=' * 70)
+
+    reset_database()
+    students, attendants, buses = seed(args.rows)
+    queries = build_queries(students, attendants, buses, date.today())
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    print('\n[BEFORE] without composite indexes')
+    before = measure(queries, args.repeat)
+
+    started = time.perf_counter()
+    set_indexes(create=True)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    names = ', '.join(index.name for model in INDEXED_MODELS for index in model._meta.indexes)
+    print(f'\n[AFTER] {names} created in {time.perf_counter() - started:.1f}s')
+    after = measure(queries, args.repeat)
+
+    print('\n' + '-' * 70)
+    print(f'{"query":<20}{"before p50":>12}{"before p95":>12}{"after p50":>12}{"after p95":>12}{"speedup":>10}')
+    for name in queries:
+        b50, b95 = before[name]
+        a50, a95 = after[name]
+        print(f'{name:<20}{b50:>10.2f}ms{b95:>10.2f}ms{a50:>10.2f}ms{a95:>10.2f}ms{b50 / a50:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,580 @@
+#!/usr/bin/env python
+"""
+BENCHMARK: Morning-rush load against a local Daphne
+Simulates a fleet end to end over real sockets:
+  - every bus streams GPS fixes over ws/bus/<id>/tracking/ (or POSTs them to
+    /driver/location/update/ with --gps-transport http),
+  - attendants' scanners POST check-ins to /attendance/checkin/ at a fixed
+    fleet-wide rate,
+  - guardians either hold WebSockets (ws/notifications/ and their child's
+    ws/bus/<id>/tracking/) or poll the student status page, notifications
+    and ETA endpoints with If-None-Match, split by --ws-share.
+
+Requests are scheduled open loop: latency is measured from the time a request
+was due, so a server that falls behind shows up in the percentiles instead of
+silently lowering the offered load. GPS fan-out latency is the time from a
+bus sending a fix to a guardian's tracking socket receiving it.
+
+The fleet (users prefixed load_, sessions for every guardian) is written to
+the benchmarks.settings database, and a Daphne process is started on it
+unless --url names a server already running with those settings:
+  DJANGO_SETTINGS_MODULE=benchmarks.settings daphne -p 8001 schooltransport.asgi:application
+Only the Python standard library is used on the client side; nothing outside
+the machine is contacted.
+
+Usage: python benchmarks/bench_load.py [--buses 50] [--students-per-bus 20] [--guardians 200]
+       [--ws-share 0.5] [--gps-interval 5] [--scan-rate 10] [--poll-interval 10]
+       [--duration 60] [--ramp 10] [--gps-transport ws|http] [--url http://127.0.0.1:8001] [--json FILE]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from schooltransport.models import Bus, School, Student, UserProfile
+
+PREFIX = 'load_'
+CENTRE = (-1.2865, 36.8172)
+FIX_STEP_DEG = 0.0004  # ~45 m between fixes, about 30 km/h at 5 s intervals
+
+
+# ==================== FLEET ====================
+
+def prepare_fleet(buses, students_per_bus):
+    """
+    Create the load_ fleet (school, buses with drivers, students with one
+    guardian each) unless one of the same size exists. Returns the bus ids
+    and (guardian id, student id, bus id) triples.
+    """
+    call_command('migrate', verbosity=0)
+    school = School.objects.filter(registration_number=f'{PREFIX}SCHOOL').first()
+    if school is None or (school.buses.count(), school.students.count()) != (buses, buses * students_per_bus):
+        User.objects.filter(username__startswith=PREFIX).delete()
+        school = create_fleet(buses, students_per_bus)
+
+    bus_ids = list(school.buses.order_by('id').values_list('id', flat=True))
+    guardians = list(school.students.order_by('id').values_list('guardian_id', 'id', 'bus_id'))
+    return bus_ids, guardians
+
+
+def create_fleet(buses, students_per_bus):
+    students = buses * students_per_bus
+    admin = User.objects.create(username=f'{PREFIX}admin')
+    school = School.objects.create(
+        admin=admin, name='Load Test Academy', location='Nairobi', latitude=CENTRE[0], longitude=CENTRE[1],
+        phone_number='+254700000000', email='load@example.com', registration_number=f'{PREFIX}SCHOOL',
+    )
+
+    roles = [('driver', buses), ('student', students), ('guardian', students)]
+    User.objects.bulk_create([
+        User(username=f'{PREFIX}{role}{i}', first_name=role.title(), last_name=str(i),
+             email=f'{PREFIX}{role}{i}@example.com')
+        for role, n in roles for i in range(n)
+    ], batch_size=500)
+    users = {role: list(User.objects.filter(username__startswith=f'{PREFIX}{role}').order_by('id'))
+             for role, _ in roles}
+    UserProfile.objects.bulk_create([
+        UserProfile(user=user, user_type=role, phone_number=f'+2547{user.id:08d}')
+        for role, _ in roles for user in users[role]
+    ] + [UserProfile(user=admin, user_type='admin')], batch_size=500)
+
+    Bus.objects.bulk_create([
+        Bus(school=school, registration_number=f'{PREFIX}KBL {i:03d}', driver=users['driver'][i], status='on_route')
+        for i in range(buses)
+    ])
+    bus_ids = list(school.buses.order_by('id').values_list('id', flat=True))
+    Student.objects.bulk_create([
+        Student(school=school, user=users['student'][i], guardian=users['guardian'][i],
+                bus_id=bus_ids[i % buses], registration_number=f'{PREFIX}ADM{i:05d}',
+                first_name='Student', last_name=str(i), date_of_birth='2015-01-01', class_name='4',
+                biometric_enrolled=True, parent_phone='+254700000001')
+        for i in range(students)
+    ], batch_size=500)
+    return school
+
+
+def create_sessions(user_ids):
+    """A logged-in session per user, written directly (no password hashing); returns {user id: session key}"""
+    users = User.objects.filter(id__in=user_ids)
+    expire = timezone.now() + timedelta(seconds=settings.SESSION_COOKIE_AGE)
+    store = SessionStore()
+    sessions = {}
+    rows = []
+    for user in users:
+        key = get_random_string(32)
+        sessions[user.id] = key
+        rows.append(Session(session_key=key, expire_date=expire, session_data=store.encode({
+            SESSION_KEY: str(user.id),
+            BACKEND_SESSION_KEY: 'django.contrib.auth.backends.ModelBackend',
+            HASH_SESSION_KEY: user.get_session_auth_hash(),
+        })))
+    Session.objects.bulk_create(rows, batch_size=500)
+    return sessions
+
+
+# ==================== CLIENTS ====================
+
+class HttpClient:
+    """Minimal HTTP/1.1 keep-alive client over asyncio streams"""
+
+    def __init__(self, host, port, cookie=None):
+        self.host, self.port, self.cookie = host, port, cookie
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        for attempt in (1, 2):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                return await self._exchange(method, path, body, headers or {})
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if attempt == 2:
+                    raise
+
+    async def _exchange(self, method, path, body, headers):
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Connection: keep-alive']
+        if self.cookie:
+            lines.append(f'Cookie: {self.cookie}')
+        if body is not None:
+            body = json.dumps(body).encode()
+            lines += ['Content-Type: application/json', f'Content-Length: {len(body)}']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + (body or b''))
+        await self.writer.drain()
+
+        status = int((await self.reader.readuntil(b'\r\n')).split()[1])
+        response_headers = {}
+        while (line := await self.reader.readuntil(b'\r\n')) != b'\r\n':
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding') == 'chunked':
+            content = b''
+            while size := int((await self.reader.readuntil(b'\r\n')).strip(), 16):
+                content += (await self.reader.readexactly(size + 2))[:-2]
+            await self.reader.readuntil(b'\r\n')
+        elif 'content-length' in response_headers:
+            content = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            content = b'' if status in (204, 304) else await self.reader.read()
+        if response_headers.get('connection') == 'close':
+            await self.close()
+        return status, response_headers, content
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+class WebSocketClosed(Exception):
+    pass
+
+
+class WebSocket:
+    """Minimal RFC 6455 client: masked text frames out, text/ping/close in"""
+
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, writer
+
+    @classmethod
+    async def connect(cls, host, port, path, cookie=None):
+        reader, writer = await asyncio.open_connection(host, port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        lines = [f'GET {path} HTTP/1.1', f'Host: {host}:{port}', 'Upgrade: websocket', 'Connection: Upgrade',
+                 f'Sec-WebSocket-Key: {key}', 'Sec-WebSocket-Version: 13', f'Origin: http://{host}:{port}']
+        if cookie:
+            lines.append(f'Cookie: {cookie}')
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+        await writer.drain()
+        head = await reader.readuntil(b'\r\n\r\n')
+        if b' 101 ' not in head.split(b'\r\n', 1)[0]:
+            writer.close()
+            raise WebSocketClosed(head.split(b'\r\n', 1)[0].decode())
+        return cls(reader, writer)
+
+    async def _send_frame(self, opcode, payload):
+        header = bytes([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header += bytes([0x80 | length])
+        elif length < 1 << 16:
+            header += bytes([0x80 | 126]) + struct.pack('!H', length)
+        else:
+            header += bytes([0x80 | 127]) + struct.pack('!Q', length)
+        mask = os.urandom(4)
+        masked = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+        self.writer.write(header + mask + masked)
+        await self.writer.drain()
+
+    async def send(self, text):
+        await self._send_frame(0x1, text.encode())
+
+    async def recv(self):
+        """The next text message; raises WebSocketClosed when the server closes"""
+        message = b''
+        while True:
+            first, second = await self.reader.readexactly(2)
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack('!H', await self.reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack('!Q', await self.reader.readexactly(8))[0]
+            payload = await self.reader.readexactly(length)
+            opcode = first & 0x0F
+            if opcode == 0x8:
+                raise WebSocketClosed('closed by server')
+            if opcode == 0x9:
+                await self._send_frame(0xA, payload)
+            elif opcode in (0x0, 0x1):
+                message += payload
+                if first & 0x80:
+                    return message.decode()
+
+    async def close(self):
+        try:
+            await self._send_frame(0x8, struct.pack('!H', 1000))
+        except ConnectionError:
+            pass
+        self.writer.close()
+
+
+# ==================== RESULTS ====================
+
+class Results:
+    """Latencies (ms) and errors per operation, plus counters"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.statuses = defaultdict(Counter)
+        self.counters = Counter()
+
+    def record(self, operation, started, status=None, ok=True):
+        self.latencies[operation].append((time.perf_counter() - started) * 1000)
+        if status is not None:
+            self.statuses[operation][status] += 1
+        if not ok:
+            self.errors[operation] += 1
+
+    def summary(self, elapsed):
+        rows = {}
+        for operation, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            rows[operation] = {
+                'count': len(values),
+                'errors': self.errors[operation],
+                'per_second': len(values) / elapsed,
+                'p50_ms': percentile(values, 50),
+                'p95_ms': percentile(values, 95),
+                'p99_ms': percentile(values, 99),
+                'max_ms': values[-1],
+                'statuses': dict(self.statuses[operation]),
+            }
+        return rows
+
+
+def percentile(sorted_values, pct):
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+# ==================== VIRTUAL USERS ====================
+
+class LoadTest:
+
+    def __init__(self, args, host, port, bus_ids, guardians, sessions):
+        self.args, self.host, self.port = args, host, port
+        self.bus_ids, self.guardians, self.sessions = bus_ids, guardians, sessions
+        self.results = Results()
+        self.rng = random.Random(42)
+        self.stop_at = None
+        self.sockets = []
+        self.listeners = []
+
+    def cookie(self, user_id):
+        return f'{settings.SESSION_COOKIE_NAME}={self.sessions[user_id]}'
+
+    def running(self):
+        return time.perf_counter() < self.stop_at
+
+    async def every(self, interval, action, offset):
+        """Open-loop schedule: call action(due) every interval seconds, starting after offset"""
+        due = time.perf_counter() + offset
+        while due < self.stop_at:
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            await action(due)
+            due += interval
+
+    async def open_socket(self, path, cookie=None):
+        started = time.perf_counter()
+        try:
+            ws = await WebSocket.connect(self.host, self.port, path, cookie)
+        except (OSError, WebSocketClosed, asyncio.IncompleteReadError):
+            self.results.record('ws connect', started, ok=False)
+            return None
+        self.results.record('ws connect', started)
+        self.sockets.append(ws)
+        return ws
+
+    async def listen(self, ws, kind):
+        """Drain a socket, recording GPS fan-out latency and message counts"""
+        try:
+            while True:
+                message = json.loads(await ws.recv())
+                self.results.counters[f'{kind} {message.get("type")} received'] += 1
+                sent_at = message.get('timestamp')
+                if kind == 'guardian' and message.get('type') == 'location_update' and isinstance(sent_at, float):
+                    self.results.latencies['gps fan-out'].append((time.time() - sent_at) * 1000)
+        except (WebSocketClosed, asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    async def bus(self, bus_id, offset):
+        latitude, longitude = CENTRE[0] + self.rng.uniform(-0.05, 0.05), CENTRE[1] + self.rng.uniform(-0.05, 0.05)
+        heading = self.rng.uniform(0, 360)
+        http = HttpClient(self.host, self.port)
+        ws = None
+        if self.args.gps_transport == 'ws':
+            await asyncio.sleep(offset)
+            ws = await self.open_socket(f'/ws/bus/{bus_id}/tracking/')
+            if ws is None:
+                return
+            self.listeners.append(asyncio.create_task(self.listen(ws, 'driver')))
+
+        async def send_fix(due):
+            nonlocal latitude, longitude, heading
+            heading = (heading + self.rng.uniform(-20, 20)) % 360
+            latitude += FIX_STEP_DEG * self.rng.uniform(0.5, 1.5) * (1 if heading < 180 else -1)
+            longitude += FIX_STEP_DEG * self.rng.uniform(-1, 1)
+            fix = {'latitude': latitude, 'longitude': longitude, 'speed': self.rng.uniform(10, 50),
+                   'heading': heading, 'accuracy': 5.0}
+            try:
+                if ws is not None:
+                    await ws.send(json.dumps({'type': 'location_update', 'timestamp': time.time(), **fix}))
+                    self.results.record('gps fix (ws send)', due)
+                else:
+                    status, _, _ = await http.request('POST', '/driver/location/update/', {'bus_id': bus_id, **fix})
+                    self.results.record('gps fix (http)', due, status, ok=status == 200)
+            except (OSError, asyncio.IncompleteReadError):
+                self.results.record('gps fix (ws send)' if ws else 'gps fix (http)', due, ok=False)
+
+        await self.every(self.args.gps_interval, send_fix, 0 if ws else offset)
+        await http.close()
+
+    async def scanners(self):
+        """Fleet-wide check-ins at --scan-rate per second over a small pool of scanner connections"""
+        if not self.args.scan_rate:
+            return
+        pool = asyncio.Queue()
+        for _ in range(self.args.scanner_connections):
+            pool.put_nowait(HttpClient(self.host, self.port))
+        pending = set()
+
+        async def scan(due, bus_id):
+            client = await pool.get()
+            try:
+                status, _, _ = await client.request('POST', '/attendance/checkin/', {
+                    'student_biometric': 'load-test', 'bus_id': bus_id,
+                    'location_latitude': CENTRE[0], 'location_longitude': CENTRE[1],
+                })
+                self.results.record('scan check-in', due, status, ok=status == 200)
+            except (OSError, asyncio.IncompleteReadError):
+                self.results.record('scan check-in', due, ok=False)
+            finally:
+                pool.put_nowait(client)
+
+        async def schedule(due):
+            task = asyncio.create_task(scan(due, self.rng.choice(self.bus_ids)))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        await self.every(1 / self.args.scan_rate, schedule, 0)
+        await asyncio.gather(*pending)
+        while not pool.empty():
+            await pool.get_nowait().close()
+
+    async def websocket_guardian(self, guardian_id, bus_id, offset):
+        await asyncio.sleep(offset)
+        cookie = self.cookie(guardian_id)
+        for path in ('/ws/notifications/', f'/ws/bus/{bus_id}/tracking/'):
+            ws = await self.open_socket(path, cookie)
+            if ws is not None:
+                self.listeners.append(asyncio.create_task(self.listen(ws, 'guardian')))
+
+    async def polling_guardian(self, guardian_id, student_id, bus_id, offset):
+        http = HttpClient(self.host, self.port, self.cookie(guardian_id))
+        etags = {}
+        paths = [('status page', f'/guardian/student/{student_id}/status/'),
+                 ('notifications poll', '/notifications/'),
+                 ('eta poll', f'/api/bus/{bus_id}/eta/')]
+
+        async def poll(due):
+            for operation, path in paths:
+                headers = {'If-None-Match': etags[path]} if path in etags else {}
+                try:
+                    status, response_headers, _ = await http.request('GET', path, headers=headers)
+                except (OSError, asyncio.IncompleteReadError):
+                    self.results.record(operation, due, ok=False)
+                    continue
+                if 'etag' in response_headers:
+                    etags[path] = response_headers['etag']
+                # The ETA endpoint answers 404 until the bus has a route
+                self.results.record(operation, due, status, ok=status in (200, 304, 404))
+
+        await self.every(self.args.poll_interval, poll, offset)
+        await http.close()
+
+    async def run(self):
+        args = self.args
+        self.stop_at = time.perf_counter() + args.ramp + args.duration
+        ramp = lambda: self.rng.uniform(0, args.ramp)  # noqa: E731
+
+        active = self.guardians[:args.guardians]
+        holding = int(len(active) * args.ws_share)
+        tasks = [self.bus(bus_id, ramp()) for bus_id in self.bus_ids]
+        tasks.append(self.scanners())
+        tasks += [self.websocket_guardian(guardian_id, bus_id, ramp())
+                  for guardian_id, _, bus_id in active[:holding]]
+        tasks += [self.polling_guardian(guardian_id, student_id, bus_id, ramp())
+                  for guardian_id, student_id, bus_id in active[holding:]]
+
+        started = time.perf_counter()
+        await asyncio.gather(*tasks)
+        await asyncio.sleep(max(0.0, self.stop_at - time.perf_counter()))
+        elapsed = time.perf_counter() - started
+        for ws in self.sockets:
+            await ws.close()
+        if self.listeners:
+            await asyncio.wait(self.listeners, timeout=5)
+        return elapsed
+
+
+# ==================== SERVER ====================
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_daphne(port, log_path):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings')
+    log = open(log_path, 'w')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'daphne', '-b', '127.0.0.1', '-p', str(port), 'schooltransport.asgi:application'],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'Daphne exited with code {process.returncode}; see {log_path}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f'Daphne did not start listening on port {port}; see {log_path}')
+
+
+def print_report(args, elapsed, results):
+    summary = results.summary(elapsed)
+    print(f'\nElapsed {elapsed:.1f} s (including {args.ramp:g} s ramp-up)\n')
+    print(f'{"operation":<22}{"count":>8}{"err":>6}{"/s":>8}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"max ms":>9}')
+    print('-' * 80)
+    for operation, row in summary.items():
+        print(f'{operation:<22}{row["count"]:>8,}{row["errors"]:>6}{row["per_second"]:>8.1f}{row["p50_ms"]:>9.1f}'
+              f'{row["p95_ms"]:>9.1f}{row["p99_ms"]:>9.1f}{row["max_ms"]:>9.1f}')
+    for operation, row in summary.items():
+        if row['statuses']:
+            print(f'  {operation}: ' + ', '.join(f'{status} x{n:,}' for status, n in sorted(row['statuses'].items())))
+    if results.counters:
+        print('\nWebSocket messages received:')
+        for name, n in sorted(results.counters.items()):
+            print(f'  {name:<40}{n:>10,}')
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--buses', type=int, default=50)
+    parser.add_argument('--students-per-bus', type=int, default=20)
+    parser.add_argument('--guardians', type=int, default=200, help='active guardians (at most one per student)')
+    parser.add_argument('--ws-share', type=float, default=0.5, help='fraction of guardians holding WebSockets')
+    parser.add_argument('--gps-interval', type=float, default=5.0, help='seconds between fixes per bus')
+    parser.add_argument('--gps-transport', choices=('ws', 'http'), default='ws')
+    parser.add_argument('--scan-rate', type=float, default=10.0, help='check-ins per second, fleet-wide')
+    parser.add_argument('--scanner-connections', type=int, default=10)
+    parser.add_argument('--poll-interval', type=float, default=10.0, help='seconds between polls per guardian')
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds at full load after the ramp')
+    parser.add_argument('--ramp', type=float, default=10.0, help='seconds over which clients start')
+    parser.add_argument('--url', help='running server (started with benchmarks.settings); default: start Daphne')
+    parser.add_argument('--json', help='also write the summary to this file')
+    args = parser.parse_args()
+
+    print('=' * 70)
+    print(f'BENCHMARK: {args.buses} buses, {args.guardians} guardians ({args.ws_share:.0%} on WebSockets), '
+          f'{args.scan_rate:g} scans/s, {args.duration:g} s')
+    print('=' * 70)
+
+    started = time.perf_counter()
+    bus_ids, guardians = prepare_fleet(args.buses, args.students_per_bus)
+    sessions = create_sessions([guardian_id for guardian_id, _, _ in guardians[:args.guardians]])
+    print(f'Fleet ready in {time.perf_counter() - started:.1f} s: {len(bus_ids)} buses, {len(guardians):,} students')
+
+    process = None
+    if args.url:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = '127.0.0.1', free_port()
+        log_path = os.path.join(ROOT, 'benchmarks', 'daphne.log')
+        process = start_daphne(port, log_path)
+        print(f'Daphne listening on {host}:{port} (log: {log_path})')
+
+    try:
+        test = LoadTest(args, host, port, bus_ids, guardians, sessions)
+        elapsed = asyncio.run(test.run())
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    summary = print_report(args, elapsed, test.results)
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump({'arguments': vars(args), 'elapsed_s': elapsed, 'operations': summary,
+                       'messages': dict(test.results.counters)}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
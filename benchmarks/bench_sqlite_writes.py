@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+"""
+BENCHMARK: Concurrent GPS writes against many readers on SQLite
+Runs writer threads inserting BusLocation rows (what save_bus_location does
+for every fix) in this process, like one Daphne worker's sync threads,
+alongside reader processes polling bus positions and today's attendance,
+like HTTP workers. Readers are separate processes so they contend for the
+database file rather than for this process's GIL. Three setups:
+
+  rollback   default rollback journal, writers write directly
+  wal        SQLITE_PRAGMAS (WAL, synchronous=NORMAL, busy_timeout, caches)
+  wal+queue  the same pragmas, writers hand fixes to writer.DatabaseWriter
+
+and prints sustained writes per second, "database is locked" errors and
+read/write latency percentiles. The on-fix hooks (geofence, ETA, trip
+segmentation) are switched off so only the storage path is measured.
+
+Usage: python benchmarks/bench_sqlite_writes.py [--writers 16] [--readers 8] [--seconds 10]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.utils import timezone
+
+from schooltransport.models import Bus, BusLocation, School, StudentAttendance
+from schooltransport.writer import DatabaseWriter
+
+BUSES = 50
+BASE_PRAGMAS = settings.SQLITE_PRAGMAS
+ROLLBACK_PRAGMAS = {'journal_mode': 'DELETE'}
+
+
+def reset_database():
+    path = settings.DATABASES['default']['NAME']
+    connection.close()
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    call_command('migrate', verbosity=0)
+
+    admin = User.objects.create(username='bench_admin')
+    school = School.objects.create(
+        admin=admin, name='Benchmark Academy', location='Nairobi', latitude=-1.2865,
+        longitude=36.8172, phone_number='+254700000000', email='bench@example.com',
+        registration_number='BENCH/1',
+    )
+    Bus.objects.bulk_create([Bus(school=school, registration_number=f'KBZ {i:03}') for i in range(BUSES)])
+    return list(Bus.objects.values_list('id', flat=True))
+
+
+def save_fix(bus_id, rng):
+    """The writes of BusTrackingConsumer.save_bus_location"""
+    latitude, longitude = -1.2865 + rng.uniform(-0.05, 0.05), 36.8172 + rng.uniform(-0.05, 0.05)
+    BusLocation.objects.create(bus_id=bus_id, latitude=latitude, longitude=longitude, speed=30)
+    Bus.objects.filter(id=bus_id).update(current_latitude=latitude, current_longitude=longitude,
+                                         updated_at=timezone.now())
+
+
+def read_status(bus_id):
+    """A guardian poll: the bus's latest fix and today's attendance on it"""
+    BusLocation.objects.filter(bus_id=bus_id).order_by('-timestamp').first()
+    StudentAttendance.objects.filter(bus_id=bus_id, date=timezone.now().date()).count()
+
+
+def reader_process(seed, bus_ids, pragmas, stop, results):
+    settings.SQLITE_PRAGMAS = pragmas
+    rng = random.Random(seed)
+    read_ms, errors = [], 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            read_status(rng.choice(bus_ids))
+            read_ms.append((time.perf_counter() - started) * 1000)
+        except OperationalError:
+            errors += 1
+    connection.close()
+    results.put((read_ms, errors))
+
+
+def run(mode, bus_ids, writers, readers, seconds):
+    pragmas = ROLLBACK_PRAGMAS if mode == 'rollback' else BASE_PRAGMAS
+    settings.SQLITE_PRAGMAS = pragmas
+    queue = DatabaseWriter() if mode == 'wal+queue' else None
+    stop = threading.Event()
+    write_ms, errors = [], []
+
+    def writer(seed):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            bus_id = rng.choice(bus_ids)
+            started = time.perf_counter()
+            try:
+                if queue:
+                    queue.submit(save_fix, bus_id, rng).result()
+                else:
+                    save_fix(bus_id, rng)
+                write_ms.append((time.perf_counter() - started) * 1000)
+            except OperationalError as e:
+                errors.append(str(e))
+        connection.close()
+
+    context = multiprocessing.get_context('fork')
+    reader_stop, reader_results = context.Event(), context.Queue()
+    processes = [context.Process(target=reader_process, args=(1000 + i, bus_ids, pragmas, reader_stop, reader_results))
+                 for i in range(readers)]
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    connection.close()
+    for worker in processes + threads:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    reader_stop.set()
+
+    read_ms, read_errors = [], 0
+    for _ in processes:
+        latencies, failed = reader_results.get()
+        read_ms += latencies
+        read_errors += failed
+    for worker in processes + threads:
+        worker.join()
+    if queue:
+        queue.stop()
+
+    return {
+        'writes/s': len(write_ms) / seconds,
+        'reads/s': len(read_ms) / seconds,
+        'locked': sum('locked' in e for e in errors) + read_errors,
+        'write p50': percentile(write_ms, 50),
+        'write p95': percentile(write_ms, 95),
+        'read p50': percentile(read_ms, 50),
+        'read p95': percentile(read_ms, 95),
+    }
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    if q == 50:
+        return statistics.median(values)
+    return statistics.quantiles(values, n=100)[q - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--readers', type=int, default=8, help='Reader processes')
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    settings.GEOFENCE_ON_FIX = settings.ETA_UPDATE_ON_FIX = settings.TRIP_SEGMENT_ON_FIX = False
+
+    print('=' * 70)
+    print(f'BENCHMARK: SQLite writes, {args.writers} writers / {args.readers} readers, {args.seconds:g}s each')
+    print('=' * 70)
+
+    results = {}
+    for mode in ('rollback', 'wal', 'wal+queue'):
+        settings.SQLITE_PRAGMAS = ROLLBACK_PRAGMAS if mode == 'rollback' else BASE_PRAGMAS
+        bus_ids = reset_database()
+        connection.close()
+        results[mode] = run(mode, bus_ids, args.writers, args.readers, args.seconds)
+        print(f'  {mode} done')
+
+    columns = list(results['rollback'])
+    print('\n' + f'{"setup":<12}' + ''.join(f'{c:>12}' for c in columns))
+    for mode, row in results.items():
+        print(f'{mode:<12}' + ''.join(f'{row[c]:>12.1f}' if isinstance(row[c], float) else f'{row[c]:>12}'
+                                      for c in columns))
+    print('\nLatencies in ms. "locked" counts OperationalError: database is locked (reads and writes).')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+"""
+Settings for benchmark scripts
+Same as schooltransport.setting but on a separate database so benchmarks never
+touch db.sqlite3. Set BENCH_DB to choose the SQLite file. With DATABASE_URL
+set, the PostgreSQL database it names is used instead; only
+bench_connections.py (which flushes the database, so point it at a scratch
+one) and bench_load.py support that.
+"""
+
+import os
+
+from schooltransport.setting import *  # noqa: F401,F403
+from schooltransport.setting import BASE_DIR, DATABASES
+
+if not os.environ.get('DATABASE_URL'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('BENCH_DB', str(BASE_DIR / 'benchmarks' / 'bench.sqlite3')),
+        }
+    }
+
+DEBUG = False
+ALLOW_PROCESS_LOCAL_CACHE = True  # bench_load.py starts a single Daphne process
@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class SchoolTransportConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'schooltransport'
+
+    def ready(self):
+        # Register model signal handlers
+        from . import signals  # noqa: F401
+
+        # Optional eager loading of heavy libraries (see lazy.py)
+        from django.conf import settings
+        from .lazy import preload
+        preload(settings.PRELOAD_MODULES)
@@ -17,6 +17,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'schooltransport.setting')
 django_asgi_app = get_asgi_application()
 
 from .routing import websocket_urlpatterns
+from .versions import check_shared_cache
+
+check_shared_cache()
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
@@ -0,0 +1,152 @@
+"""
+Daily Attendance Summaries
+Keeps DailyAttendanceSummary rows in step with StudentAttendance and
+BiometricLog writes, and rebuilds them from raw rows for backfills.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import BiometricLog, Bus, DailyAttendanceSummary, Student, StudentAttendance
+
+
+def get_summary(school_id, bus_id, date):
+    """Summary row for a school, bus and day, created with the current roster size"""
+    summary = DailyAttendanceSummary.objects.filter(school_id=school_id, bus_id=bus_id, date=date).first()
+    if summary is not None:
+        return summary
+
+    enrolled = Student.objects.filter(school_id=school_id, bus_id=bus_id).count() if bus_id else 0
+    summary, _ = DailyAttendanceSummary.objects.get_or_create(
+        school_id=school_id,
+        bus_id=bus_id,
+        date=date,
+        defaults={'enrolled': enrolled, 'absent': enrolled},
+    )
+    return summary
+
+
+def record_attendance(attendance):
+    """Count a newly created StudentAttendance row"""
+    if attendance.status not in ('boarded', 'alighted'):
+        return
+
+    school_id = Student.objects.filter(id=attendance.student_id).values_list('school_id', flat=True).first()
+    summary = get_summary(school_id, attendance.bus_id, attendance.date)
+    changes = {attendance.status: F(attendance.status) + 1}
+
+    if attendance.status == 'boarded':
+        first_boarding = not StudentAttendance.objects.filter(
+            student_id=attendance.student_id,
+            bus_id=attendance.bus_id,
+            date=attendance.date,
+            status='boarded',
+        ).exclude(id=attendance.id).exists()
+        if first_boarding:
+            changes['absent'] = Greatest(F('absent') - 1, 0)
+
+    if not attendance.biometric_verified:
+        changes['biometric_failures'] = F('biometric_failures') + 1
+
+    DailyAttendanceSummary.objects.filter(id=summary.id).update(**changes)
+
+
+def record_biometric_failure(log):
+    """Count a fingerprint scan that did not produce a match"""
+    student = Student.objects.filter(id=log.student_id).values('school_id', 'bus_id').first()
+    if student is None:
+        return
+
+    summary = get_summary(student['school_id'], student['bus_id'], timezone.localdate(log.scan_time))
+    DailyAttendanceSummary.objects.filter(id=summary.id).update(
+        biometric_failures=F('biometric_failures') + 1
+    )
+
+
+def school_day_summaries(school, date):
+    """
+    Summary rows for every bus of a school on a day, ordered by bus. A row is
+    only stored once a bus records its first check-in, so on the current day
+    (Monday to Friday) active buses where nobody has boarded yet get an unsaved
+    row counting their whole roster as absent. Other days only list stored
+    rows: today's roster says nothing about weekends or days before a bus ran.
+    """
+    summaries = list(DailyAttendanceSummary.objects.filter(school=school, date=date).select_related('bus'))
+    if date == timezone.localdate() and date.weekday() < 5:
+        recorded = {summary.bus_id for summary in summaries}
+        idle_buses = (
+            Bus.objects.filter(school=school, is_active=True)
+            .exclude(id__in=[bus_id for bus_id in recorded if bus_id is not None])
+            .annotate(enrolled=Count('students'))
+        )
+        summaries += [
+            DailyAttendanceSummary(school=school, bus=bus, date=date, enrolled=bus.enrolled, absent=bus.enrolled)
+            for bus in idle_buses
+        ]
+    return sorted(summaries, key=lambda summary: (summary.bus_id is None, summary.bus_id or 0))
+
+
+def rebuild_summaries(start_date, end_date, school=None):
+    """
+    Recompute summaries for a date range from StudentAttendance rows and
+    failed BiometricLog scans (by the student's current bus and the scan's
+    local date, as record_biometric_failure counts them).
+    `enrolled`/`absent` use today's bus rosters, as historical rosters are not
+    stored. Returns the number of summary rows written.
+    """
+    attendance = StudentAttendance.objects.filter(date__gte=start_date, date__lte=end_date)
+    failed_scans = BiometricLog.objects.exclude(status='match').annotate(
+        date=TruncDate('scan_time', tzinfo=timezone.get_current_timezone())
+    ).filter(date__gte=start_date, date__lte=end_date)
+    if school is not None:
+        attendance = attendance.filter(student__school=school)
+        failed_scans = failed_scans.filter(student__school=school)
+
+    rows = attendance.values('student__school_id', 'bus_id', 'date').annotate(
+        boarded=Count('id', filter=Q(status='boarded')),
+        alighted=Count('id', filter=Q(status='alighted')),
+        students_boarded=Count('student', filter=Q(status='boarded'), distinct=True),
+        biometric_failures=Count('id', filter=Q(biometric_verified=False)),
+    ).order_by()
+    scan_failures = failed_scans.values_list('student__school_id', 'student__bus_id', 'date').annotate(
+        failures=Count('id')
+    ).order_by()
+
+    counts = {}
+    for row in rows.iterator():
+        counts[row['student__school_id'], row['bus_id'], row['date']] = row
+    for school_id, bus_id, date, failures in scan_failures.iterator():
+        row = counts.setdefault((school_id, bus_id, date), {
+            'boarded': 0, 'alighted': 0, 'students_boarded': 0, 'biometric_failures': 0,
+        })
+        row['biometric_failures'] += failures
+
+    rosters = dict(
+        Student.objects.filter(bus__isnull=False)
+        .values('bus_id').annotate(total=Count('id')).values_list('bus_id', 'total')
+    )
+
+    summaries = []
+    for (school_id, bus_id, date), row in counts.items():
+        enrolled = rosters.get(bus_id, 0) if bus_id else 0
+        summaries.append(DailyAttendanceSummary(
+            school_id=school_id,
+            bus_id=bus_id,
+            date=date,
+            enrolled=enrolled,
+            boarded=row['boarded'],
+            alighted=row['alighted'],
+            absent=max(enrolled - row['students_boarded'], 0),
+            biometric_failures=row['biometric_failures'],
+        ))
+
+    existing = DailyAttendanceSummary.objects.filter(date__gte=start_date, date__lte=end_date)
+    if school is not None:
+        existing = existing.filter(school=school)
+
+    with transaction.atomic():
+        existing.delete()
+        DailyAttendanceSummary.objects.bulk_create(summaries, batch_size=1000)
+    return len(summaries)
@@ -3,19 +3,21 @@ Biometric System Module
 Handles fingerprint and facial recognition verification
 """
 
-try:
-    import cv2
-    _HAS_CV2 = True
-except Exception:
-    cv2 = None
-    _HAS_CV2 = False
-import numpy as np
-from PIL import Image
+from __future__ import annotations
+
 import io
 import base64
 from typing import Dict, Tuple, Optional
 import json
 
+from .lazy import is_available, lazy_import
+
+# Loaded on first use (see lazy.py); PRELOAD_MODULES=biometric loads them at startup
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+_HAS_CV2 = is_available('cv2')
+
 
 class BiometricSystem:
     """
@@ -5,20 +5,90 @@ Handles live notifications and GPS updates
 
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+import functools
 import json
 import logging
+import time
+
+from django.conf import settings
+
+from .metrics import connection_opened, connection_closed, record_db_call, record_message, record_receive
+from .writer import run_write
 
 logger = logging.getLogger(__name__)
 
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+def timed_db_call(func=None, *, write=False):
+    """
+    database_sync_to_async that records how long each call was awaited,
+    including the wait for a free sync worker thread. With write=True the
+    call goes to the single database writer instead (DATABASE_WRITE_QUEUE).
+    """
+    if func is None:
+        return functools.partial(timed_db_call, write=write)
+
+    call = database_sync_to_async(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            if write and settings.DATABASE_WRITE_QUEUE:
+                return await run_write(func, *args, **kwargs)
+            return await call(*args, **kwargs)
+        finally:
+            record_db_call(func.__name__, (time.perf_counter() - started) * 1000)
+
+    return wrapper
+
+
+class InstrumentedConsumer(AsyncWebsocketConsumer):
+    """
+    Base consumer feeding metrics.py: open connections per consumer and
+    group, frames received and sent, and receive handler latency.
+    `group_attribute` names the attribute holding the connection's group.
+    """
+
+    group_attribute = None
+
+    async def accept(self, subprotocol=None):
+        await super().accept(subprotocol)
+        self.metrics_group = getattr(self, self.group_attribute, None)
+        connection_opened(type(self).__name__, self.metrics_group)
+
+    async def websocket_disconnect(self, message):
+        if hasattr(self, 'metrics_group'):
+            connection_closed(type(self).__name__, self.metrics_group)
+        await super().websocket_disconnect(message)
+
+    async def websocket_receive(self, message):
+        record_message(type(self).__name__, 'in')
+        started = time.perf_counter()
+        try:
+            await super().websocket_receive(message)
+        finally:
+            record_receive(type(self).__name__, (time.perf_counter() - started) * 1000)
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        if text_data is not None or bytes_data is not None:
+            record_message(type(self).__name__, 'out')
+        await super().send(text_data=text_data, bytes_data=bytes_data, close=close)
+
+
+class NotificationConsumer(InstrumentedConsumer):
     """
     WebSocket consumer for real-time notifications
     Sends live updates to guardians about their students
     """
 
+    group_attribute = 'user_group_name'
+
     async def connect(self):
         """Accept WebSocket connection"""
+        if not self.scope['user'].is_authenticated:
+            await self.close()
+            return
+
         self.user_id = self.scope['user'].id
         self.user_group_name = f'user_{self.user_id}'
 
@@ -33,6 +103,9 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, close_code):
         """Remove from group on disconnect"""
+        if not hasattr(self, 'user_group_name'):
+            return
+
         await self.channel_layer.group_discard(
             self.user_group_name,
             self.channel_name
@@ -68,21 +141,41 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         """
         notification = {
             'type': 'notification',
+            'id': event.get('id'),
+            'notification_type': event.get('notification_type'),
             'title': event['title'],
             'message': event['message'],
+            'student_id': event.get('student_id'),
+            'bus_id': event.get('bus_id'),
             'timestamp': event['timestamp'],
         }
 
         # Send notification to WebSocket
         await self.send(text_data=json.dumps(notification))
 
+    async def new_message(self, event):
+        """
+        Send new direct message alert to WebSocket
+        Called by group_send when a Message is saved
+        """
+        await self.send(text_data=json.dumps({
+            'type': 'new_message',
+            'id': event['id'],
+            'sender_id': event['sender_id'],
+            'bus_id': event['bus_id'],
+            'message_text': event['message_text'],
+            'timestamp': event['timestamp'],
+        }))
+
 
-class BusTrackingConsumer(AsyncWebsocketConsumer):
+class BusTrackingConsumer(InstrumentedConsumer):
     """
     WebSocket consumer for real-time bus tracking
     Updates guardians with live bus location
     """
 
+    group_attribute = 'bus_group_name'
+
     async def connect(self):
         """Accept WebSocket connection"""
         self.bus_id = self.scope['url_route']['kwargs'].get('bus_id')
@@ -116,7 +209,7 @@ class BusTrackingConsumer(AsyncWebsocketConsumer):
                     self.bus_group_name,
                     {
                         'type': 'location_update',
-                        'bus_id': self.bus_id,
+                        'bus_id': int(self.bus_id),  # Same type as location_event() sends
                         'latitude': data.get('latitude'),
                         'longitude': data.get('longitude'),
                         'speed': data.get('speed'),
@@ -151,7 +244,15 @@ class BusTrackingConsumer(AsyncWebsocketConsumer):
 
         await self.send(text_data=json.dumps(location))
 
-    @database_sync_to_async
+    async def eta_update(self, event):
+        """Send estimated arrival times for the bus's remaining stops"""
+        await self.send(text_data=json.dumps(event))
+
+    async def geofence_event(self, event):
+        """Send the bus entering or leaving a stop, approach zone or the school"""
+        await self.send(text_data=json.dumps(event))
+
+    @timed_db_call(write=True)
     def save_bus_location(self, bus_id, latitude, longitude, speed, heading, accuracy):
         """Save bus location to database"""
         from .models import Bus, BusLocation
@@ -169,19 +270,21 @@ class BusTrackingConsumer(AsyncWebsocketConsumer):
             # Update bus current location
             bus.current_latitude = latitude
             bus.current_longitude = longitude
-            bus.save()
+            bus.save(update_fields=['current_latitude', 'current_longitude', 'updated_at'])
         except Bus.DoesNotExist:
             logger.error(f"Bus {bus_id} not found")
         except Exception as e:
             logger.error(f"Error saving location: {e}")
 
 
-class StudentCheckinConsumer(AsyncWebsocketConsumer):
+class StudentCheckinConsumer(InstrumentedConsumer):
     """
     WebSocket consumer for student check-in/out events
     Notifies guardians when student boards/alights
     """
 
+    group_attribute = 'attendant_group_name'
+
     async def connect(self):
         """Accept WebSocket connection"""
         self.bus_id = self.scope['url_route']['kwargs'].get('bus_id')
@@ -260,9 +363,9 @@ class StudentCheckinConsumer(AsyncWebsocketConsumer):
         }
         await self.send(text_data=json.dumps(notification))
 
-    @database_sync_to_async
+    @timed_db_call(write=True)
     def notify_guardian(self, student_id, student_name, status):
-        """Create notification for guardian"""
+        """Create notification for guardian (pushed to their user_<id> group on save)"""
         from .models import Student, Notification
         from django.utils import timezone
 
@@ -0,0 +1,204 @@
+"""
+ETA Engine
+Estimates arrival times at the remaining stops of each bus from its latest
+GPS fix, the cached route geometry (route_cache) and recent speeds in
+BusLocation. The fix is projected onto the ordered stop polyline to find how
+far along the route the bus is; the distance left to each stop divided by
+the recent moving speed gives the ETA.
+
+All buses are computed together with NumPy: one query loads recent fixes
+for the whole fleet and geo.project_onto_polylines runs over every route
+segment in a single pass. A single bus costs O(stops). Results are cached
+per bus and pushed to bus_<id> subscribers as 'eta_update' events.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .geo import haversine_m, project_onto_polylines
+from .lazy import lazy_import
+from .models import Bus, BusLocation
+from .realtime import bus_group, group_send
+from .route_cache import get_route_data
+
+logger = logging.getLogger(__name__)
+
+np = lazy_import('numpy')
+
+KEY_PREFIX = 'eta'
+
+
+def eta_key(bus_id):
+    return f'{KEY_PREFIX}:{bus_id}'
+
+
+# ==================== SPEED ====================
+
+def recent_fixes(bus_ids, now=None):
+    """Fixes from the last ETA_SPEED_WINDOW seconds per bus, oldest first"""
+    now = now or timezone.now()
+    since = now - timedelta(seconds=settings.ETA_SPEED_WINDOW)
+    fixes = {}
+    rows = BusLocation.objects.filter(
+        bus_id__in=bus_ids, timestamp__gte=since
+    ).order_by('bus_id', 'timestamp', 'id').values_list('bus_id', 'latitude', 'longitude', 'speed', 'timestamp')
+    for bus_id, lat, lng, speed, timestamp in rows:
+        fixes.setdefault(bus_id, []).append((lat, lng, speed, timestamp))
+    return fixes
+
+
+def moving_speed_kmh(fixes):
+    """
+    Median speed while moving. Reported GPS speeds are preferred; without
+    them the speed between consecutive fixes is used. Readings below
+    ETA_MOVING_SPEED_KMH (stopped at a stop or in traffic) are ignored so a
+    short halt does not push every ETA out. Falls back to ETA_DEFAULT_SPEED_KMH.
+    """
+    minimum = settings.ETA_MOVING_SPEED_KMH
+    speeds = [speed for _, _, speed, _ in fixes if speed is not None and speed >= minimum]
+
+    if not speeds:
+        for (lat1, lng1, _, t1), (lat2, lng2, _, t2) in zip(fixes, fixes[1:]):
+            seconds = (t2 - t1).total_seconds()
+            if seconds > 0:
+                speed = haversine_m(lat1, lng1, lat2, lng2) / seconds * 3.6
+                if speed >= minimum:
+                    speeds.append(speed)
+
+    if not speeds:
+        return float(settings.ETA_DEFAULT_SPEED_KMH)
+    return float(np.median(speeds))
+
+
+# ==================== PROJECTION ====================
+
+def project_fleet(fixes, routes):
+    """
+    Project each bus's fix onto its route.
+    `fixes` is [(lat, lng)] and `routes` the matching route_cache entries.
+    Returns (distance along the route in metres, distance off the route in
+    metres) as two arrays, one value per bus.
+    """
+    polylines = [[(s['latitude'], s['longitude']) for s in route['stops']] for route in routes]
+    segment, fraction, off_route = project_onto_polylines(fixes, polylines)
+
+    along = np.empty(len(routes))
+    for i, route in enumerate(routes):
+        stops = route['stops']
+        start = stops[segment[i]]['distance_from_start_m']
+        end = stops[min(segment[i] + 1, len(stops) - 1)]['distance_from_start_m']
+        along[i] = start + fraction[i] * (end - start)
+    return along, off_route
+
+
+# ==================== ETA ====================
+
+def compute_etas(bus_ids, now=None):
+    """
+    ETAs for the given buses: {bus_id: eta}. Buses without an active route
+    or without a fix in the last ETA_SPEED_WINDOW seconds are left out.
+    """
+    now = now or timezone.now()
+    fixes_by_bus = recent_fixes(bus_ids, now)
+
+    buses, fixes, routes, speeds = [], [], [], []
+    for bus_id in bus_ids:
+        bus_fixes = fixes_by_bus.get(bus_id)
+        if not bus_fixes:
+            continue
+        route = get_route_data(bus_id)
+        if not route['route'] or not route['stops']:
+            continue
+        lat, lng, _, _ = bus_fixes[-1]
+        buses.append(bus_id)
+        fixes.append((lat, lng))
+        routes.append(route)
+        speeds.append(moving_speed_kmh(bus_fixes))
+
+    if not buses:
+        return {}
+
+    along, off_route = project_fleet(fixes, routes)
+
+    # Remaining distance and time to every stop of every bus at once
+    stop_bus = np.concatenate([np.full(len(r['stops']), i) for i, r in enumerate(routes)])
+    stop_along = np.asarray([s['distance_from_start_m'] for r in routes for s in r['stops']])
+    remaining = stop_along - along[stop_bus]
+    seconds = remaining / (np.asarray(speeds)[stop_bus] / 3.6)
+
+    etas = {}
+    offset = 0
+    for i, (bus_id, route) in enumerate(zip(buses, routes)):
+        upcoming = []
+        for j, stop in enumerate(route['stops']):
+            k = offset + j
+            if remaining[k] < 0:
+                continue  # already passed
+            upcoming.append({
+                'id': stop['id'],
+                'name': stop['name'],
+                'order': stop['order'],
+                'distance_m': round(float(remaining[k]), 1),
+                'eta_seconds': round(float(seconds[k])),
+                'eta': (now + timedelta(seconds=float(seconds[k]))).isoformat(),
+            })
+        offset += len(route['stops'])
+
+        etas[bus_id] = {
+            'bus_id': bus_id,
+            'route_id': route['route']['id'],
+            'computed_at': now.isoformat(),
+            'speed_kmh': round(speeds[i], 1),
+            'distance_along_m': round(float(along[i]), 1),
+            'off_route_m': round(float(off_route[i]), 1),
+            'stops': upcoming,
+        }
+    return etas
+
+
+def eta_event(eta):
+    """Channel layer event handled by BusTrackingConsumer.eta_update"""
+    return {'type': 'eta_update', **eta}
+
+
+def publish_etas(etas):
+    """Cache ETAs and push them to each bus's subscribers"""
+    if not etas:
+        return
+    cache.set_many({eta_key(bus_id): eta for bus_id, eta in etas.items()},
+                   timeout=settings.ETA_CACHE_TIMEOUT)
+    for bus_id, eta in etas.items():
+        group_send(bus_group(bus_id), eta_event(eta))
+
+
+def update_bus_eta(bus_id):
+    """Recompute, cache and publish one bus's ETA (called for each new fix)"""
+    try:
+        etas = compute_etas([bus_id])
+        publish_etas(etas)
+        return etas.get(bus_id)
+    except Exception as e:
+        logger.error(f"Error updating ETA for bus {bus_id}: {e}")
+        return None
+
+
+def update_fleet_etas():
+    """Recompute ETAs for every active bus in one pass. Returns the number updated."""
+    bus_ids = list(Bus.objects.filter(is_active=True).values_list('id', flat=True))
+    etas = compute_etas(bus_ids)
+    publish_etas(etas)
+    return len(etas)
+
+
+def get_bus_eta(bus_id):
+    """Cached ETA for a bus, computing it on a miss; None if it cannot be estimated"""
+    eta = cache.get(eta_key(bus_id))
+    if eta is None:
+        eta = compute_etas([bus_id]).get(bus_id)
+        if eta is not None:
+            cache.set(eta_key(bus_id), eta, timeout=settings.ETA_CACHE_TIMEOUT)
+    return eta
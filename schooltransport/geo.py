@@ -0,0 +1,135 @@
+"""
+Geographic Helpers
+Great-circle distances on the WGS84 mean radius, shared by the route cache,
+ETA estimates and geofencing.
+
+The *_array functions are NumPy versions of the scalar helpers: they take
+degrees as arrays (or anything that broadcasts) so a whole fleet of fixes is
+handled in one call instead of per-row Python math.
+"""
+
+import math
+
+from .lazy import lazy_import
+
+np = lazy_import('numpy')  # loaded on the first array call
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Distance in metres between two (latitude, longitude) points in degrees"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bearing_deg(lat1, lon1, lat2, lon2):
+    """Initial bearing in degrees (0 = north, 90 = east) from the first point to the second"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_lambda = math.radians(lon2 - lon1)
+    y = math.sin(d_lambda) * math.cos(phi2)
+    x = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(d_lambda)
+    return math.degrees(math.atan2(y, x)) % 360
+
+
+def bounding_box(points):
+    """{'min_lat', 'min_lng', 'max_lat', 'max_lng'} around (lat, lng) points, or None"""
+    if not points:
+        return None
+    lats = [lat for lat, _ in points]
+    lngs = [lng for _, lng in points]
+    return {'min_lat': min(lats), 'min_lng': min(lngs), 'max_lat': max(lats), 'max_lng': max(lngs)}
+
+
+# ==================== ARRAYS ====================
+
+def haversine_array(lat1, lon1, lat2, lon2):
+    """haversine_m over broadcast arrays; returns metres as an ndarray"""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def bearing_array(lat1, lon1, lat2, lon2):
+    """bearing_deg over broadcast arrays; returns degrees in [0, 360)"""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    d_lambda = np.radians(np.subtract(lon2, lon1))
+    y = np.sin(d_lambda) * np.cos(phi2)
+    x = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(d_lambda)
+    return np.degrees(np.arctan2(y, x)) % 360
+
+
+def nearest_points(lats, lngs, candidate_lats, candidate_lngs, chunk=4096):
+    """
+    For each query point, the index of and distance to the nearest candidate
+    (e.g. every bus against every stop). Returns (indexes, metres) arrays.
+    Queries are processed `chunk` at a time to bound the distance matrix.
+    """
+    lats, lngs = np.atleast_1d(np.asarray(lats, float)), np.atleast_1d(np.asarray(lngs, float))
+    candidate_lats = np.asarray(candidate_lats, float)
+    candidate_lngs = np.asarray(candidate_lngs, float)
+    if not len(candidate_lats):
+        raise ValueError('nearest_points needs at least one candidate')
+
+    indexes = np.empty(len(lats), dtype=np.intp)
+    distances = np.empty(len(lats))
+    for start in range(0, len(lats), chunk):
+        stop = start + chunk
+        matrix = haversine_array(lats[start:stop, None], lngs[start:stop, None],
+                                 candidate_lats[None, :], candidate_lngs[None, :])
+        indexes[start:stop] = matrix.argmin(axis=1)
+        distances[start:stop] = matrix[np.arange(len(matrix)), indexes[start:stop]]
+    return indexes, distances
+
+
+def project_onto_polylines(points, polylines):
+    """
+    Project each (lat, lng) point onto its own polyline of (lat, lng)
+    vertices, all in one pass over every segment of every polyline.
+
+    Returns three arrays, one value per point: the index of the closest
+    segment (vertex i to i + 1), the fraction 0..1 along that segment, and
+    the distance in metres from the point to the polyline. A single-vertex
+    polyline is one zero-length segment. Distances use an equirectangular
+    projection around each point, accurate to well under a metre at the
+    scale of a bus route.
+    """
+    lengths = np.fromiter((len(vertices) for vertices in polylines), dtype=np.intp, count=len(polylines))
+    if not lengths.all():
+        raise ValueError(f'polyline {int(np.argmin(lengths))} has no vertices')
+    flat = np.asarray([vertex for vertices in polylines for vertex in vertices], float).reshape(-1, 2)
+
+    # Segment k of polyline i runs from vertex a to vertex b (a == b for a single vertex)
+    counts = np.maximum(lengths - 1, 1)
+    owner = np.repeat(np.arange(len(polylines)), counts)
+    starts = np.cumsum(counts) - counts
+    index = np.arange(counts.sum()) - np.repeat(starts, counts)
+    a = np.repeat(np.cumsum(lengths) - lengths, counts) + index
+    b = a + (lengths > 1)[owner]
+
+    # Local planar coordinates in metres around each point
+    points = np.asarray(points, float).reshape(-1, 2)
+    metres_per_degree = math.radians(EARTH_RADIUS_M)
+    kx = (np.cos(np.radians(points[:, 0])) * metres_per_degree)[owner]
+    origin = points[owner]
+    ax = (flat[a, 1] - origin[:, 1]) * kx
+    ay = (flat[a, 0] - origin[:, 0]) * metres_per_degree
+    dx = (flat[b, 1] - flat[a, 1]) * kx
+    dy = (flat[b, 0] - flat[a, 0]) * metres_per_degree
+
+    length_sq = dx * dx + dy * dy
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = np.where(length_sq > 0, -(ax * dx + ay * dy) / length_sq, 0.0)
+    np.clip(t, 0.0, 1.0, out=t)
+    offset = np.hypot(ax + t * dx, ay + t * dy)
+
+    # Closest segment per point. Segments are grouped by point, so take each
+    # group's minimum and keep the first segment that reaches it.
+    closest = np.flatnonzero(offset == np.minimum.reduceat(offset, starts)[owner])
+    best = closest[np.searchsorted(owner[closest], np.arange(len(polylines)))]
+    return index[best], t[best], offset[best]
@@ -0,0 +1,208 @@
+"""
+Geofence Engine
+Checks each GPS fix against circles around the bus's route stops and its
+school. Fences are indexed in a uniform grid built once per bus (and cached
+with the route), so a fix only looks at the fences registered in its own
+grid cell: O(1) no matter how many stops the route has.
+
+Enter/exit events update Bus.status (at_school / on_route), are pushed to
+bus_<id> subscribers as 'geofence_event', and entering the approach circle
+of a stop alerts the guardians of students picked up there, once per trip.
+A trip starts with the first fix of the day and again each time the bus
+leaves the school.
+"""
+
+import logging
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .geo import haversine_m
+from .models import Bus, Student
+from .notifications import create_guardian_notification
+from .realtime import bus_group, group_send
+from .route_cache import get_route_data
+from .versions import bump_version
+
+logger = logging.getLogger(__name__)
+
+METRES_PER_DEGREE = 111195.0
+
+GRID_PREFIX = 'geofence'
+STATE_PREFIX = 'geofence_state'
+STATE_TIMEOUT = 24 * 60 * 60  # state is per day; keep it for a day at most
+
+
+def grid_key(bus_id):
+    return f'{GRID_PREFIX}:{bus_id}'
+
+
+def state_key(bus_id):
+    return f'{STATE_PREFIX}:{bus_id}'
+
+
+# ==================== FENCES ====================
+
+class Fence:
+    """A circle: kind is 'school', 'stop' (arrival) or 'approach'"""
+
+    def __init__(self, kind, ref_id, name, latitude, longitude, radius_m):
+        self.id = f'{kind}:{ref_id}'
+        self.kind = kind
+        self.ref_id = ref_id
+        self.name = name
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius_m = radius_m
+
+    def contains(self, latitude, longitude):
+        return haversine_m(self.latitude, self.longitude, latitude, longitude) <= self.radius_m
+
+
+class FenceGrid:
+    """
+    Uniform lat/lng grid. Each fence is registered in every cell its bounding
+    box touches, so a lookup only reads the cell containing the point.
+    """
+
+    def __init__(self, fences, cell_m):
+        self.cell_deg = cell_m / METRES_PER_DEGREE
+        self.cells = {}
+        self.fences = {fence.id: fence for fence in fences}
+        for fence in fences:
+            d_lat = fence.radius_m / METRES_PER_DEGREE
+            d_lng = d_lat / max(math.cos(math.radians(fence.latitude)), 1e-6)
+            lat_lo, lng_lo = self.cell(fence.latitude - d_lat, fence.longitude - d_lng)
+            lat_hi, lng_hi = self.cell(fence.latitude + d_lat, fence.longitude + d_lng)
+            for i in range(lat_lo, lat_hi + 1):
+                for j in range(lng_lo, lng_hi + 1):
+                    self.cells.setdefault((i, j), []).append(fence)
+
+    def cell(self, latitude, longitude):
+        return math.floor(latitude / self.cell_deg), math.floor(longitude / self.cell_deg)
+
+    def containing(self, latitude, longitude):
+        """Fences containing the point"""
+        candidates = self.cells.get(self.cell(latitude, longitude), ())
+        return [fence for fence in candidates if fence.contains(latitude, longitude)]
+
+
+def build_fence_grid(bus_id):
+    """Fences for the bus's school and active route stops"""
+    school = Bus.objects.filter(id=bus_id).values(
+        'school_id', 'school__name', 'school__latitude', 'school__longitude'
+    ).first()
+    if school is None:
+        return FenceGrid([], settings.GEOFENCE_GRID_CELL_M)
+
+    fences = [Fence('school', school['school_id'], school['school__name'],
+                    school['school__latitude'], school['school__longitude'],
+                    settings.GEOFENCE_SCHOOL_RADIUS_M)]
+
+    for stop in get_route_data(bus_id).get('stops', ()):
+        for kind, radius in (('stop', settings.GEOFENCE_STOP_RADIUS_M),
+                             ('approach', settings.GEOFENCE_APPROACH_RADIUS_M)):
+            fences.append(Fence(kind, stop['id'], stop['name'], stop['latitude'], stop['longitude'], radius))
+
+    return FenceGrid(fences, settings.GEOFENCE_GRID_CELL_M)
+
+
+def get_fence_grid(bus_id):
+    grid = cache.get(grid_key(bus_id))
+    if grid is None:
+        grid = build_fence_grid(bus_id)
+        cache.set(grid_key(bus_id), grid, timeout=settings.ROUTE_CACHE_TIMEOUT)
+    return grid
+
+
+def invalidate_fences(*bus_ids):
+    """Drop cached fence grids once the current transaction commits"""
+    keys = [grid_key(bus_id) for bus_id in bus_ids if bus_id is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+# ==================== EVENTS ====================
+
+def geofence_event(bus_id, fence, transition):
+    """Channel layer event handled by BusTrackingConsumer.geofence_event"""
+    return {
+        'type': 'geofence_event',
+        'bus_id': bus_id,
+        'event': transition,
+        'fence': fence.kind,
+        'fence_id': fence.ref_id,
+        'name': fence.name,
+        'timestamp': timezone.now().isoformat(),
+    }
+
+
+def _new_state(today, trip=1):
+    return {'date': today, 'trip': trip, 'inside': [], 'alerted': []}
+
+
+def check_fix(bus_id, latitude, longitude):
+    """
+    Compare a fix with the fences the bus was inside at its previous fix and
+    act on every enter/exit. Returns the list of (transition, fence) pairs.
+    """
+    grid = get_fence_grid(bus_id)
+    today = timezone.localdate().isoformat()
+
+    state = cache.get(state_key(bus_id))
+    if state is None or state['date'] != today:
+        state = _new_state(today)
+
+    inside = {fence.id: fence for fence in grid.containing(latitude, longitude)}
+    previous = set(state['inside'])
+
+    # Exits first, so leaving the school starts the new trip before any approach alert
+    transitions = [('exit', grid.fences[fence_id]) for fence_id in sorted(previous - inside.keys())
+                   if fence_id in grid.fences]
+    transitions += [('enter', inside[fence_id]) for fence_id in sorted(inside.keys() - previous)]
+
+    for transition, fence in transitions:
+        if fence.kind == 'school':
+            Bus.objects.filter(id=bus_id).update(
+                status='at_school' if transition == 'enter' else 'on_route',
+                updated_at=timezone.now(),
+            )
+            bump_version('bus', bus_id)
+            if transition == 'exit':
+                state = _new_state(today, trip=state['trip'] + 1)
+        elif fence.kind == 'approach' and transition == 'enter' and fence.ref_id not in state['alerted']:
+            state['alerted'].append(fence.ref_id)
+            alert_approaching(bus_id, fence)
+
+        group_send(bus_group(bus_id), geofence_event(bus_id, fence, transition))
+
+    state['inside'] = sorted(inside)
+    cache.set(state_key(bus_id), state, timeout=STATE_TIMEOUT)
+    return transitions
+
+
+def alert_approaching(bus_id, fence):
+    """Notify guardians of students picked up at the stop the bus is approaching"""
+    students = Student.objects.filter(
+        bus_id=bus_id, pickup_stop_id=fence.ref_id, guardian__isnull=False
+    ).select_related('guardian__profile', 'user', 'bus')
+
+    for student in students:
+        create_guardian_notification(
+            student,
+            f"The bus is approaching {fence.name}, {student.user.get_full_name()}'s stop.",
+            'approaching',
+            bus=student.bus,
+        )
+
+
+def process_fix(bus_id, latitude, longitude):
+    """check_fix for the location pipeline: errors are logged, never raised"""
+    try:
+        return check_fix(bus_id, latitude, longitude)
+    except Exception as e:
+        logger.error(f"Error checking geofences for bus {bus_id}: {e}")
+        return []
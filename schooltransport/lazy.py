@@ -0,0 +1,104 @@
+"""
+Lazy Imports
+Heavy optional libraries (NumPy, PIL, OpenCV, scikit-image, Twilio,
+Firebase) are bound to module proxies that import the real module on first
+attribute access, so web workers, management commands and test runs that
+never touch biometrics or fleet math don't pay for loading them.
+
+Workers that will serve those requests can load them up front instead with
+PRELOAD_MODULES (e.g. PRELOAD_MODULES=biometric for scanner-facing workers),
+which is applied when the app registry is ready.
+"""
+
+import importlib.util
+import logging
+import sys
+import threading
+import time
+import types
+
+logger = logging.getLogger(__name__)
+
+# Named groups accepted by PRELOAD_MODULES besides plain module names
+PRELOAD_GROUPS = {
+    'biometric': ['numpy', 'PIL.Image', 'cv2', 'skimage.morphology'],
+    'geo': ['numpy'],
+    'notifications': ['twilio.rest', 'firebase_admin', 'firebase_admin.messaging'],
+}
+
+_lock = threading.RLock()
+
+
+def _import(name):
+    # __import__ rather than importlib.import_module so -X importtime reports it
+    __import__(name)
+    return sys.modules[name]
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stands in for a module until one of its attributes is read. The real
+    module's namespace is then copied onto the proxy, so later lookups are
+    plain attribute reads with no __getattr__ call.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with _lock:
+                if self._module is None:
+                    module = _import(self.__name__)
+                    self.__dict__.update(module.__dict__)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, name):
+        # Only reached for names not copied yet (or set later on the real module)
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<lazy module {self.__name__!r} ({state})>'
+
+
+def is_available(name):
+    """True if the module can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def lazy_import(name):
+    """A proxy for the named module; the import happens on first use"""
+    return LazyModule(name)
+
+
+def preload(names):
+    """
+    Import modules (or PRELOAD_GROUPS names) now rather than on first use.
+    Missing or broken optional modules are logged and skipped. Returns the
+    seconds spent per module.
+    """
+    timings = {}
+    for entry in names:
+        for name in PRELOAD_GROUPS.get(entry, [entry]):
+            if name in timings:
+                continue
+            started = time.perf_counter()
+            try:
+                _import(name)
+            except Exception as e:
+                logger.warning(f"Could not preload {name}: {e}")
+                continue
+            timings[name] = time.perf_counter() - started
+    if timings:
+        logger.info('Preloaded ' + ', '.join(f'{name} ({seconds * 1000:.0f} ms)'
+                                             for name, seconds in timings.items()))
+    return timings
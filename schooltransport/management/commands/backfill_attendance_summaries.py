@@ -0,0 +1,54 @@
+"""
+Rebuild daily attendance summaries from StudentAttendance rows
+Usage: python manage_app.py backfill_attendance_summaries --start 2025-01-06 [--end 2025-04-04] [--school 1]
+"""
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schooltransport.attendance import rebuild_summaries
+from schooltransport.models import School, StudentAttendance
+
+
+class Command(BaseCommand):
+    help = 'Rebuild DailyAttendanceSummary rows for a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat,
+                            help='First day (YYYY-MM-DD); defaults to the oldest attendance row')
+        parser.add_argument('--end', type=date.fromisoformat,
+                            help='Last day (YYYY-MM-DD); defaults to today')
+        parser.add_argument('--school', type=int, help='Only rebuild this school id')
+        parser.add_argument('--chunk-days', type=int, default=31,
+                            help='Days rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days must be at least 1')
+
+        school = None
+        if options['school']:
+            try:
+                school = School.objects.get(id=options['school'])
+            except School.DoesNotExist:
+                raise CommandError(f"School {options['school']} not found")
+
+        start = options['start'] or StudentAttendance.objects.order_by('date').values_list('date', flat=True).first()
+        end = options['end'] or date.today()
+        if start is None:
+            self.stdout.write('No attendance recorded; nothing to backfill')
+            return
+        if start > end:
+            raise CommandError('--start must not be after --end')
+
+        total = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + timedelta(days=options['chunk_days'] - 1), end)
+            written = rebuild_summaries(chunk_start, chunk_end, school=school)
+            total += written
+            self.stdout.write(f'{chunk_start} to {chunk_end}: {written} summaries')
+            chunk_start = chunk_end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {total} daily attendance summaries'))
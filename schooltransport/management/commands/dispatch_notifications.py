@@ -0,0 +1,39 @@
+"""
+Deliver queued guardian notifications (email, SMS, push) from the outbox
+Usage: python manage_app.py dispatch_notifications [--workers 8] [--once]
+"""
+
+from django.core.management.base import BaseCommand
+
+from schooltransport.notifications import OutboxDispatcher
+from schooltransport.providers import provider_metrics
+
+
+class Command(BaseCommand):
+    help = 'Run the notification outbox dispatcher'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Number of delivery threads')
+        parser.add_argument('--batch-size', type=int, help='Entries claimed per poll')
+        parser.add_argument('--poll-interval', type=float, help='Seconds to wait when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='Deliver one batch and exit')
+
+    def handle(self, *args, **options):
+        dispatcher = OutboxDispatcher(
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+        )
+
+        if options['once']:
+            processed = dispatcher.run_once()
+            dispatcher.executor.shutdown(wait=True)
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} outbox entries'))
+            for channel, metrics in provider_metrics().items():
+                self.stdout.write(f'  {channel}: {metrics}')
+            return
+
+        self.stdout.write(f'Dispatching notifications with {dispatcher.workers} workers (Ctrl+C to stop)')
+        try:
+            dispatcher.run_forever(poll_interval=options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Dispatcher stopped')
@@ -0,0 +1,53 @@
+"""
+Export attendance for a date range as CSV or NDJSON
+Usage: python manage_app.py export_attendance --start 2025-01-06 --end 2025-04-04 [--school 1] [--format ndjson] [--output term1.csv]
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schooltransport.exports import EXPORT_FORMATS, attendance_export_rows, export_lines
+from schooltransport.models import School
+
+
+class Command(BaseCommand):
+    help = 'Stream StudentAttendance with student and bus details to a file or stdout'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, required=True, help='First day (YYYY-MM-DD)')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day (YYYY-MM-DD); defaults to today')
+        parser.add_argument('--school', type=int, help='Only export this school id')
+        parser.add_argument('--bus', type=int, help='Only export this bus id')
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write; defaults to stdout')
+
+    def handle(self, *args, **options):
+        school = None
+        if options['school']:
+            try:
+                school = School.objects.get(id=options['school'])
+            except School.DoesNotExist:
+                raise CommandError(f"School {options['school']} not found")
+
+        start = options['start']
+        end = options['end'] or date.today()
+        if start > end:
+            raise CommandError('--start must not be after --end')
+
+        rows = attendance_export_rows(start, end, school=school, bus_id=options['bus'])
+        lines = export_lines(rows, options['format'])
+
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        written = 0
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            for line in lines:
+                output.write(line)
+                written += 1
+        if options['format'] == 'csv':
+            written -= 1  # header
+        self.stdout.write(self.style.SUCCESS(f"Exported {written} attendance rows to {options['output']}"))
@@ -0,0 +1,27 @@
+"""
+Re-segment trips from stored GPS history (after changing TRIP_* settings or importing fixes)
+Usage: python manage_app.py rebuild_trips [--bus 3]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schooltransport.models import Bus
+from schooltransport.segmentation import rebuild_trips
+
+
+class Command(BaseCommand):
+    help = 'Replace BusTrip rows with trips segmented from BusLocation history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bus', type=int, help='Only rebuild this bus id')
+
+    def handle(self, *args, **options):
+        buses = Bus.objects.all()
+        if options['bus']:
+            buses = buses.filter(id=options['bus'])
+            if not buses.exists():
+                raise CommandError(f"Bus {options['bus']} not found")
+
+        for bus_id, registration in buses.values_list('id', 'registration_number'):
+            trips = rebuild_trips(bus_id)
+            self.stdout.write(f'{registration}: {trips} trips')
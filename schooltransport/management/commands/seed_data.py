@@ -0,0 +1,60 @@
+"""
+Generate a large, deterministic synthetic dataset for performance work
+Usage: python manage_app.py seed_data [--schools 10] [--buses-per-school 20] [--students-per-bus 40] [--days 90] [--seed 1]
+"""
+
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schooltransport.seeding import PREFIX, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (f'Replace the {PREFIX} seed dataset with schools, buses, routes, students, guardians and '
+            'months of GPS, attendance and notification history')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schools', type=int, default=2)
+        parser.add_argument('--buses-per-school', type=int, default=5)
+        parser.add_argument('--students-per-bus', type=int, default=30)
+        parser.add_argument('--stops', type=int, default=10, help='Stops per route')
+        parser.add_argument('--days', type=int, default=60, help='Calendar days of history (weekdays only)')
+        parser.add_argument('--fixes-per-trip', type=int, default=40,
+                            help='GPS fixes per trip; two trips per bus per school day')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day of history (YYYY-MM-DD); defaults to today')
+        parser.add_argument('--seed', type=int, default=1, help='Same seed and arguments give the same data')
+        parser.add_argument('--password', help='Password for every seeded user; by default they cannot log in')
+        parser.add_argument('--chunk', type=int, default=5000, help='Objects per bulk_create call')
+
+    def handle(self, *args, **options):
+        for name in ('schools', 'buses_per_school', 'students_per_bus', 'stops', 'days', 'chunk'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
+        if options['fixes_per_trip'] < 2:
+            raise CommandError('--fixes-per-trip must be at least 2')
+
+        started = time.perf_counter()
+        counts = seed_dataset(
+            schools=options['schools'],
+            buses_per_school=options['buses_per_school'],
+            students_per_bus=options['students_per_bus'],
+            stops_per_route=options['stops'],
+            days=options['days'],
+            fixes_per_trip=options['fixes_per_trip'],
+            seed=options['seed'],
+            end_date=options['end'],
+            password=options['password'],
+            chunk=options['chunk'],
+            log=self.stdout.write,
+        )
+        elapsed = time.perf_counter() - started
+
+        total = sum(counts.values())
+        for table, count in sorted(counts.items()):
+            self.stdout.write(f'{table}: {count:,}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {total:,} history rows in {elapsed:.1f} s ({total / elapsed:,.0f} rows/s). '
+            'Run rebuild_trips to segment the GPS history into trips.'
+        ))
@@ -0,0 +1,54 @@
+"""
+Recompute arrival estimates for the whole fleet in one pass
+Usage: python manage_app.py update_etas [--interval 15]
+
+Runs in its own process, so its cache writes and channel layer messages only
+reach the ASGI server through a shared cache and channel layer (e.g. Redis).
+With the default process-local backends, ETAs are kept current by
+ETA_UPDATE_ON_FIX instead and this command refuses to run.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from schooltransport.eta import update_fleet_etas
+from schooltransport.versions import PROCESS_LOCAL_CACHES
+
+
+PROCESS_LOCAL_CHANNEL_LAYERS = (
+    'channels.layers.InMemoryChannelLayer',
+)
+
+
+class Command(BaseCommand):
+    help = 'Recompute, cache and publish ETAs for every active bus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Repeat every N seconds instead of running once')
+
+    def check_shared_backends(self):
+        cache_backend = settings.CACHES['default']['BACKEND']
+        layer_backend = getattr(settings, 'CHANNEL_LAYERS', {}).get('default', {}).get('BACKEND')
+        problems = []
+        if cache_backend in PROCESS_LOCAL_CACHES:
+            problems.append(f'CACHES uses {cache_backend}')
+        if layer_backend is None or layer_backend in PROCESS_LOCAL_CHANNEL_LAYERS:
+            problems.append(f'CHANNEL_LAYERS uses {layer_backend or "no backend"}')
+        if problems:
+            raise CommandError(
+                f"{' and '.join(problems)}, which the ASGI server cannot see from this process. "
+                'Configure a shared cache and channel layer (e.g. Redis), or rely on ETA_UPDATE_ON_FIX.'
+            )
+
+    def handle(self, *args, **options):
+        self.check_shared_backends()
+        while True:
+            started = time.perf_counter()
+            updated = update_fleet_etas()
+            self.stdout.write(f'Updated ETAs for {updated} buses in {(time.perf_counter() - started) * 1000:.1f}ms')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
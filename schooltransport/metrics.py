@@ -0,0 +1,258 @@
+"""
+In-process Metrics
+Bucketed histograms for latency-style measurements, the per-view request
+statistics collected by RequestMetricsMiddleware and the WebSocket consumer
+statistics collected by consumers.InstrumentedConsumer. Everything lives in
+the memory of the current process, so each Daphne/WSGI worker reports its
+own numbers; they reset when the worker restarts.
+
+prometheus_text() renders all of it in the Prometheus text exposition
+format for the /metrics/ endpoint.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+# Upper bounds of the histogram buckets; values above the last go to an overflow bucket
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 20, 50, 100, 200, 500)
+
+_lock = threading.Lock()
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. Percentiles are interpolated inside the bucket
+    that holds the requested rank, so they are estimates with the bucket
+    width as resolution; memory stays constant however many values are seen.
+    Not thread-safe on its own: callers hold the module lock.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        """Estimated q-th percentile (0-100), or None before any observation"""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if i == len(self.buckets):
+                    return self.max
+                lower = self.buckets[i - 1] if i else 0
+                upper = min(self.buckets[i], self.max)
+                return lower + (upper - lower) * max(rank - seen, 0) / count
+            seen += count
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': round(self.sum / self.count, 2) if self.count else None,
+            'p50': _round(self.percentile(50)),
+            'p95': _round(self.percentile(95)),
+            'p99': _round(self.percentile(99)),
+            'max': round(self.max, 2),
+        }
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+# ==================== REQUESTS ====================
+
+class RequestStats:
+    """Everything recorded for one URL name"""
+
+    def __init__(self):
+        self.duration_ms = Histogram()
+        self.sql_ms = Histogram()
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.response_bytes = 0
+        self.statuses = Counter()
+        self.slow = 0
+
+
+_requests = {}
+
+
+def record_request(view, status, duration_ms, queries, sql_ms, size, slow=False):
+    """Add one request to the statistics of `view` (its URL name)"""
+    with _lock:
+        stats = _requests.get(view)
+        if stats is None:
+            stats = _requests[view] = RequestStats()
+        stats.duration_ms.observe(duration_ms)
+        stats.sql_ms.observe(sql_ms)
+        stats.queries.observe(queries)
+        stats.response_bytes += size or 0
+        stats.statuses[status] += 1
+        stats.slow += slow
+
+
+def request_metrics():
+    """Per-view summaries, slowest p95 first"""
+    with _lock:
+        views = [{
+            'view': view,
+            'requests': stats.duration_ms.count,
+            'slow': stats.slow,
+            'statuses': {str(status): count for status, count in sorted(stats.statuses.items())},
+            'duration_ms': stats.duration_ms.summary(),
+            'sql_ms': stats.sql_ms.summary(),
+            'queries': stats.queries.summary(),
+            'avg_response_bytes': round(stats.response_bytes / stats.duration_ms.count),
+        } for view, stats in _requests.items()]
+    return sorted(views, key=lambda v: v['duration_ms']['p95'], reverse=True)
+
+
+def reset_request_metrics():
+    with _lock:
+        _requests.clear()
+
+
+# ==================== WEBSOCKETS ====================
+
+class RateMeter:
+    """Events per second averaged over the last `window` seconds"""
+
+    def __init__(self, window=60):
+        self.window = window
+        self.slots = {}
+
+    def mark(self, now=None):
+        second = int(time.monotonic() if now is None else now)
+        self.slots[second] = self.slots.get(second, 0) + 1
+        if len(self.slots) > 2 * self.window:
+            cutoff = second - self.window
+            self.slots = {s: n for s, n in self.slots.items() if s > cutoff}
+
+    def rate(self, now=None):
+        cutoff = int(time.monotonic() if now is None else now) - self.window
+        return sum(n for s, n in self.slots.items() if s > cutoff) / self.window
+
+
+_connections = Counter()  # (consumer, group) -> open connections
+_messages = Counter()  # (consumer, direction) -> messages since start
+_message_rates = {}  # (consumer, direction) -> RateMeter
+_receive_ms = {}  # consumer -> Histogram of receive handler latency
+_db_call_ms = {}  # call name -> Histogram of database_sync_to_async latency
+
+
+def connection_opened(consumer, group):
+    with _lock:
+        _connections[(consumer, group)] += 1
+
+
+def connection_closed(consumer, group):
+    with _lock:
+        _connections[(consumer, group)] -= 1
+        if _connections[(consumer, group)] <= 0:
+            del _connections[(consumer, group)]
+
+
+def record_message(consumer, direction):
+    """Count one WebSocket frame; direction is 'in' or 'out'"""
+    with _lock:
+        _messages[(consumer, direction)] += 1
+        meter = _message_rates.get((consumer, direction))
+        if meter is None:
+            meter = _message_rates[(consumer, direction)] = RateMeter()
+        meter.mark()
+
+
+def _observe(histograms, name, value):
+    with _lock:
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.observe(value)
+
+
+def record_receive(consumer, duration_ms):
+    _observe(_receive_ms, consumer, duration_ms)
+
+
+def record_db_call(name, duration_ms):
+    _observe(_db_call_ms, name, duration_ms)
+
+
+def reset_consumer_metrics():
+    with _lock:
+        for store in (_connections, _messages, _message_rates, _receive_ms, _db_call_ms):
+            store.clear()
+
+
+# ==================== EXPOSITION ====================
+
+def _labels(**labels):
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+
+def _metric(lines, name, kind, help_text):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+
+
+def _histogram_lines(lines, name, histogram, scale=1000, **labels):
+    """Histogram samples; `scale` converts the stored milliseconds to seconds"""
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{_labels(**labels, le=f"{bound / scale:g}")} {cumulative}')
+    lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {histogram.count}')
+    lines.append(f'{name}_sum{_labels(**labels)} {histogram.sum / scale:g}')
+    lines.append(f'{name}_count{_labels(**labels)} {histogram.count}')
+
+
+def prometheus_text():
+    """All metrics of this process in the Prometheus text format (version 0.0.4)"""
+    lines = []
+    with _lock:
+        _metric(lines, 'safari_ws_connections', 'gauge', 'Open WebSocket connections per consumer and group')
+        for (consumer, group), n in sorted(_connections.items()):
+            lines.append(f'safari_ws_connections{_labels(consumer=consumer, group=group)} {n}')
+
+        _metric(lines, 'safari_ws_messages_total', 'counter', 'WebSocket frames received (in) and sent (out)')
+        for (consumer, direction), n in sorted(_messages.items()):
+            lines.append(f'safari_ws_messages_total{_labels(consumer=consumer, direction=direction)} {n}')
+
+        _metric(lines, 'safari_ws_messages_per_second', 'gauge', 'WebSocket frames per second over the last minute')
+        for (consumer, direction), meter in sorted(_message_rates.items()):
+            lines.append(f'safari_ws_messages_per_second{_labels(consumer=consumer, direction=direction)} '
+                         f'{meter.rate():g}')
+
+        _metric(lines, 'safari_ws_receive_seconds', 'histogram', 'Time spent in consumer receive handlers')
+        for consumer, histogram in sorted(_receive_ms.items()):
+            _histogram_lines(lines, 'safari_ws_receive_seconds', histogram, consumer=consumer)
+
+        _metric(lines, 'safari_ws_db_call_seconds', 'histogram',
+                'Time awaiting database_sync_to_async calls, including the wait for a worker thread')
+        for call, histogram in sorted(_db_call_ms.items()):
+            _histogram_lines(lines, 'safari_ws_db_call_seconds', histogram, call=call)
+
+        _metric(lines, 'safari_http_request_seconds', 'histogram', 'HTTP request wall time per URL name')
+        for view, stats in sorted(_requests.items()):
+            _histogram_lines(lines, 'safari_http_request_seconds', stats.duration_ms, view=view)
+
+        _metric(lines, 'safari_http_sql_seconds', 'histogram', 'Time spent in SQL per request and URL name')
+        for view, stats in sorted(_requests.items()):
+            _histogram_lines(lines, 'safari_http_sql_seconds', stats.sql_ms, view=view)
+
+    return '\n'.join(lines) + '\n'
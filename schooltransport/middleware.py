@@ -0,0 +1,142 @@
+"""
+Request Instrumentation
+RequestMetricsMiddleware times every request and counts the SQL it runs,
+then records wall time, query count, SQL time and response size under the
+URL name in metrics.py. Each request is written as a JSON line to the
+'schooltransport.performance' logger; requests slower than REQUEST_SLOW_MS
+are also logged as warnings.
+
+The middleware is sync and async capable, so under ASGI requests to async
+views (the guardian event stream) never leave the event loop for it. Queries
+are counted by an execute wrapper installed on every connection, which adds
+them to the timer of the request in the current context; asgiref copies that
+context into the threads sync views run on, whichever connection they use.
+
+Queries run while a StreamingHttpResponse is consumed happen after the
+middleware returns and are not counted; streaming responses report no size.
+"""
+
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.functional import empty
+
+from .metrics import record_request
+
+logger = logging.getLogger(__name__)
+performance_logger = logging.getLogger('schooltransport.performance')
+
+
+class QueryTimer:
+    """connection.execute_wrapper that counts queries and their total time"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+_request_queries = ContextVar('request_queries', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper timing queries for the request being handled, if any"""
+    queries = _request_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    return queries(execute, sql, params, many, context)
+
+
+def install_query_recorder(db_connection):
+    # First, so execute_wrapper() blocks pushed later still pop their own wrapper
+    if record_query not in db_connection.execute_wrappers:
+        db_connection.execute_wrappers.insert(0, record_query)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.REQUEST_METRICS_ENABLED:
+            return self.get_response(request)
+
+        # Connections opened before this module was imported
+        install_query_recorder(connection)
+        queries = QueryTimer()
+        token = _request_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        user_id = getattr(getattr(request, 'user', None), 'id', None)
+        self.record(request, response, queries, (time.perf_counter() - started) * 1000, user_id)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.REQUEST_METRICS_ENABLED:
+            return await self.get_response(request)
+
+        queries = QueryTimer()
+        token = _request_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        # Only a user the view already loaded: loading it here would query from the event loop
+        user = getattr(getattr(request, 'user', None), '_wrapped', empty)
+        user_id = None if user is empty else getattr(user, 'id', None)
+        self.record(request, response, queries, (time.perf_counter() - started) * 1000, user_id)
+        return response
+
+    def record(self, request, response, queries, duration_ms, user_id):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        size = None if response.streaming else len(response.content)
+        sql_ms = queries.seconds * 1000
+        slow = duration_ms >= settings.REQUEST_SLOW_MS
+
+        record_request(view, response.status_code, duration_ms, queries.count, sql_ms, size, slow)
+        performance_logger.info(json.dumps({
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+            'queries': queries.count,
+            'sql_ms': round(sql_ms, 2),
+            'bytes': size,
+            'user_id': user_id,
+            'slow': slow,
+        }))
+        if slow:
+            logger.warning(f"Slow request: {request.method} {request.path} ({view}) took {duration_ms:.0f}ms, "
+                           f"{queries.count} queries in {sql_ms:.0f}ms")
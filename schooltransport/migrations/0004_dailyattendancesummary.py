@@ -0,0 +1,32 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schooltransport', '0003_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('enrolled', models.IntegerField(default=0)),
+                ('boarded', models.IntegerField(default=0)),
+                ('alighted', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('biometric_failures', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('bus', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attendance_summaries', to='schooltransport.bus')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='schooltransport.school')),
+            ],
+            options={
+                'db_table': 'daily_attendance_summaries',
+                'ordering': ['-date', 'bus'],
+                'unique_together': {('school', 'bus', 'date')},
+            },
+        ),
+    ]
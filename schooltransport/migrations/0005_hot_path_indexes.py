@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schooltransport', '0004_dailyattendancesummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentattendance',
+            index=models.Index(fields=['student', 'bus', 'date', '-timestamp'], name='student_att_student_e3770c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient', '-created_at'], name='notifications_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'recipient', 'id'], name='messages_sender__9ac1f8_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+import re
+
+from django.db import migrations, models
+
+
+def copy_legacy_route_fields(apps, schema_editor):
+    """
+    Convert '2 hours' / '45 minutes' to minutes, and keep the old stop list
+    and distance (km) in the description so no entered value is lost
+    """
+    Route = apps.get_model('schooltransport', 'Route')
+    for route in Route.objects.all():
+        match = re.match(r'\s*(\d+(?:\.\d+)?)\s*(h|hr|hour)?', route.estimated_time or '', re.IGNORECASE)
+        if match:
+            value = float(match.group(1))
+            route.estimated_duration = round(value * 60 if match.group(2) else value)
+        legacy = []
+        if route.stop_list:
+            legacy.append(f"Stops: {route.stop_list}")
+        if route.distance:
+            legacy.append(f"Distance: {route.distance:g} km")
+        if legacy:
+            route.description = '\n'.join(legacy)
+        route.save(update_fields=['estimated_duration', 'description'])
+
+
+class Migration(migrations.Migration):
+    """
+    Bring the routes table in line with the Route model: route_name becomes
+    name, estimated_time (free text) becomes estimated_duration in minutes,
+    and the comma-separated stop_list/distance are replaced by RouteStop rows
+    (the route length is now computed from the stops, see route_cache.py).
+    """
+
+    dependencies = [
+        ('schooltransport', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='route',
+            old_name='route_name',
+            new_name='name',
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='description',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='estimated_duration',
+            field=models.IntegerField(default=0, help_text='In minutes'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_legacy_route_fields, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='route',
+            name='distance',
+        ),
+        migrations.RemoveField(
+            model_name='route',
+            name='estimated_time',
+        ),
+        migrations.RemoveField(
+            model_name='route',
+            name='stop_list',
+        ),
+    ]
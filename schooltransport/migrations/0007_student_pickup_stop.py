@@ -0,0 +1,22 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schooltransport', '0006_sync_route_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='pickup_stop',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='students', to='schooltransport.routestop'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('boarded', 'Student Boarded Bus'), ('alighted', 'Student Alighted Bus'), ('delayed', 'Bus Delayed'), ('arrived', 'Bus Arrived at School'), ('approaching', 'Bus Approaching Stop'), ('system_alert', 'System Alert')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schooltransport', '0007_student_pickup_stop'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusTrip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('end_reason', models.CharField(blank=True, choices=[('school', 'Arrived at School'), ('gap', 'GPS Gap'), ('parked', 'Parked')], max_length=10)),
+                ('start_latitude', models.FloatField()),
+                ('start_longitude', models.FloatField()),
+                ('last_latitude', models.FloatField()),
+                ('last_longitude', models.FloatField()),
+                ('last_fix_at', models.DateTimeField()),
+                ('distance_m', models.FloatField(default=0)),
+                ('duration_seconds', models.IntegerField(default=0)),
+                ('max_speed_kmh', models.FloatField(default=0)),
+                ('fix_count', models.IntegerField(default=0)),
+                ('stop_count', models.IntegerField(default=0)),
+                ('dwell_seconds', models.IntegerField(default=0)),
+                ('stationary_since', models.DateTimeField(blank=True, null=True)),
+                ('bus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trips', to='schooltransport.bus')),
+            ],
+            options={
+                'db_table': 'bus_trips',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BusTripStop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('duration_seconds', models.IntegerField()),
+                ('route_stop', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='dwells', to='schooltransport.routestop')),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stops', to='schooltransport.bustrip')),
+            ],
+            options={
+                'db_table': 'bus_trip_stops',
+                'ordering': ['trip', 'started_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='bustrip',
+            index=models.Index(fields=['bus', '-started_at'], name='bus_trips_bus_id_f74706_idx'),
+        ),
+    ]
@@ -26,6 +26,28 @@ ATTENDANCE_STATUS = (
     ('alighted', 'Alighted'),
 )
 
+# Notification Delivery Channels
+DELIVERY_CHANNELS = (
+    ('email', 'Email'),
+    ('sms', 'SMS'),
+    ('push', 'Push Notification'),
+)
+
+# Why a trip ended
+TRIP_END_REASONS = (
+    ('school', 'Arrived at School'),
+    ('gap', 'GPS Gap'),
+    ('parked', 'Parked'),
+)
+
+# Outbox Status
+OUTBOX_STATUS = (
+    ('pending', 'Pending'),
+    ('sending', 'Sending'),
+    ('sent', 'Sent'),
+    ('failed', 'Failed'),
+)
+
 
 class UserProfile(models.Model):
     """Extended user profile to store user type and additional information"""
@@ -99,6 +121,9 @@ class Student(models.Model):
                                  limit_choices_to={'profile__user_type': 'guardian'},
                                  related_name='students')
     bus = models.ForeignKey(Bus, on_delete=models.SET_NULL, null=True, blank=True, related_name='students')
+    # Stop where the bus picks the student up; guardians get an alert as the bus approaches it
+    pickup_stop = models.ForeignKey('RouteStop', on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='students')
     registration_number = models.CharField(max_length=50, unique=True)
     first_name = models.CharField(max_length=100, null=True, blank=True)
     last_name = models.CharField(max_length=100, null=True, blank=True)
@@ -148,6 +173,35 @@ class StudentAttendance(models.Model):
     class Meta:
         db_table = 'student_attendance'
         ordering = ['-timestamp']
+        indexes = [
+            # Today's latest status for a student on a bus (student_status)
+            models.Index(fields=['student', 'bus', 'date', '-timestamp']),
+        ]
+
+
+class DailyAttendanceSummary(models.Model):
+    """Attendance counts per school, bus and day, kept up to date on every attendance write"""
+    school = models.ForeignKey(School, on_delete=models.CASCADE, related_name='attendance_summaries')
+    bus = models.ForeignKey(Bus, on_delete=models.SET_NULL, null=True, blank=True,
+                            related_name='attendance_summaries')
+    date = models.DateField()
+
+    enrolled = models.IntegerField(default=0)  # Students assigned to the bus when the day started
+    boarded = models.IntegerField(default=0)  # Boarding events
+    alighted = models.IntegerField(default=0)  # Alighting events
+    absent = models.IntegerField(default=0)  # Enrolled students with no boarding yet
+    biometric_failures = models.IntegerField(default=0)  # Unverified check-ins and failed scans
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        bus = self.bus.registration_number if self.bus else 'No bus'
+        return f"{self.school.name} - {bus} - {self.date}"
+
+    class Meta:
+        db_table = 'daily_attendance_summaries'
+        ordering = ['-date', 'bus']
+        unique_together = [('school', 'bus', 'date')]
 
 
 class BusLocation(models.Model):
@@ -171,6 +225,57 @@ class BusLocation(models.Model):
         ]
 
 
+class BusTrip(models.Model):
+    """A journey reconstructed from a bus's GPS fixes (see segmentation.py)"""
+    bus = models.ForeignKey(Bus, on_delete=models.CASCADE, related_name='trips')
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField(null=True, blank=True)  # Null while the trip is in progress
+    end_reason = models.CharField(max_length=10, choices=TRIP_END_REASONS, blank=True)
+
+    start_latitude = models.FloatField()
+    start_longitude = models.FloatField()
+    last_latitude = models.FloatField()  # Latest fix; the end point once the trip is over
+    last_longitude = models.FloatField()
+    last_fix_at = models.DateTimeField()
+
+    distance_m = models.FloatField(default=0)
+    duration_seconds = models.IntegerField(default=0)
+    max_speed_kmh = models.FloatField(default=0)
+    fix_count = models.IntegerField(default=0)
+    stop_count = models.IntegerField(default=0)  # Dwell periods recorded in stops
+    dwell_seconds = models.IntegerField(default=0)  # Total time spent in them
+    stationary_since = models.DateTimeField(null=True, blank=True)  # Start of the current halt
+
+    def __str__(self):
+        return f"{self.bus.registration_number} trip at {self.started_at}"
+
+    class Meta:
+        db_table = 'bus_trips'
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['bus', '-started_at']),
+        ]
+
+
+class BusTripStop(models.Model):
+    """A period a bus stood still during a trip, matched to a route stop when close to one"""
+    trip = models.ForeignKey(BusTrip, on_delete=models.CASCADE, related_name='stops')
+    route_stop = models.ForeignKey('RouteStop', on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='dwells')
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+    duration_seconds = models.IntegerField()
+
+    def __str__(self):
+        return f"{self.trip} - stopped {self.duration_seconds}s at {self.started_at}"
+
+    class Meta:
+        db_table = 'bus_trip_stops'
+        ordering = ['trip', 'started_at']
+
+
 class Notification(models.Model):
     """Send notifications to guardians"""
     NOTIFICATION_TYPES = (
@@ -178,6 +283,7 @@ class Notification(models.Model):
         ('alighted', 'Student Alighted Bus'),
         ('delayed', 'Bus Delayed'),
         ('arrived', 'Bus Arrived at School'),
+        ('approaching', 'Bus Approaching Stop'),
         ('system_alert', 'System Alert'),
     )
 
@@ -206,12 +312,47 @@ class Notification(models.Model):
     class Meta:
         db_table = 'notifications'
         ordering = ['-created_at']
+        indexes = [
+            # Unread notifications, newest first (get_notifications). Partial, because
+            # SQLite compiles is_read=False to NOT "is_read", which the planner
+            # will not match to an is_read column in a composite index
+            models.Index(fields=['recipient', '-created_at'], condition=models.Q(is_read=False),
+                         name='notifications_unread_idx'),
+        ]
+
+
+class NotificationOutbox(models.Model):
+    """Pending email/SMS/push deliveries, written in the same transaction as the Notification"""
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='outbox_entries')
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='outbox_entries')
+    channel = models.CharField(max_length=10, choices=DELIVERY_CHANNELS)
+    destination = models.CharField(max_length=255)  # Email address, phone number or FCM token
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+
+    status = models.CharField(max_length=10, choices=OUTBOX_STATUS, default='pending')
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)  # Also the lease expiry while sending
+    last_error = models.TextField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_channel_display()} to {self.destination} - {self.status}"
+
+    class Meta:
+        db_table = 'notification_outbox'
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
 
 
 class Route(models.Model):
     """Define bus routes"""
     school = models.ForeignKey(School, on_delete=models.CASCADE, related_name='routes')
-    bus = models.ForeignKey(Bus, on_delete=models.CASCADE, related_name='routes')
+    bus = models.ForeignKey(Bus, on_delete=models.SET_NULL, null=True, blank=True, related_name='routes')
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     start_location = models.CharField(max_length=255)
@@ -221,7 +362,7 @@ class Route(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.name} - {self.bus.registration_number}"
+        return f"{self.name} - {self.bus.registration_number if self.bus else 'Unassigned'}"
 
     class Meta:
         db_table = 'routes'
@@ -298,3 +439,7 @@ class Message(models.Model):
     class Meta:
         db_table = 'messages'
         ordering = ['-timestamp']
+        indexes = [
+            # Conversation between two users, paged by id (get_messages)
+            models.Index(fields=['sender', 'recipient', 'id']),
+        ]
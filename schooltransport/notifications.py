@@ -0,0 +1,317 @@
+"""
+Notification Delivery Module
+Guardian alerts are stored in an outbox in the same transaction as the
+Notification row and delivered by a background dispatcher, so check-in and
+check-out requests never wait on an email, SMS or push provider.
+"""
+
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Notification, NotificationOutbox
+from .providers import NOTIFICATION_TITLE, SMS_LIMIT, get_provider, provider_metrics, reset_providers
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ==================== ENQUEUEING ====================
+
+def create_guardian_notification(student, message, notification_type, bus=None):
+    """
+    Create a Notification for the student's guardian together with its
+    outbox entries. Returns the Notification, or None if there is no guardian.
+    """
+    guardian = student.guardian
+
+    if not guardian:
+        return None
+
+    with transaction.atomic():
+        notification = Notification.objects.create(
+            recipient=guardian,
+            student=student,
+            bus=bus,
+            title=NOTIFICATION_TITLE,
+            message=message,
+            notification_type=notification_type
+        )
+        enqueue_deliveries(notification)
+
+    return notification
+
+
+def enqueue_deliveries(notification):
+    """
+    Write one outbox entry per channel the recipient can be reached on.
+    Entries are held for NOTIFICATION_COALESCE_WINDOW seconds so that other
+    events for the same guardian (e.g. siblings boarding the same bus) are
+    merged into a single message.
+    """
+    recipient = notification.recipient
+    deliver_after = timezone.now() + timedelta(seconds=_setting('NOTIFICATION_COALESCE_WINDOW', 15))
+    entries = []
+
+    if recipient.email:
+        entries.append(NotificationOutbox(
+            notification=notification,
+            recipient=recipient,
+            channel='email',
+            destination=recipient.email,
+            subject=notification.title,
+            body=notification.message,
+            next_attempt_at=deliver_after,
+        ))
+
+    profile = getattr(recipient, 'profile', None)
+    if profile is not None and profile.phone_number:
+        entries.append(NotificationOutbox(
+            notification=notification,
+            recipient=recipient,
+            channel='sms',
+            destination=profile.phone_number,
+            body=notification.message,
+            next_attempt_at=deliver_after,
+        ))
+
+    if notification.fcm_token:
+        entries.append(NotificationOutbox(
+            notification=notification,
+            recipient=recipient,
+            channel='push',
+            destination=notification.fcm_token,
+            subject=notification.title,
+            body=notification.message,
+            next_attempt_at=deliver_after,
+        ))
+
+    return NotificationOutbox.objects.bulk_create(entries)
+
+
+METRICS_LOG_INTERVAL = 60  # seconds between provider metrics log lines
+
+# Channels whose provider accepts many messages per call/connection.
+# SMS is sent one message per task so slow Twilio calls run in parallel.
+BULK_CHANNELS = ('email', 'push')
+
+
+# ==================== COALESCING ====================
+
+class Delivery:
+    """One provider message covering one or more coalesced outbox entries"""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.channel = entries[0].channel
+        self.destination = entries[0].destination
+        self.subject = entries[0].subject
+        self.body = merge_bodies(entries, self.channel)
+
+
+def merge_bodies(entries, channel):
+    """Join distinct messages in the order they were queued"""
+    bodies = []
+    for entry in sorted(entries, key=lambda e: e.created_at):
+        if entry.body not in bodies:
+            bodies.append(entry.body)
+    separator = '; ' if channel == 'sms' else '\n'
+    return separator.join(bodies)
+
+
+def sms_chunks(entries):
+    """
+    Split entries so each merged SMS fits in SMS_LIMIT characters. A single
+    message that is already longer than the limit is sent on its own.
+    """
+    chunks, current = [], []
+    for entry in sorted(entries, key=lambda e: e.created_at):
+        if current and len(merge_bodies(current + [entry], 'sms')) > SMS_LIMIT:
+            chunks.append(current)
+            current = []
+        current.append(entry)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def coalesce(entries):
+    """Group outbox entries for the same recipient, channel and destination"""
+    groups = {}
+    for entry in entries:
+        key = (entry.recipient_id, entry.channel, entry.destination)
+        groups.setdefault(key, []).append(entry)
+
+    deliveries = []
+    for (_, channel, _), group in groups.items():
+        if channel == 'sms':
+            deliveries.extend(Delivery(chunk) for chunk in sms_chunks(group))
+        else:
+            deliveries.append(Delivery(group))
+    return deliveries
+
+
+# ==================== DISPATCHER ====================
+
+class OutboxDispatcher:
+    """
+    Delivers pending outbox entries with a pool of worker threads.
+    Entries for the same guardian and channel are merged into one message, and
+    email/push go to the provider in bulk. Failed deliveries are retried with
+    exponential backoff until NOTIFICATION_OUTBOX_MAX_ATTEMPTS is reached.
+    """
+
+    def __init__(self, workers=None, batch_size=None, max_attempts=None,
+                 backoff_base=None, backoff_max=None, lease_seconds=None):
+        self.workers = workers or _setting('NOTIFICATION_OUTBOX_WORKERS', 4)
+        self.batch_size = batch_size or _setting('NOTIFICATION_OUTBOX_BATCH_SIZE', 50)
+        self.max_attempts = max_attempts or _setting('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 6)
+        self.backoff_base = backoff_base or _setting('NOTIFICATION_OUTBOX_BACKOFF_BASE', 5)
+        self.backoff_max = backoff_max or _setting('NOTIFICATION_OUTBOX_BACKOFF_MAX', 900)
+        self.lease_seconds = lease_seconds or _setting('NOTIFICATION_OUTBOX_LEASE', 120)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers,
+                                           thread_name_prefix='outbox')
+
+    def backoff(self, attempts):
+        """Seconds to wait before retry number `attempts`, with 10% jitter"""
+        delay = min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+        return delay + random.uniform(0, delay * 0.1)
+
+    def claim_batch(self):
+        """
+        Claim due entries by moving them to 'sending' with a lease. Pending
+        entries for the same recipient and channel are claimed with them even if
+        their coalescing window is still open, so they go out in one message;
+        siblings waiting out a retry backoff are left until they are due.
+        Claiming counts as an attempt, so an entry whose lease expired (the
+        dispatcher died mid-send) is claimed again only until it reaches
+        max_attempts and is then marked failed, even if it crashes every send.
+        """
+        now = timezone.now()
+        due = Q(status='pending') | Q(status='sending')
+
+        with transaction.atomic():
+            stranded = NotificationOutbox.objects.filter(
+                status='sending', next_attempt_at__lte=now, attempts__gte=self.max_attempts
+            )
+            for entry_id, channel in stranded.values_list('id', 'channel'):
+                logger.error(f"Giving up on {channel} outbox entry {entry_id}: "
+                             f"lease expired on each of {self.max_attempts} attempts")
+            stranded.update(status='failed', last_error='Lease expired during delivery')
+
+            due_entries = list(
+                NotificationOutbox.objects.select_for_update(skip_locked=True)
+                .filter(due, next_attempt_at__lte=now)
+                .order_by('next_attempt_at')
+                .values_list('id', 'recipient_id', 'channel')[:self.batch_size]
+            )
+            if not due_entries:
+                return []
+
+            ids = {entry_id for entry_id, _, _ in due_entries}
+            siblings = Q()
+            for recipient_id, channel in {(r, c) for _, r, c in due_entries}:
+                siblings |= Q(recipient_id=recipient_id, channel=channel)
+            ids.update(
+                NotificationOutbox.objects.select_for_update(skip_locked=True)
+                .filter(siblings, Q(attempts=0) | Q(next_attempt_at__lte=now), status='pending')
+                .values_list('id', flat=True)
+            )
+
+            NotificationOutbox.objects.filter(id__in=ids).update(
+                status='sending',
+                attempts=F('attempts') + 1,
+                next_attempt_at=now + timedelta(seconds=self.lease_seconds)
+            )
+
+        return list(NotificationOutbox.objects.filter(id__in=ids))
+
+    def send(self, channel, deliveries):
+        """Send deliveries of one channel and record the outcome of each"""
+        try:
+            results = get_provider(channel).send_batch(deliveries)
+
+            sent_ids = []
+            for delivery, error in zip(deliveries, results):
+                if error is None:
+                    sent_ids.extend(entry.id for entry in delivery.entries)
+                else:
+                    for entry in delivery.entries:
+                        self.record_failure(entry, error)
+
+            if sent_ids:
+                NotificationOutbox.objects.filter(id__in=sent_ids).update(
+                    status='sent',
+                    sent_at=timezone.now(),
+                    last_error=None
+                )
+        finally:
+            close_old_connections()
+
+    def record_failure(self, entry, error):
+        attempts = entry.attempts  # Already counts this attempt (claim_batch)
+
+        if attempts >= self.max_attempts:
+            logger.error(f"Giving up on {entry.channel} outbox entry {entry.id} after {attempts} attempts: {error}")
+            status = 'failed'
+            next_attempt_at = timezone.now()
+        else:
+            delay = self.backoff(attempts)
+            logger.warning(f"{entry.channel} outbox entry {entry.id} failed (attempt {attempts}), retrying in {delay:.0f}s: {error}")
+            status = 'pending'
+            next_attempt_at = timezone.now() + timedelta(seconds=delay)
+
+        NotificationOutbox.objects.filter(id=entry.id).update(
+            status=status,
+            attempts=attempts,
+            next_attempt_at=next_attempt_at,
+            last_error=str(error)
+        )
+
+    def run_once(self):
+        """Claim, coalesce and deliver one batch. Returns the number of entries processed."""
+        entries = self.claim_batch()
+        if not entries:
+            return 0
+
+        by_channel = {}
+        for delivery in coalesce(entries):
+            by_channel.setdefault(delivery.channel, []).append(delivery)
+
+        futures = []
+        for channel, deliveries in by_channel.items():
+            if channel in BULK_CHANNELS:
+                futures.append(self.executor.submit(self.send, channel, deliveries))
+            else:
+                futures.extend(self.executor.submit(self.send, channel, [d]) for d in deliveries)
+
+        for future in futures:
+            future.result()
+        return len(entries)
+
+    def run_forever(self, poll_interval=None):
+        poll_interval = poll_interval or _setting('NOTIFICATION_OUTBOX_POLL_INTERVAL', 2)
+        logger.info(f"Notification dispatcher started with {self.workers} workers")
+        last_report = time.monotonic()
+        try:
+            while True:
+                processed = self.run_once()
+                close_old_connections()
+                if time.monotonic() - last_report >= METRICS_LOG_INTERVAL:
+                    logger.info(f"Provider metrics: {provider_metrics()}")
+                    last_report = time.monotonic()
+                if processed < self.batch_size:
+                    time.sleep(poll_interval)
+        finally:
+            self.executor.shutdown(wait=True)
+            reset_providers()
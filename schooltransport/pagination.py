@@ -0,0 +1,58 @@
+"""
+Cursor Pagination
+Keyset pagination over (timestamp, id) for newest-first histories. A cursor
+encodes the last row of a page, so each page is one indexed range query no
+matter how deep the reader has scrolled.
+"""
+
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor from the query string cannot be decoded"""
+
+
+def encode_cursor(timestamp, pk):
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (timestamp, id) pair stored in a cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, pk = raw.rsplit('|', 1)
+        parsed = parse_datetime(timestamp)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    if parsed is None:
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return parsed, pk
+
+
+def after_cursor(queryset, cursor, field='timestamp'):
+    """Rows older than the cursor, newest first"""
+    queryset = queryset.order_by(f'-{field}', '-id')
+    if not cursor:
+        return queryset
+
+    timestamp, pk = decode_cursor(cursor)
+    return queryset.filter(Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'id__lt': pk}))
+
+
+def paginate(queryset, cursor=None, page_size=100, field='timestamp'):
+    """
+    One page of `queryset` after `cursor`, newest first.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    rows = list(after_cursor(queryset, cursor, field)[:page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, field), last.id)
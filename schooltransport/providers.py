@@ -0,0 +1,300 @@
+"""
+Notification Provider Registry
+Long-lived, thread-safe clients for email (SMTP), SMS (Twilio) and push (FCM).
+Each provider is created once per process and reused by every dispatcher
+thread; NOTIFICATION_PROVIDERS in settings selects the class per channel.
+"""
+
+import logging
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROVIDERS = {
+    'email': 'schooltransport.providers.SmtpEmailProvider',
+    'sms': 'schooltransport.providers.TwilioSmsProvider',
+    'push': 'schooltransport.providers.FirebasePushProvider',
+}
+
+NOTIFICATION_TITLE = 'Student Transportation Alert'
+FCM_BATCH_LIMIT = 500  # Maximum messages per messaging.send_each call
+SMS_LIMIT = 160
+
+
+class ProviderMetrics:
+    """Call count, message count, errors and latency for one provider"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.messages = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, messages, errors, seconds):
+        with self._lock:
+            self.calls += 1
+            self.messages += messages
+            self.errors += errors
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'messages': self.messages,
+                'errors': self.errors,
+                'avg_ms': round(self.total_seconds / self.calls * 1000, 2) if self.calls else 0.0,
+                'max_ms': round(self.max_seconds * 1000, 2),
+            }
+
+
+class BaseProvider:
+    """
+    Sends a batch of deliveries (objects with destination, subject and body).
+    send_batch returns one entry per delivery: None on success, or the
+    exception that made it fail.
+    """
+    channel = None
+
+    def __init__(self, channel=None):
+        if channel:
+            self.channel = channel
+        self.metrics = ProviderMetrics()
+
+    def send_batch(self, deliveries):
+        started = time.perf_counter()
+        try:
+            results = self._send_batch(deliveries)
+        except Exception as e:
+            results = [e] * len(deliveries)
+        elapsed = time.perf_counter() - started
+
+        errors = sum(1 for r in results if r is not None)
+        self.metrics.record(len(deliveries), errors, elapsed)
+        return results
+
+    def _send_batch(self, deliveries):
+        raise NotImplementedError
+
+    def close(self):
+        """Release any connection held by the provider"""
+
+
+class SmtpEmailProvider(BaseProvider):
+    """Email over one persistent SMTP connection, reopened if the server drops it"""
+    channel = 'email'
+
+    def __init__(self, channel=None):
+        super().__init__(channel)
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _get_connection(self):
+        from django.core.mail import get_connection
+
+        if self._connection is None:
+            self._connection = get_connection(fail_silently=False)
+        self._connection.open()
+        return self._connection
+
+    def _send_one(self, connection, delivery):
+        from django.core.mail import EmailMessage
+
+        EmailMessage(
+            delivery.subject or NOTIFICATION_TITLE,
+            delivery.body,
+            settings.DEFAULT_FROM_EMAIL,
+            [delivery.destination],
+            connection=connection,
+        ).send()
+
+    def _send_batch(self, deliveries):
+        results = []
+        # smtplib connections are not thread-safe; threads take turns on the one connection
+        with self._lock:
+            for delivery in deliveries:
+                try:
+                    try:
+                        self._send_one(self._get_connection(), delivery)
+                    except smtplib.SMTPServerDisconnected:
+                        self.close()
+                        self._send_one(self._get_connection(), delivery)
+                    results.append(None)
+                except Exception as e:
+                    results.append(e)
+        return results
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+
+class TwilioSmsProvider(BaseProvider):
+    """
+    SMS using one Twilio client with a pooled keep-alive HTTP session
+    Install: pip install twilio
+    """
+    channel = 'sms'
+
+    def __init__(self, channel=None):
+        super().__init__(channel)
+        self._lock = threading.Lock()
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from twilio.rest import Client
+                    from twilio.http.http_client import TwilioHttpClient
+
+                    self._client = Client(
+                        settings.TWILIO_ACCOUNT_SID,
+                        settings.TWILIO_AUTH_TOKEN,
+                        http_client=TwilioHttpClient(pool_connections=True),
+                    )
+        return self._client
+
+    def _send_batch(self, deliveries):
+        client = self.client
+        results = []
+        for delivery in deliveries:
+            try:
+                client.messages.create(
+                    body=delivery.body[:SMS_LIMIT],
+                    from_=settings.TWILIO_PHONE_NUMBER,
+                    to=delivery.destination
+                )
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+class FirebasePushProvider(BaseProvider):
+    """
+    Push notifications via FCM send_each on a lazily initialized Firebase app
+    Install: pip install firebase-admin
+    """
+    channel = 'push'
+    app_name = 'safari_salama'
+
+    def __init__(self, channel=None):
+        super().__init__(channel)
+        self._lock = threading.Lock()
+        self._app = None
+
+    @property
+    def app(self):
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    import firebase_admin
+                    from firebase_admin import credentials
+
+                    credentials_file = getattr(settings, 'FIREBASE_CREDENTIALS_FILE', None)
+                    cred = credentials.Certificate(credentials_file) if credentials_file else None
+                    try:
+                        self._app = firebase_admin.get_app(self.app_name)
+                    except ValueError:
+                        self._app = firebase_admin.initialize_app(
+                            cred, {'projectId': settings.FIREBASE_PROJECT_ID}, name=self.app_name
+                        )
+        return self._app
+
+    def _send_batch(self, deliveries):
+        from firebase_admin import messaging
+
+        app = self.app
+        results = []
+        for start in range(0, len(deliveries), FCM_BATCH_LIMIT):
+            chunk = deliveries[start:start + FCM_BATCH_LIMIT]
+            response = messaging.send_each([
+                messaging.Message(
+                    notification=messaging.Notification(
+                        title=delivery.subject or 'Student Transportation',
+                        body=delivery.body
+                    ),
+                    token=delivery.destination,
+                )
+                for delivery in chunk
+            ], app=app)
+            results.extend(None if r.success else r.exception for r in response.responses)
+        return results
+
+
+class LocalProvider(BaseProvider):
+    """
+    In-memory stand-in for tests and local development. Records every message
+    in `sent`; destinations listed in `fail_destinations` raise an error.
+    """
+
+    def __init__(self, channel=None):
+        super().__init__(channel)
+        self._lock = threading.Lock()
+        self.sent = []
+        self.fail_destinations = set()
+
+    def _send_batch(self, deliveries):
+        results = []
+        with self._lock:
+            for delivery in deliveries:
+                if delivery.destination in self.fail_destinations:
+                    results.append(RuntimeError(f"Delivery to {delivery.destination} refused"))
+                    continue
+                self.sent.append({
+                    'destination': delivery.destination,
+                    'subject': delivery.subject,
+                    'body': delivery.body,
+                })
+                results.append(None)
+        return results
+
+
+# ==================== REGISTRY ====================
+
+_providers = {}
+_registry_lock = threading.Lock()
+
+
+def get_provider(channel):
+    """Return the process-wide provider for a delivery channel"""
+    provider = _providers.get(channel)
+    if provider is None:
+        with _registry_lock:
+            provider = _providers.get(channel)
+            if provider is None:
+                configured = getattr(settings, 'NOTIFICATION_PROVIDERS', {})
+                path = configured.get(channel, DEFAULT_PROVIDERS.get(channel))
+                if path is None:
+                    raise ValueError(f"Unknown delivery channel: {channel}")
+                provider_class = import_string(path)
+                provider = provider_class(channel=channel)
+                _providers[channel] = provider
+    return provider
+
+
+def reset_providers():
+    """Close and forget all providers (used by tests and on settings changes)"""
+    with _registry_lock:
+        for provider in _providers.values():
+            provider.close()
+        _providers.clear()
+
+
+def provider_metrics():
+    """Metrics for every provider created so far, keyed by channel"""
+    return {channel: provider.metrics.as_dict() for channel, provider in _providers.items()}
@@ -0,0 +1,94 @@
+"""
+Real-time Publishing Module
+Pushes events from synchronous code (views, signal handlers, consumer database
+helpers) to Channels groups, where the WebSocket consumers deliver them.
+"""
+
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def user_group(user_id):
+    return f'user_{user_id}'
+
+
+def bus_group(bus_id):
+    return f'bus_{bus_id}'
+
+
+def group_send(group, event):
+    """Send an event to a channel layer group, logging instead of raising"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    try:
+        async_to_sync(channel_layer.group_send)(group, event)
+    except Exception as e:
+        logger.error(f"Error publishing {event.get('type')} to {group}: {e}")
+
+
+def notification_event(notification):
+    """Channel layer event handled by NotificationConsumer.send_notification"""
+    return {
+        'type': 'send_notification',
+        'id': notification.id,
+        'notification_type': notification.notification_type,
+        'title': notification.title,
+        'message': notification.message,
+        'student_id': notification.student_id,
+        'bus_id': notification.bus_id,
+        'timestamp': notification.created_at.isoformat(),
+    }
+
+
+def publish_notification(notification):
+    """Deliver a new Notification to the recipient's open WebSockets once it is committed"""
+    event = notification_event(notification)
+    group = user_group(notification.recipient_id)
+    transaction.on_commit(lambda: group_send(group, event))
+
+
+def location_event(location):
+    """Channel layer event handled by BusTrackingConsumer.location_update"""
+    return {
+        'type': 'location_update',
+        'bus_id': location.bus_id,
+        'latitude': location.latitude,
+        'longitude': location.longitude,
+        'speed': location.speed,
+        'heading': location.heading,
+        'timestamp': location.timestamp.isoformat(),
+    }
+
+
+def publish_location(location):
+    """Broadcast a saved BusLocation to everyone tracking the bus"""
+    event = location_event(location)
+    group = bus_group(location.bus_id)
+    transaction.on_commit(lambda: group_send(group, event))
+
+
+def message_event(message):
+    """Channel layer event handled by NotificationConsumer.new_message"""
+    return {
+        'type': 'new_message',
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'recipient_id': message.recipient_id,
+        'bus_id': message.bus_id,
+        'message_text': message.message_text,
+        'timestamp': message.timestamp.isoformat(),
+    }
+
+
+def publish_message(message):
+    """Tell the recipient's open connections about a new direct message"""
+    event = message_event(message)
+    group = user_group(message.recipient_id)
+    transaction.on_commit(lambda: group_send(group, event))
@@ -0,0 +1,77 @@
+"""
+Route Cache
+The active route and ordered stops of each bus, kept in the Django cache with
+geometry precomputed: distance along the route to every stop and a bounding
+box. Routes change rarely, so get_bus_route, ETA and geofence checks read
+from here instead of querying Route/RouteStop; signal handlers drop the
+entry whenever a route, stop or bus is saved or deleted.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .geo import bounding_box, haversine_m
+from .models import Route
+
+KEY_PREFIX = 'route'
+
+# Stored for buses without an active route so misses are cached too
+NO_ROUTE = {'route': None}
+
+
+def route_key(bus_id):
+    return f'{KEY_PREFIX}:{bus_id}'
+
+
+def build_route_data(bus_id):
+    """Load the bus's active route and stops and precompute their geometry"""
+    route = Route.objects.filter(bus_id=bus_id, is_active=True).order_by('id').first()
+    if route is None:
+        return NO_ROUTE
+
+    stops = list(route.stops.order_by('order', 'id').values(
+        'id', 'name', 'latitude', 'longitude', 'order', 'estimated_arrival_time'
+    ))
+
+    travelled = 0.0
+    previous = None
+    for stop in stops:
+        if previous is not None:
+            travelled += haversine_m(previous['latitude'], previous['longitude'],
+                                     stop['latitude'], stop['longitude'])
+        stop['distance_from_start_m'] = round(travelled, 1)
+        previous = stop
+
+    return {
+        'route': {
+            'id': route.id,
+            'name': route.name,
+            'start': route.start_location,
+            'end': route.end_location,
+            'estimated_duration': route.estimated_duration,
+        },
+        'stops': stops,
+        'total_distance_m': round(travelled, 1),
+        'bounding_box': bounding_box([(stop['latitude'], stop['longitude']) for stop in stops]),
+    }
+
+
+def get_route_data(bus_id):
+    """
+    Cached route data for a bus: {'route', 'stops', 'total_distance_m',
+    'bounding_box'}, or NO_ROUTE ({'route': None}) if none is active.
+    """
+    key = route_key(bus_id)
+    data = cache.get(key)
+    if data is None:
+        data = build_route_data(bus_id)
+        cache.set(key, data, timeout=settings.ROUTE_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_route(*bus_ids):
+    """Drop cached routes once the current transaction commits"""
+    keys = [route_key(bus_id) for bus_id in bus_ids if bus_id is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,364 @@
+"""
+Synthetic Dataset Generator
+Builds schools with buses, routes and stops, students with their guardians,
+and months of GPS, attendance and notification history, so performance work
+can be measured against production-sized tables (python manage_app.py
+seed_data).
+
+All values come from one random.Random(seed), so the same arguments always
+produce the same rows. Rows are written with chunked bulk_create inside a
+single transaction, which skips the per-row signal handlers. Every seeded
+user is prefixed seed_, and a rerun first removes the previous seed dataset:
+seeding is idempotent and never touches other data.
+"""
+
+import math
+import random
+from contextlib import contextmanager
+from collections import Counter, defaultdict
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .attendance import rebuild_summaries
+from .geo import bearing_deg, haversine_m
+from .models import (
+    Bus, BusLocation, DailyAttendanceSummary, Notification, NotificationOutbox, Route, RouteStop, School, Student,
+    StudentAttendance, UserProfile,
+)
+
+PREFIX = 'seed_'
+CENTRE = (-1.2865, 36.8172)
+METRES_PER_DEGREE = 111195.0
+
+FIRST_NAMES = ['Amani', 'Baraka', 'Chege', 'Imani', 'Wanjiru', 'Otieno', 'Akinyi', 'Kamau', 'Njeri', 'Mwangi',
+               'Achieng', 'Kiprop', 'Zawadi', 'Juma', 'Nyokabi', 'Omondi', 'Wairimu', 'Kibet', 'Atieno', 'Mutua']
+LAST_NAMES = ['Kariuki', 'Odhiambo', 'Wambui', 'Kimani', 'Ochieng', 'Njoroge', 'Cheruiyot', 'Mutiso', 'Wafula',
+              'Nyambura', 'Onyango', 'Gitau', 'Koech', 'Muthoni', 'Barasa']
+ESTATES = ['Kileleshwa', 'Westlands', 'Lavington', 'Karen', 'Langata', 'South B', 'Embakasi', 'Kasarani',
+           'Ruaka', 'Kitisuru', 'Donholm', 'Runda', 'Syokimau', 'Ngong Road', 'Parklands']
+
+MORNING_START = time(6, 15)
+AFTERNOON_START = time(15, 30)
+PRESENT_RATE = 0.93  # share of students riding on a school day
+BIOMETRIC_FAILURE_RATE = 0.03
+AVERAGE_SPEED_KMH = 25
+
+
+# ==================== HELPERS ====================
+
+class ChunkedInserter:
+    """Buffers objects per model and bulk_creates each buffer once it holds `chunk` objects"""
+
+    def __init__(self, chunk):
+        self.chunk = chunk
+        self.buffers = defaultdict(list)
+        self.counts = Counter()
+
+    def add(self, obj):
+        buffer = self.buffers[type(obj)]
+        buffer.append(obj)
+        if len(buffer) >= self.chunk:
+            self.flush(type(obj))
+
+    def flush(self, model=None):
+        for buffered in [model] if model else list(self.buffers):
+            objects = self.buffers.pop(buffered, [])
+            if objects:
+                buffered.objects.bulk_create(objects)
+                self.counts[buffered._meta.db_table] += len(objects)
+
+
+def bulk_insert(model, objects, chunk):
+    """bulk_create an iterable in chunks of `chunk` objects; returns the number written"""
+    objects = iter(objects)
+    written = 0
+    while batch := list(islice(objects, chunk)):
+        model.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Keep the timestamps set on the objects instead of auto_now/auto_now_add overwriting them"""
+    fields = [field for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def offset_point(latitude, longitude, distance_m, bearing):
+    """The point distance_m away along a bearing (flat-earth; fine at city scale)"""
+    d_lat = distance_m * math.cos(math.radians(bearing)) / METRES_PER_DEGREE
+    d_lng = distance_m * math.sin(math.radians(bearing)) / (METRES_PER_DEGREE * math.cos(math.radians(latitude)))
+    return latitude + d_lat, longitude + d_lng
+
+
+def school_days(end_date, days):
+    """Weekdays among the `days` calendar days ending on end_date, oldest first"""
+    first = end_date - timedelta(days=days - 1)
+    return [first + timedelta(days=n) for n in range(days) if (first + timedelta(days=n)).weekday() < 5]
+
+
+def clear_seed_data():
+    """Remove a previous seed dataset; returns the number of rows deleted"""
+    schools = School.objects.filter(admin__username__startswith=PREFIX)
+    deleted = 0
+    # The history tables hold most of the rows. Deleting them with plain SQL
+    # skips QuerySet.delete()'s per-row post_delete handlers, which would load
+    # every row only to bump cache versions of objects that are going away.
+    for queryset in (
+        NotificationOutbox.objects.filter(recipient__username__startswith=PREFIX),
+        Notification.objects.filter(recipient__username__startswith=PREFIX),
+        StudentAttendance.objects.filter(student__school__in=schools),
+        BusLocation.objects.filter(bus__school__in=schools),
+    ):
+        deleted += queryset._raw_delete(queryset.db)
+    deleted += User.objects.filter(username__startswith=PREFIX).delete()[0]
+    return deleted
+
+
+# ==================== FLEET ====================
+
+class SeedRoute:
+    """A bus's route geometry: pickup stops from the estate to the school"""
+
+    def __init__(self, bus, stops, school):
+        self.bus = bus
+        self.stops = stops
+        self.points = [(stop.latitude, stop.longitude) for stop in stops] + [(school.latitude, school.longitude)]
+        self.cumulative = [0.0]
+        for (lat1, lng1), (lat2, lng2) in zip(self.points, self.points[1:]):
+            self.cumulative.append(self.cumulative[-1] + haversine_m(lat1, lng1, lat2, lng2))
+        self.length_m = self.cumulative[-1]
+        self.duration = timedelta(hours=self.length_m / 1000 / AVERAGE_SPEED_KMH)
+        self.stop_fractions = {stop.id: self.cumulative[n] / self.length_m for n, stop in enumerate(stops)}
+
+    def position(self, fraction):
+        """(latitude, longitude, heading) at a fraction of the way from the first stop to the school"""
+        target = fraction * self.length_m
+        for n in range(1, len(self.points)):
+            if self.cumulative[n] >= target or n == len(self.points) - 1:
+                (lat1, lng1), (lat2, lng2) = self.points[n - 1], self.points[n]
+                span = self.cumulative[n] - self.cumulative[n - 1]
+                t = (target - self.cumulative[n - 1]) / span if span else 0.0
+                return lat1 + t * (lat2 - lat1), lng1 + t * (lng2 - lng1), bearing_deg(lat1, lng1, lat2, lng2)
+
+
+def create_fleet(rng, schools, buses_per_school, students_per_bus, stops_per_route, password, chunk):
+    """Schools, crews, buses, routes, stops, students and guardians; returns (SeedRoutes, students)"""
+    password = make_password(password)  # hashed once and shared: per-user hashing would dominate
+
+    school_specs = []
+    for s in range(schools):
+        latitude, longitude = offset_point(*CENTRE, rng.uniform(0, 15000), rng.uniform(0, 360))
+        school_specs.append((s, latitude, longitude))
+
+    users = []
+    for s, _, _ in school_specs:
+        users.append((f'{PREFIX}admin{s}', 'admin'))
+        for b in range(buses_per_school):
+            users += [(f'{PREFIX}driver{s}_{b}', 'driver'), (f'{PREFIX}attendant{s}_{b}', 'attendant')]
+            for i in range(students_per_bus):
+                users += [(f'{PREFIX}student{s}_{b}_{i}', 'student'), (f'{PREFIX}guardian{s}_{b}_{i}', 'guardian')]
+
+    names = {username: (rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)) for username, _ in users}
+    bulk_insert(User, (
+        User(username=username, password=password, first_name=names[username][0], last_name=names[username][1],
+             email=f'{username}@example.com')
+        for username, _ in users
+    ), chunk)
+    user_ids = dict(User.objects.filter(username__startswith=PREFIX).values_list('username', 'id'))
+    bulk_insert(UserProfile, (
+        UserProfile(user_id=user_ids[username], user_type=user_type, phone_number=f'+2547{rng.randrange(10 ** 8):08d}')
+        for username, user_type in users
+    ), chunk)
+
+    School.objects.bulk_create([
+        School(admin_id=user_ids[f'{PREFIX}admin{s}'], name=f'{rng.choice(ESTATES)} Academy {s + 1}',
+               location='Nairobi', latitude=latitude, longitude=longitude, phone_number='+254700000000',
+               email=f'{PREFIX}school{s}@example.com', registration_number=f'SEED/{s:03d}')
+        for s, latitude, longitude in school_specs
+    ])
+    school_by_index = {int(school.registration_number[5:]): school
+                       for school in School.objects.filter(admin__username__startswith=PREFIX)}
+
+    Bus.objects.bulk_create([
+        Bus(school=school_by_index[s], registration_number=f'SEED {s:03d}-{b:03d}',
+            driver_id=user_ids[f'{PREFIX}driver{s}_{b}'], attendant_id=user_ids[f'{PREFIX}attendant{s}_{b}'],
+            capacity=max(students_per_bus + 10, 50), current_latitude=latitude, current_longitude=longitude)
+        for s, latitude, longitude in school_specs for b in range(buses_per_school)
+    ])
+    buses = {bus.registration_number: bus for bus in Bus.objects.filter(school__in=school_by_index.values())}
+
+    Route.objects.bulk_create([
+        Route(school=school_by_index[s], bus=buses[f'SEED {s:03d}-{b:03d}'], name=f'Route {b + 1}',
+              start_location=rng.choice(ESTATES), end_location=school_by_index[s].name, estimated_duration=0)
+        for s, _, _ in school_specs for b in range(buses_per_school)
+    ])
+    routes = list(Route.objects.filter(school__in=school_by_index.values()).select_related('bus', 'school').order_by('id'))
+
+    stops = []
+    for route in routes:
+        school = route.school
+        distance, heading = rng.uniform(4000, 12000), rng.uniform(0, 360)
+        for n in range(stops_per_route):
+            along = distance * (1 - n / stops_per_route)  # from the far end towards the school
+            latitude, longitude = offset_point(school.latitude, school.longitude, along, heading)
+            latitude, longitude = offset_point(latitude, longitude, rng.uniform(0, 300), rng.uniform(0, 360))
+            stops.append(RouteStop(route=route, name=f'{route.start_location} Stop {n + 1}', latitude=latitude,
+                                   longitude=longitude, order=n + 1, estimated_arrival_time=0))
+    bulk_insert(RouteStop, stops, chunk)
+
+    stops_by_route = {}
+    for stop in RouteStop.objects.filter(route__in=routes).order_by('route_id', 'order'):
+        stops_by_route.setdefault(stop.route_id, []).append(stop)
+
+    seed_routes = []
+    for route in routes:
+        seed_route = SeedRoute(route.bus, stops_by_route[route.id], route.school)
+        seed_routes.append(seed_route)
+        route.estimated_duration = max(1, round(seed_route.duration.total_seconds() / 60))
+        for stop in stops_by_route[route.id]:
+            stop.estimated_arrival_time = round(seed_route.stop_fractions[stop.id] * route.estimated_duration)
+    Route.objects.bulk_update(routes, ['estimated_duration'], batch_size=chunk)
+    RouteStop.objects.bulk_update([stop for route_stops in stops_by_route.values() for stop in route_stops],
+                                  ['estimated_arrival_time'], batch_size=chunk)
+
+    route_by_bus = {seed_route.bus.registration_number: seed_route for seed_route in seed_routes}
+    students = []
+    for s, _, _ in school_specs:
+        for b in range(buses_per_school):
+            seed_route = route_by_bus[f'SEED {s:03d}-{b:03d}']
+            for i in range(students_per_bus):
+                username = f'{PREFIX}student{s}_{b}_{i}'
+                students.append(Student(
+                    school=school_by_index[s], user_id=user_ids[username],
+                    guardian_id=user_ids[f'{PREFIX}guardian{s}_{b}_{i}'], bus=seed_route.bus,
+                    pickup_stop=rng.choice(seed_route.stops),
+                    registration_number=f'SEED/{s:03d}/{b:03d}/{i:04d}',
+                    first_name=names[username][0], last_name=names[username][1],
+                    date_of_birth=date(2008, 1, 1) + timedelta(days=rng.randrange(10 * 365)),
+                    class_name=f'Grade {rng.randint(1, 9)}', biometric_enrolled=rng.random() < 0.9,
+                    parent_phone=f'+2547{rng.randrange(10 ** 8):08d}',
+                ))
+    bulk_insert(Student, students, chunk)
+    return seed_routes, list(Student.objects.filter(school__in=school_by_index.values())
+                             .select_related('bus', 'pickup_stop').order_by('id'))
+
+
+# ==================== HISTORY ====================
+
+def trip_fixes(rng, route, started_at, fixes_per_trip, inbound):
+    """BusLocation rows for one trip: towards the school when inbound, back out otherwise"""
+    seconds = route.duration.total_seconds() * rng.uniform(0.9, 1.2)
+    step = seconds / (fixes_per_trip - 1)
+    speed = route.length_m / seconds * 3.6
+    for n in range(fixes_per_trip):
+        fraction = n / (fixes_per_trip - 1)
+        latitude, longitude, heading = route.position(fraction if inbound else 1 - fraction)
+        yield BusLocation(
+            bus_id=route.bus.id, latitude=latitude + rng.gauss(0, 0.00003), longitude=longitude + rng.gauss(0, 0.00003),
+            accuracy=round(rng.uniform(3, 15), 1), speed=round(max(0.0, rng.gauss(speed, 5)), 1),
+            heading=round(heading if inbound else (heading + 180) % 360, 1),
+            timestamp=started_at + timedelta(seconds=n * step),
+        )
+
+
+def attendance_event(rng, student, status, at, latitude, longitude, today):
+    """A StudentAttendance row and the guardian notification it triggers"""
+    verified = rng.random() >= BIOMETRIC_FAILURE_RATE
+    attendance = StudentAttendance(
+        student_id=student.id, bus_id=student.bus_id, status=status, latitude=latitude, longitude=longitude,
+        biometric_verified=verified,
+        biometric_confidence=round(rng.uniform(85, 99.5) if verified else rng.uniform(40, 80), 1),
+        timestamp=at, date=timezone.localdate(at),
+    )
+    action = 'has boarded the bus' if status == 'boarded' else 'has alighted from the bus'
+    is_read = at.date() < today - timedelta(days=2) or rng.random() < 0.5
+    notification = Notification(
+        recipient_id=student.guardian_id, student_id=student.id, bus_id=student.bus_id, notification_type=status,
+        title='Student Transportation Alert', message=f'{student.first_name} {action}',
+        is_read=is_read, read_at=at + timedelta(minutes=rng.randint(1, 240)) if is_read else None,
+        created_at=at, updated_at=at,
+    )
+    return attendance, notification
+
+
+def create_history(rng, routes, students, days, fixes_per_trip, chunk, log=None):
+    """Two trips per bus per school day with their GPS fixes, check-ins and notifications"""
+    riders = defaultdict(list)
+    for student in students:
+        riders[student.bus_id].append(student)
+
+    inserter = ChunkedInserter(chunk)
+    today = days[-1] if days else timezone.localdate()
+    for number, day in enumerate(days, 1):
+        for route in routes:
+            morning = timezone.make_aware(datetime.combine(day, MORNING_START)) + timedelta(minutes=rng.uniform(0, 15))
+            afternoon = timezone.make_aware(datetime.combine(day, AFTERNOON_START)) + timedelta(minutes=rng.uniform(0, 20))
+            for fix in trip_fixes(rng, route, morning, fixes_per_trip, inbound=True):
+                inserter.add(fix)
+            for fix in trip_fixes(rng, route, afternoon, fixes_per_trip, inbound=False):
+                inserter.add(fix)
+
+            school = route.points[-1]
+            for student in riders[route.bus.id]:
+                if rng.random() >= PRESENT_RATE:
+                    continue
+                stop = (student.pickup_stop.latitude, student.pickup_stop.longitude)
+                fraction = route.stop_fractions[student.pickup_stop_id]
+                for status, at, (latitude, longitude) in (
+                    ('boarded', morning + fraction * route.duration, stop),
+                    ('alighted', morning + route.duration, school),
+                    ('boarded', afternoon, school),
+                    ('alighted', afternoon + (1 - fraction) * route.duration, stop),
+                ):
+                    for obj in attendance_event(rng, student, status, at, latitude, longitude, today):
+                        inserter.add(obj)
+
+        if log and (number % 10 == 0 or number == len(days)):
+            log(f'  {day}: {number}/{len(days)} school days, ' +
+                ', '.join(f'{table} {count:,}' for table, count in sorted(inserter.counts.items())))
+    inserter.flush()
+    return inserter.counts
+
+
+def seed_dataset(schools=2, buses_per_school=5, students_per_bus=30, stops_per_route=10, days=60,
+                 fixes_per_trip=40, seed=1, end_date=None, password=None, chunk=5000, log=None):
+    """
+    Replace the seed dataset with a freshly generated one in one transaction.
+    History covers the weekdays among the `days` calendar days ending on
+    end_date (default today). Returns row counts per table.
+    """
+    rng = random.Random(seed)
+    days = school_days(end_date or timezone.localdate(), days)
+
+    with transaction.atomic():
+        deleted = clear_seed_data()
+        if log and deleted:
+            log(f'Removed {deleted:,} rows of the previous seed dataset')
+
+        routes, students = create_fleet(rng, schools, buses_per_school, students_per_bus, stops_per_route,
+                                        password, chunk)
+        if log:
+            log(f'Fleet: {schools} schools, {len(routes)} buses and routes, {len(students):,} students')
+
+        with explicit_timestamps(BusLocation, StudentAttendance, Notification):
+            counts = create_history(rng, routes, students, days, fixes_per_trip, chunk, log)
+
+        if days:
+            for school in School.objects.filter(admin__username__startswith=PREFIX):
+                counts[DailyAttendanceSummary._meta.db_table] += rebuild_summaries(days[0], days[-1], school=school)
+    return counts
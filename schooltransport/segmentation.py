@@ -0,0 +1,200 @@
+"""
+Trip Segmentation
+Turns each bus's BusLocation stream into BusTrip summaries, one fix at a
+time. The open trip (ended_at is null) holds everything needed to continue
+it, so a fix costs one lookup and one update, and history pages read the
+compact summaries instead of scanning raw points.
+
+- A trip starts when an idle bus moves (reported speed, or the speed since
+  its previous fix, of at least TRIP_STOP_SPEED_KMH).
+- It ends on entering the school geofence, when no fix arrives for
+  TRIP_GAP_SECONDS, or after standing still for TRIP_PARKED_SECONDS.
+  Trips shorter than TRIP_MIN_DISTANCE_M (yard moves, GPS drift) are dropped.
+- Halts of at least TRIP_DWELL_SECONDS are recorded as BusTripStop rows and
+  matched to the nearest route stop within GEOFENCE_STOP_RADIUS_M.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .geo import haversine_m, nearest_points
+from .geofence import get_fence_grid
+from .models import BusLocation, BusTrip, BusTripStop
+from .route_cache import get_route_data
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'trip_idle'
+
+
+def idle_key(bus_id):
+    """Previous fix of a bus without an open trip"""
+    return f'{KEY_PREFIX}:{bus_id}'
+
+
+def _at_school(grid, latitude, longitude):
+    return any(fence.kind == 'school' for fence in grid.containing(latitude, longitude))
+
+
+def _speed_kmh(reported, metres, seconds):
+    if reported is not None:
+        return reported
+    return metres / seconds * 3.6 if seconds > 0 else 0.0
+
+
+# ==================== TRIPS ====================
+
+def start_trip(bus_id, previous, latitude, longitude, speed, timestamp):
+    """Open a trip that began at the idle bus's previous fix"""
+    prev_lat, prev_lng, prev_at = previous
+    distance = haversine_m(prev_lat, prev_lng, latitude, longitude)
+    return BusTrip.objects.create(
+        bus_id=bus_id,
+        started_at=prev_at,
+        start_latitude=prev_lat,
+        start_longitude=prev_lng,
+        last_latitude=latitude,
+        last_longitude=longitude,
+        last_fix_at=timestamp,
+        distance_m=distance,
+        duration_seconds=int((timestamp - prev_at).total_seconds()),
+        max_speed_kmh=speed,
+        fix_count=2,
+    )
+
+
+def close_trip(trip, reason, ended_at=None):
+    """
+    End the trip; ones shorter than TRIP_MIN_DISTANCE_M are dropped. Its last
+    fix becomes the idle fix, which segment_fix() only starts a new trip from
+    if the next fix follows within TRIP_GAP_SECONDS.
+    """
+    cache.set(idle_key(trip.bus_id), (trip.last_latitude, trip.last_longitude, trip.last_fix_at),
+              timeout=settings.TRIP_GAP_SECONDS)
+    if trip.distance_m < settings.TRIP_MIN_DISTANCE_M:
+        trip.delete()
+        return
+
+    trip.ended_at = ended_at or trip.last_fix_at
+    trip.end_reason = reason
+    trip.duration_seconds = int((trip.ended_at - trip.started_at).total_seconds())
+    trip.stationary_since = None
+    trip.save()
+    logger.info(f"Trip {trip.id} of bus {trip.bus_id} ended ({reason}): "
+                f"{trip.distance_m / 1000:.1f} km in {trip.duration_seconds // 60} min")
+
+
+def record_dwell(trip, ended_at):
+    """Store the halt that began at trip.stationary_since if it lasted long enough"""
+    seconds = int((ended_at - trip.stationary_since).total_seconds())
+    if seconds < settings.TRIP_DWELL_SECONDS:
+        return None
+
+    route_stop_id = None
+    stops = get_route_data(trip.bus_id).get('stops')
+    if stops:
+        index, distance = nearest_points(trip.last_latitude, trip.last_longitude,
+                                         [stop['latitude'] for stop in stops],
+                                         [stop['longitude'] for stop in stops])
+        if distance[0] <= settings.GEOFENCE_STOP_RADIUS_M:
+            route_stop_id = stops[index[0]]['id']
+
+    trip.stop_count += 1
+    trip.dwell_seconds += seconds
+    return BusTripStop.objects.create(
+        trip=trip,
+        route_stop_id=route_stop_id,
+        latitude=trip.last_latitude,
+        longitude=trip.last_longitude,
+        started_at=trip.stationary_since,
+        ended_at=ended_at,
+        duration_seconds=seconds,
+    )
+
+
+# ==================== FIXES ====================
+
+@transaction.atomic
+def segment_fix(bus_id, latitude, longitude, speed, timestamp):
+    """
+    Advance the bus's trip with one fix. Fixes must arrive in time order;
+    older or duplicate fixes are ignored. Returns the open trip, if any.
+    """
+    trip = BusTrip.objects.filter(bus_id=bus_id, ended_at__isnull=True).order_by('-started_at').first()
+
+    if trip is not None:
+        if timestamp <= trip.last_fix_at:
+            return trip
+        if (timestamp - trip.last_fix_at).total_seconds() > settings.TRIP_GAP_SECONDS:
+            close_trip(trip, 'gap')
+            trip = None
+
+    if trip is None:
+        previous = cache.get(idle_key(bus_id))
+        cache.set(idle_key(bus_id), (latitude, longitude, timestamp), timeout=settings.TRIP_GAP_SECONDS)
+        if previous is None or timestamp <= previous[2]:
+            return None
+        seconds = (timestamp - previous[2]).total_seconds()
+        if seconds > settings.TRIP_GAP_SECONDS:
+            # The cache timeout runs on wall-clock time, so rebuild_trips() and
+            # overnight silences can leave an idle fix older than a trip gap
+            return None
+        speed = _speed_kmh(speed, haversine_m(previous[0], previous[1], latitude, longitude), seconds)
+        if speed < settings.TRIP_STOP_SPEED_KMH:
+            return None
+        cache.delete(idle_key(bus_id))
+        return start_trip(bus_id, previous, latitude, longitude, speed, timestamp)
+
+    grid = get_fence_grid(bus_id)
+    was_at_school = _at_school(grid, trip.last_latitude, trip.last_longitude)
+    step = haversine_m(trip.last_latitude, trip.last_longitude, latitude, longitude)
+    speed = _speed_kmh(speed, step, (timestamp - trip.last_fix_at).total_seconds())
+
+    if speed >= settings.TRIP_STOP_SPEED_KMH:
+        # Distance only accumulates while moving, so GPS jitter at a halt is not counted
+        trip.distance_m += step
+        trip.max_speed_kmh = max(trip.max_speed_kmh, speed)
+        if trip.stationary_since is not None:
+            record_dwell(trip, timestamp)
+            trip.stationary_since = None
+    elif trip.stationary_since is None:
+        trip.stationary_since = timestamp
+
+    trip.last_latitude, trip.last_longitude, trip.last_fix_at = latitude, longitude, timestamp
+    trip.fix_count += 1
+    trip.duration_seconds = int((timestamp - trip.started_at).total_seconds())
+
+    if not was_at_school and _at_school(grid, latitude, longitude):
+        close_trip(trip, 'school')
+        return None
+    if (trip.stationary_since is not None and
+            (timestamp - trip.stationary_since).total_seconds() >= settings.TRIP_PARKED_SECONDS):
+        close_trip(trip, 'parked', ended_at=trip.stationary_since)
+        return None
+
+    trip.save()
+    return trip
+
+
+def process_trip_fix(bus_id, latitude, longitude, speed, timestamp):
+    """segment_fix for the location pipeline: errors are logged, never raised"""
+    try:
+        return segment_fix(bus_id, latitude, longitude, speed, timestamp)
+    except Exception as e:
+        logger.error(f"Error segmenting trips for bus {bus_id}: {e}")
+        return None
+
+
+def rebuild_trips(bus_id):
+    """Replace a bus's trips with ones segmented from its full location history"""
+    BusTrip.objects.filter(bus_id=bus_id).delete()
+    cache.delete(idle_key(bus_id))
+    fixes = BusLocation.objects.filter(bus_id=bus_id).order_by('timestamp', 'id').values_list(
+        'latitude', 'longitude', 'speed', 'timestamp'
+    )
+    for latitude, longitude, speed, timestamp in fixes.iterator(chunk_size=2000):
+        segment_fix(bus_id, latitude, longitude, speed, timestamp)
+    return BusTrip.objects.filter(bus_id=bus_id).count()
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db.models import F, Manager, QuerySet, Window
+from django.db.models.functions import RowNumber
 from .models import (
     UserProfile, School, Bus, Student, StudentAttendance,
     BusLocation, Notification, Route, RouteStop
@@ -32,6 +34,39 @@ class BusLocationSerializer(serializers.ModelSerializer):
         fields = ['id', 'latitude', 'longitude', 'accuracy', 'speed', 'heading', 'timestamp']
 
 
+def attach_latest_locations(buses):
+    """
+    Fetch the latest BusLocation of every bus in one query and cache it on
+    each bus as `_latest_location` (None for a bus with no history).
+    """
+    buses = list(buses)
+    latest = BusLocation.objects.filter(
+        bus_id__in=[bus.id for bus in buses]
+    ).annotate(
+        row=Window(
+            RowNumber(),
+            partition_by=[F('bus_id')],
+            order_by=[F('timestamp').desc(), F('id').desc()]
+        )
+    ).filter(row=1)
+
+    by_bus = {location.bus_id: location for location in latest}
+    for bus in buses:
+        bus._latest_location = by_bus.get(bus.id)
+    return buses
+
+
+class BusListSerializer(serializers.ListSerializer):
+    """Serializes a fleet with a fixed number of queries instead of one per bus"""
+
+    def to_representation(self, data):
+        buses = data.all() if isinstance(data, Manager) else data
+        if isinstance(buses, QuerySet):
+            buses = buses.select_related('driver', 'attendant')
+        buses = attach_latest_locations(buses)
+        return super().to_representation(buses)
+
+
 class BusSerializer(serializers.ModelSerializer):
     current_location = serializers.SerializerMethodField()
     driver_name = serializers.CharField(source='driver.get_full_name', read_only=True)
@@ -44,9 +79,13 @@ class BusSerializer(serializers.ModelSerializer):
             'current_longitude', 'status', 'driver_name', 'attendant_name',
             'is_active', 'created_at', 'updated_at', 'current_location'
         ]
+        list_serializer_class = BusListSerializer
 
     def get_current_location(self, obj):
-        latest = obj.location_history.latest('timestamp')
+        if hasattr(obj, '_latest_location'):
+            latest = obj._latest_location
+        else:
+            latest = obj.location_history.order_by('-timestamp').first()
         if latest:
             return BusLocationSerializer(latest).data
         return None
@@ -75,7 +114,7 @@ class StudentSerializer(serializers.ModelSerializer):
         model = Student
         fields = [
             'id', 'user', 'user_name', 'registration_number', 'date_of_birth',
-            'class_name', 'guardian', 'guardian_name', 'bus', 'bus_registration',
+            'class_name', 'guardian', 'guardian_name', 'bus', 'bus_registration', 'pickup_stop',
             'biometric_enrolled', 'biometric_type', 'parent_phone',
             'created_at', 'updated_at', 'recent_attendance'
         ]
@@ -0,0 +1,151 @@
+"""
+Model signal handlers
+"""
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .attendance import record_attendance, record_biometric_failure
+from .eta import update_bus_eta
+from .geofence import invalidate_fences, process_fix
+from .models import (
+    BiometricLog, Bus, BusLocation, Message, Notification, Route, RouteStop,
+    School, Student, StudentAttendance, UserProfile
+)
+from .realtime import publish_message, publish_notification
+from .route_cache import invalidate_route
+from .segmentation import process_trip_fix
+from .sqlite import configure_sqlite
+from .versions import bump_version
+
+
+@receiver(post_save, sender=Notification)
+def notification_created(sender, instance, created, **kwargs):
+    """Push every new notification to the recipient's user_<id> group"""
+    if created:
+        publish_notification(instance)
+
+
+@receiver(post_save, sender=Message)
+def message_created(sender, instance, created, **kwargs):
+    """Let the recipient's open connections know about a new message"""
+    if created:
+        publish_message(instance)
+
+
+@receiver(post_save, sender=StudentAttendance)
+def attendance_created(sender, instance, created, raw=False, **kwargs):
+    """Keep the daily attendance summary up to date"""
+    if created and not raw:
+        record_attendance(instance)
+
+
+@receiver(post_save, sender=BiometricLog)
+def biometric_log_created(sender, instance, created, raw=False, **kwargs):
+    """Count failed fingerprint scans in the daily summary"""
+    if created and not raw and instance.status != 'match':
+        record_biometric_failure(instance)
+
+
+# ==================== VERSION COUNTERS (conditional GET) ====================
+
+@receiver([post_save, post_delete], sender=Notification)
+def notification_changed(sender, instance, **kwargs):
+    bump_version('notifications', instance.recipient_id)
+
+
+@receiver([post_save, post_delete], sender=Message)
+def message_changed(sender, instance, **kwargs):
+    bump_version('messages', instance.sender_id, instance.recipient_id)
+
+
+@receiver([post_save, post_delete], sender=Student)
+def student_changed(sender, instance, **kwargs):
+    bump_version('student', instance.id)
+
+
+@receiver([post_save, post_delete], sender=StudentAttendance)
+def attendance_changed(sender, instance, **kwargs):
+    bump_version('attendance', instance.student_id)
+
+
+@receiver(post_save, sender=BusLocation)
+def bus_location_created(sender, instance, created, raw=False, **kwargs):
+    if created:
+        bump_version('location', instance.bus_id)
+    if not created or raw:
+        return
+
+    bus_id, latitude, longitude = instance.bus_id, instance.latitude, instance.longitude
+    speed, timestamp = instance.speed, instance.timestamp
+    if settings.GEOFENCE_ON_FIX:
+        transaction.on_commit(lambda: process_fix(bus_id, latitude, longitude))
+    if settings.ETA_UPDATE_ON_FIX:
+        transaction.on_commit(lambda: update_bus_eta(bus_id))
+    if settings.TRIP_SEGMENT_ON_FIX:
+        transaction.on_commit(lambda: process_trip_fix(bus_id, latitude, longitude, speed, timestamp))
+
+
+def _routes_changed(*bus_ids):
+    bump_version('route', *bus_ids)
+    invalidate_route(*bus_ids)
+    invalidate_fences(*bus_ids)
+
+
+# Bus fields written on every GPS fix; saving only these changes neither
+# the bus details nor its route
+BUS_POSITION_FIELDS = {'current_latitude', 'current_longitude', 'updated_at'}
+
+
+@receiver([post_save, post_delete], sender=Bus)
+def bus_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= BUS_POSITION_FIELDS:
+        return
+    bump_version('bus', instance.id)
+    _routes_changed(instance.id)
+
+
+@receiver(post_save, sender=School)
+def school_changed(sender, instance, **kwargs):
+    """The school's position is a geofence for each of its buses"""
+    invalidate_fences(*instance.buses.values_list('id', flat=True))
+
+
+@receiver(pre_save, sender=Route)
+def route_reassigned(sender, instance, raw=False, **kwargs):
+    """A route moved to another bus also changes the previous bus's route"""
+    if instance.pk and not raw:
+        previous_bus_id = Route.objects.filter(pk=instance.pk).values_list('bus_id', flat=True).first()
+        if previous_bus_id != instance.bus_id:
+            _routes_changed(previous_bus_id)
+
+
+@receiver([post_save, post_delete], sender=Route)
+def route_changed(sender, instance, **kwargs):
+    _routes_changed(instance.bus_id)
+
+
+@receiver([post_save, post_delete], sender=RouteStop)
+def route_stop_changed(sender, instance, **kwargs):
+    _routes_changed(Route.objects.filter(id=instance.route_id).values_list('bus_id', flat=True).first())
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=UserProfile)
+def crew_member_changed(sender, instance, update_fields=None, **kwargs):
+    """Names and phone numbers of drivers/attendants appear in bus responses"""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    user_id = instance.id if sender is User else instance.user_id
+    bus_ids = Bus.objects.filter(Q(driver_id=user_id) | Q(attendant_id=user_id)).values_list('id', flat=True)
+    bump_version('bus', *bus_ids)
+
+
+# ==================== DATABASE ====================
+
+connection_created.connect(configure_sqlite, dispatch_uid='schooltransport.configure_sqlite')
@@ -0,0 +1,33 @@
+"""
+SQLite Production Profile
+Applies SQLITE_PRAGMAS to every new SQLite connection. WAL lets readers run
+while a write is in progress, busy_timeout makes a blocked writer wait for
+the lock instead of failing with "database is locked", and the cache/mmap
+sizes keep hot pages in memory. Other database vendors are left alone.
+
+SQLite still allows a single writer at a time; consumer writes are funnelled
+through writer.DatabaseWriter so they queue in-process instead of contending
+for the file lock.
+"""
+
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """connection_created receiver"""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+        if 'journal_mode' in settings.SQLITE_PRAGMAS:
+            cursor.execute('PRAGMA journal_mode')
+            mode = cursor.fetchone()[0]
+            # In-memory databases (the test runner) report 'memory' and cannot use WAL
+            if mode.lower() != str(settings.SQLITE_PRAGMAS['journal_mode']).lower() and mode != 'memory':
+                logger.warning(f"SQLite journal_mode is {mode}, expected {settings.SQLITE_PRAGMAS['journal_mode']}")
@@ -0,0 +1,87 @@
+"""
+Shared fixtures and the query-budget assertion used by the test suite
+"""
+
+from contextlib import contextmanager
+from datetime import date
+from itertools import count
+
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from schooltransport.models import Bus, School, Student, UserProfile
+
+_sequence = count(1)
+
+
+def make_user(user_type, **extra):
+    n = next(_sequence)
+    user = User.objects.create_user(
+        username=f'{user_type}{n}',
+        password=None,
+        first_name=extra.pop('first_name', user_type.title()),
+        last_name=extra.pop('last_name', str(n)),
+        email=extra.pop('email', f'{user_type}{n}@example.com'),
+    )
+    UserProfile.objects.create(user=user, user_type=user_type, phone_number=extra.pop('phone_number', None))
+    return user
+
+
+def make_school():
+    n = next(_sequence)
+    return School.objects.create(
+        admin=make_user('admin'),
+        name=f'School {n}',
+        location='Nairobi',
+        latitude=-1.2865,
+        longitude=36.8172,
+        phone_number='+254700000000',
+        email=f'school{n}@example.com',
+        registration_number=f'SCH/{n}',
+    )
+
+
+def make_bus(school, with_crew=True):
+    n = next(_sequence)
+    return Bus.objects.create(
+        school=school,
+        registration_number=f'KBX {n:03d}A',
+        driver=make_user('driver') if with_crew else None,
+        attendant=make_user('attendant') if with_crew else None,
+    )
+
+
+def make_student(school, guardian=None, bus=None):
+    n = next(_sequence)
+    return Student.objects.create(
+        school=school,
+        user=make_user('student'),
+        guardian=guardian,
+        bus=bus,
+        registration_number=f'STU/{n}',
+        date_of_birth=date(2015, 1, 1),
+        class_name='Grade 4',
+        parent_phone='+254700000001',
+    )
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    TestCase with assertQueryBudget, which fails with the captured SQL when a
+    block runs more queries than allowed. Tests grow the data set and check
+    the budget stays fixed, so per-row (N+1) queries show up as failures.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(
+                f'{i}. {query["sql"]}' for i, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(f'{executed} queries executed, budget is {budget}:\n{queries}')
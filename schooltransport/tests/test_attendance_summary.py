@@ -0,0 +1,119 @@
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from schooltransport.attendance import rebuild_summaries, record_biometric_failure
+from schooltransport.models import BiometricLog, DailyAttendanceSummary, StudentAttendance
+
+from .base import make_bus, make_school, make_student
+
+
+class DailyAttendanceSummaryTests(TestCase):
+
+    def setUp(self):
+        self.school = make_school()
+        self.bus = make_bus(self.school)
+        self.students = [make_student(self.school, bus=self.bus) for _ in range(3)]
+        self.today = timezone.localdate()  # StudentAttendance.date is the local date
+
+    def attend(self, student, status, verified=True):
+        return StudentAttendance.objects.create(
+            student=student, bus=self.bus, status=status, biometric_verified=verified
+        )
+
+    def summary(self):
+        return DailyAttendanceSummary.objects.get(school=self.school, bus=self.bus, date=self.today)
+
+    def test_counts_are_maintained_on_write(self):
+        first, second, _ = self.students
+        self.attend(first, 'boarded')
+        self.attend(first, 'alighted')
+        self.attend(first, 'boarded')  # Second boarding does not change absences
+        self.attend(second, 'boarded', verified=False)
+        BiometricLog.objects.create(student=second, status='no_match')
+
+        summary = self.summary()
+        self.assertEqual(summary.enrolled, 3)
+        self.assertEqual(summary.boarded, 3)
+        self.assertEqual(summary.alighted, 1)
+        self.assertEqual(summary.absent, 1)
+        self.assertEqual(summary.biometric_failures, 2)
+
+    def test_rebuild_matches_incremental_counts(self):
+        first, second, third = self.students
+        self.attend(first, 'boarded')
+        self.attend(second, 'boarded', verified=False)
+        self.attend(second, 'alighted')
+        BiometricLog.objects.create(student=third, status='no_match')
+        BiometricLog.objects.create(student=third, status='match')
+        incremental = self.summary()
+        self.assertEqual(incremental.biometric_failures, 2)
+
+        DailyAttendanceSummary.objects.all().delete()
+        self.assertEqual(rebuild_summaries(self.today, self.today), 1)
+
+        rebuilt = self.summary()
+        for field in ('enrolled', 'boarded', 'alighted', 'absent', 'biometric_failures'):
+            self.assertEqual(getattr(rebuilt, field), getattr(incremental, field), field)
+
+    def test_failed_scans_count_on_their_local_date(self):
+        # 02:00 in Nairobi is still the previous day in UTC
+        log = BiometricLog.objects.create(student=self.students[0], status='no_match')
+        BiometricLog.objects.filter(id=log.id).update(scan_time=timezone.make_aware(datetime(2025, 3, 14, 2, 0)))
+        log.refresh_from_db()
+        DailyAttendanceSummary.objects.all().delete()
+
+        record_biometric_failure(log)
+        self.assertEqual(DailyAttendanceSummary.objects.get().date, date(2025, 3, 14))
+
+        DailyAttendanceSummary.objects.all().delete()
+        self.assertEqual(rebuild_summaries(date(2025, 3, 13), date(2025, 3, 14)), 1)
+        rebuilt = DailyAttendanceSummary.objects.get()
+        self.assertEqual((rebuilt.date, rebuilt.bus_id, rebuilt.biometric_failures), (date(2025, 3, 14), self.bus.id, 1))
+        self.assertEqual((rebuilt.enrolled, rebuilt.absent), (3, 3))
+
+    def report(self, report_date):
+        self.client.force_login(self.school.admin)
+        return self.client.get(reverse('attendance_reports'), {'date': report_date.isoformat()})
+
+    def test_report_counts_buses_where_nobody_boarded_today(self):
+        idle_bus = make_bus(self.school)
+        make_student(self.school, bus=idle_bus)
+        make_student(self.school, bus=idle_bus)
+        self.attend(self.students[0], 'boarded')
+        monday = self.today - timedelta(days=self.today.weekday())
+        DailyAttendanceSummary.objects.update(date=monday)
+
+        with mock.patch('schooltransport.attendance.timezone.localdate', return_value=monday):
+            response = self.report(monday)
+
+        self.assertEqual([s.bus_id for s in response.context['summaries']], [self.bus.id, idle_bus.id])
+        self.assertEqual(response.context['totals']['enrolled'], 5)
+        self.assertEqual(response.context['totals']['absent'], 4)
+        self.assertFalse(DailyAttendanceSummary.objects.filter(bus=idle_bus).exists())
+
+    def test_report_shows_no_absences_for_days_without_check_ins(self):
+        monday = self.today - timedelta(days=self.today.weekday())
+        with mock.patch('schooltransport.attendance.timezone.localdate', return_value=monday):
+            for day in (monday - timedelta(days=3), monday - timedelta(days=2)):  # Last Friday, Saturday
+                with self.subTest(day=day):
+                    self.assertEqual(list(self.report(day).context['summaries']), [])
+        saturday = monday + timedelta(days=5)
+        with mock.patch('schooltransport.attendance.timezone.localdate', return_value=saturday):
+            self.assertEqual(list(self.report(saturday).context['summaries']), [])
+
+    def test_report_rejects_bad_parameters(self):
+        self.client.force_login(self.school.admin)
+        for params in ({'bus': 'abc'}, {'date': 'yesterday'}):
+            with self.subTest(params=params), self.assertLogs('django.request', 'WARNING'):
+                response = self.client.get(reverse('attendance_reports'), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+
+    def test_backfill_rejects_empty_chunks(self):
+        with self.assertRaisesMessage(CommandError, '--chunk-days must be at least 1'):
+            call_command('backfill_attendance_summaries', chunk_days=0)
@@ -0,0 +1,126 @@
+"""
+Conditional GET on polling endpoints: unchanged responses are answered with
+304 Not Modified, and writes to the underlying rows change the ETag.
+"""
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from schooltransport.models import BusLocation, Message, Notification, StudentAttendance
+from schooltransport.versions import check_shared_cache
+
+from .base import QueryBudgetTestCase, make_bus, make_school, make_student, make_user
+
+# Session + authenticated user lookups done by every login_required view
+AUTH_QUERIES = 2
+
+
+class ConditionalGetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        cache.clear()
+        school = make_school()
+        self.bus = make_bus(school)
+        self.guardian = make_user('guardian')
+        self.student = make_student(school, guardian=self.guardian, bus=self.bus)
+        self.client.force_login(self.guardian)
+
+    def get(self, url, etag=None, **params):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, params, **headers)
+
+    def assertRevalidates(self, url, change, queries=AUTH_QUERIES, **params):
+        """304 for an unchanged resource, 200 with a new ETag after `change`"""
+        first = self.get(url, **params)
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+
+        with self.assertQueryBudget(queries):
+            not_modified = self.get(url, etag, **params)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        changed = self.get(url, etag, **params)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_notifications(self):
+        self.assertRevalidates(
+            reverse('get_notifications'),
+            lambda: Notification.objects.create(recipient=self.guardian, title='Alert', message='Boarded',
+                                                notification_type='boarded'),
+        )
+
+    def test_messages(self):
+        attendant = self.bus.attendant
+        self.assertRevalidates(
+            reverse('get_messages'),
+            lambda: Message.objects.create(sender=attendant, recipient=self.guardian, message_text='Hello'),
+            recipient_id=attendant.id,
+        )
+
+    def test_reading_messages_changes_senders_etag(self):
+        attendant = self.bus.attendant
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(sender=attendant, recipient=self.guardian, message_text='Hello')
+
+        self.client.force_login(attendant)
+        etag = self.get(reverse('get_messages'), recipient_id=self.guardian.id)['ETag']
+
+        self.client.force_login(self.guardian)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.get(reverse('get_messages'), recipient_id=attendant.id)
+
+        self.client.force_login(attendant)
+        response = self.get(reverse('get_messages'), etag, recipient_id=self.guardian.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['messages'][0]['is_read'])
+
+    def test_student_status(self):
+        url = reverse('student_status', args=[self.student.id])
+        self.assertRevalidates(
+            url,
+            lambda: StudentAttendance.objects.create(student=self.student, bus=self.bus, status='boarded'),
+            queries=AUTH_QUERIES + 1,
+        )
+        self.assertRevalidates(
+            url,
+            lambda: BusLocation.objects.create(bus=self.bus, latitude=-1.28, longitude=36.82),
+            queries=AUTH_QUERIES + 1,
+        )
+
+    def test_bus_attendant(self):
+        url = reverse('get_bus_attendant', args=[self.bus.id])
+
+        def rename_attendant():
+            self.bus.attendant.first_name = 'Renamed'
+            self.bus.attendant.save()
+
+        self.assertRevalidates(url, rename_attendant)
+
+    def test_etag_is_per_user(self):
+        url = reverse('get_notifications')
+        etag = self.get(url)['ETag']
+        self.client.force_login(make_user('guardian'))
+        self.assertEqual(self.get(url, etag).status_code, 200)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    REDIS = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost'}}
+
+    @override_settings(DEBUG=False, ALLOW_PROCESS_LOCAL_CACHE=False, CACHES=LOCMEM)
+    def test_process_local_cache_is_refused_outside_debug(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'not shared between server processes'):
+            check_shared_cache()
+
+    def test_shared_cache_debug_or_single_process_is_accepted(self):
+        for overrides in ({'DEBUG': False, 'ALLOW_PROCESS_LOCAL_CACHE': False, 'CACHES': self.REDIS},
+                          {'DEBUG': True, 'ALLOW_PROCESS_LOCAL_CACHE': False, 'CACHES': self.LOCMEM},
+                          {'DEBUG': False, 'ALLOW_PROCESS_LOCAL_CACHE': True, 'CACHES': self.LOCMEM}):
+            with self.subTest(**overrides), override_settings(**overrides):
+                check_shared_cache()
@@ -0,0 +1,105 @@
+"""
+WebSocket consumer metrics and the Prometheus /metrics/ endpoint
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from schooltransport.metrics import reset_consumer_metrics, reset_request_metrics
+from schooltransport.models import BusLocation
+from schooltransport.routing import websocket_urlpatterns
+from schooltransport.writer import stop_writer
+
+from .base import make_bus, make_school, make_user
+
+application = URLRouter(websocket_urlpatterns)
+
+
+def samples(text, name):
+    """{labels: value} for every sample of a metric in Prometheus text"""
+    found = {}
+    for line in text.splitlines():
+        if line.startswith(name + '{'):
+            labels, value = line[len(name):].rsplit(' ', 1)
+            found[labels] = float(value)
+    return found
+
+
+@override_settings(ETA_UPDATE_ON_FIX=False, GEOFENCE_ON_FIX=False, TRIP_SEGMENT_ON_FIX=False)
+class ConsumerMetricsTests(TransactionTestCase):
+
+    def setUp(self):
+        reset_consumer_metrics()
+        reset_request_metrics()
+        self.school = make_school()
+        self.bus = make_bus(self.school)
+
+    def tearDown(self):
+        stop_writer()
+
+    def metrics(self):
+        self.client.force_login(self.school.admin)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    @staticmethod
+    async def sync(func):
+        return await sync_to_async(func)()
+
+    async def connect(self, path, user):
+        communicator = WebsocketCommunicator(application, path)
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_tracks_connections_messages_and_db_calls(self):
+        driver = self.bus.driver
+        tracker = await self.connect(f'/ws/bus/{self.bus.id}/tracking/', driver)
+        second = await self.connect(f'/ws/bus/{self.bus.id}/tracking/', driver)
+
+        await tracker.send_to(text_data=json.dumps({
+            'type': 'location_update', 'latitude': -1.29, 'longitude': 36.82, 'speed': 30,
+        }))
+        # Both connections get the broadcast
+        await tracker.receive_from()
+        await second.receive_from()
+        await second.disconnect()
+
+        text = await self.sync(self.metrics)
+        consumer = 'consumer="BusTrackingConsumer"'
+        self.assertEqual(samples(text, 'safari_ws_connections'),
+                         {f'{{{consumer},group="bus_{self.bus.id}"}}': 1.0})
+        messages = samples(text, 'safari_ws_messages_total')
+        self.assertEqual(messages[f'{{{consumer},direction="in"}}'], 1)
+        self.assertEqual(messages[f'{{{consumer},direction="out"}}'], 2)
+        self.assertGreater(samples(text, 'safari_ws_messages_per_second')[f'{{{consumer},direction="out"}}'], 0)
+        self.assertEqual(samples(text, 'safari_ws_receive_seconds_count'), {f'{{{consumer}}}': 1})
+        self.assertEqual(samples(text, 'safari_ws_db_call_seconds_count'), {'{call="save_bus_location"}': 1})
+        self.assertEqual(samples(text, 'safari_ws_db_call_seconds_bucket')['{call="save_bus_location",le="+Inf"}'], 1)
+
+        await tracker.disconnect()
+        self.assertEqual(await self.sync(BusLocation.objects.filter(bus=self.bus).count), 1)
+        self.assertEqual(samples(await self.sync(self.metrics), 'safari_ws_connections'), {})
+
+    @override_settings(METRICS_TOKEN='scrape-me')
+    def test_endpoint_requires_token_or_admin(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+        self.client.force_login(make_user('guardian'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.logout()
+
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE safari_ws_connections gauge', response.content.decode())
+        # The three refused requests show up in the HTTP histograms
+        self.assertIn('safari_http_request_seconds_count{view="metrics"} 3', response.content.decode())
@@ -0,0 +1,134 @@
+"""
+ETA engine: projection onto the stop polyline, speed estimates and caching
+"""
+
+import io
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from schooltransport.eta import compute_etas, eta_key, get_bus_eta, moving_speed_kmh, update_fleet_etas
+from schooltransport.geo import haversine_m
+from schooltransport.models import BusLocation
+from schooltransport.realtime import bus_group
+
+from .base import make_bus, make_school, make_student, make_user
+from .test_route_cache import make_route
+
+# Stops due north along one meridian, roughly 1.1 km apart
+LINE = [('Stop A', -1.3000, 36.8000), ('Stop B', -1.2900, 36.8000), ('Stop C', -1.2800, 36.8000)]
+
+
+@override_settings(ETA_UPDATE_ON_FIX=False, GEOFENCE_ON_FIX=False, ETA_DEFAULT_SPEED_KMH=25, ETA_MOVING_SPEED_KMH=5)
+class EtaTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.school = make_school()
+        self.bus = make_bus(self.school)
+        make_route(self.school, self.bus, stops=LINE)
+
+    def fix(self, bus, lat, lng, speed=None, seconds_ago=0):
+        location = BusLocation.objects.create(bus=bus, latitude=lat, longitude=lng, speed=speed)
+        BusLocation.objects.filter(id=location.id).update(
+            timestamp=timezone.now() - timedelta(seconds=seconds_ago)
+        )
+        return location
+
+    def test_projection_between_stops(self):
+        # Halfway between A and B, 50 m east of the road, at 36 km/h (10 m/s)
+        self.fix(self.bus, -1.2950, 36.80045, speed=36)
+        eta = compute_etas([self.bus.id])[self.bus.id]
+
+        leg = haversine_m(-1.3, 36.8, -1.29, 36.8)
+        self.assertEqual([s['name'] for s in eta['stops']], ['Stop B', 'Stop C'])
+        self.assertAlmostEqual(eta['distance_along_m'], leg / 2, delta=5)
+        self.assertAlmostEqual(eta['off_route_m'], 50, delta=1)
+        self.assertAlmostEqual(eta['stops'][0]['distance_m'], leg / 2, delta=5)
+        self.assertAlmostEqual(eta['stops'][0]['eta_seconds'], leg / 2 / 10, delta=1)
+        self.assertAlmostEqual(eta['stops'][1]['eta_seconds'], leg * 1.5 / 10, delta=1)
+
+    def test_before_first_stop(self):
+        self.fix(self.bus, -1.3050, 36.8000, speed=30)
+        eta = compute_etas([self.bus.id])[self.bus.id]
+        self.assertEqual(eta['distance_along_m'], 0)
+        self.assertEqual(len(eta['stops']), 3)
+
+    def test_speed_estimates(self):
+        now = timezone.now()
+        self.assertEqual(moving_speed_kmh([]), 25)
+        # Halted readings are ignored
+        self.assertEqual(moving_speed_kmh([(0, 0, 0.0, now), (0, 0, 40.0, now), (0, 0, 20.0, now)]), 30)
+        # Without reported speeds, speed comes from consecutive fixes: 1.1 km in 110 s = 36 km/h
+        fixes = [(-1.30, 36.8, None, now), (-1.29, 36.8, None, now + timedelta(seconds=111.2))]
+        self.assertAlmostEqual(moving_speed_kmh(fixes), 36, delta=0.1)
+
+    def test_stale_fix_and_missing_route(self):
+        self.fix(self.bus, -1.2950, 36.8, speed=30, seconds_ago=3600)
+        no_route_bus = make_bus(self.school)
+        self.fix(no_route_bus, -1.2950, 36.8, speed=30)
+        self.assertEqual(compute_etas([self.bus.id, no_route_bus.id]), {})
+
+    def test_fleet_pass_matches_single_bus(self):
+        other = make_bus(self.school)
+        make_route(self.school, other, stops=list(reversed(LINE)), name='Return')
+        self.fix(self.bus, -1.2950, 36.8, speed=30)
+        self.fix(other, -1.2850, 36.8, speed=20)
+
+        fleet = compute_etas([self.bus.id, other.id])
+        now = timezone.now()
+        for bus in (self.bus, other):
+            single = compute_etas([bus.id], now=now)[bus.id]
+            self.assertEqual([s['distance_m'] for s in fleet[bus.id]['stops']],
+                             [s['distance_m'] for s in single['stops']])
+        self.assertEqual([s['name'] for s in fleet[other.id]['stops']], ['Stop B', 'Stop A'])
+
+    def test_fleet_update_caches_and_serves(self):
+        self.fix(self.bus, -1.2950, 36.8, speed=30)
+        self.assertEqual(update_fleet_etas(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_bus_eta(self.bus.id)['bus_id'], self.bus.id)
+
+        self.client.force_login(self.bus.driver)
+        response = self.client.get(reverse('get_bus_eta', args=[self.bus.id]))
+        self.assertEqual(response.json()['eta']['stops'][0]['name'], 'Stop B')
+
+    def test_view_is_limited_to_crew_guardians_and_school_admin(self):
+        self.fix(self.bus, -1.2950, 36.8, speed=30)
+        guardian = make_user('guardian')
+        make_student(self.school, guardian=guardian, bus=self.bus)
+        url = reverse('get_bus_eta', args=[self.bus.id])
+
+        for user in (self.bus.driver, self.bus.attendant, guardian, self.school.admin):
+            self.client.force_login(user)
+            self.assertEqual(self.client.get(url).status_code, 200, user.username)
+
+        for user in (make_user('guardian'), make_school().admin, make_user('driver')):
+            self.client.force_login(user)
+            with self.assertLogs('django.request', 'WARNING'):
+                self.assertEqual(self.client.get(url).status_code, 404, user.username)
+
+    def test_update_etas_needs_shared_cache_and_channel_layer(self):
+        # The default LocMemCache and InMemoryChannelLayer are invisible to the ASGI process
+        with self.assertRaisesMessage(CommandError, 'InMemoryChannelLayer'):
+            call_command('update_etas', stdout=io.StringIO())
+
+    @override_settings(ETA_UPDATE_ON_FIX=True)
+    def test_new_fix_pushes_eta_to_bus_group(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(bus_group(self.bus.id), channel)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BusLocation.objects.create(bus=self.bus, latitude=-1.2950, longitude=36.8, speed=30)
+
+        event = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(event['type'], 'eta_update')
+        self.assertEqual(event['stops'][0]['name'], 'Stop B')
+        self.assertEqual(cache.get(eta_key(self.bus.id))['bus_id'], self.bus.id)
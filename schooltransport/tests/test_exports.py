@@ -0,0 +1,91 @@
+"""
+Streaming CSV/NDJSON attendance exports
+"""
+
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from schooltransport.models import StudentAttendance
+
+from .base import make_bus, make_school, make_student, make_user
+
+
+class AttendanceExportTests(TestCase):
+
+    def setUp(self):
+        self.school = make_school()
+        self.bus = make_bus(self.school)
+        self.student = make_student(self.school, guardian=make_user('guardian'), bus=self.bus)
+        self.today = timezone.now().date()
+        for days_ago in (0, 1, 5):
+            for status in ('boarded', 'alighted'):
+                record = StudentAttendance.objects.create(student=self.student, bus=self.bus, status=status)
+                StudentAttendance.objects.filter(id=record.id).update(date=self.today - timedelta(days=days_ago))
+
+        other_school = make_school()
+        make_student(other_school, bus=make_bus(other_school))
+        StudentAttendance.objects.create(
+            student=other_school.students.get(), bus=other_school.buses.get(), status='boarded'
+        )
+        self.async_client.force_login(self.school.admin)
+
+    def export(self, **params):
+        self.client.force_login(self.school.admin)
+        return self.client.get(reverse('export_attendance_report'), params)
+
+    async def stream(self, **params):
+        """(response, chunks) for an export read through the ASGI test client, as Daphne serves it"""
+        response = await self.async_client.get(reverse('export_attendance_report'), params)
+        return response, [chunk async for chunk in response.streaming_content]
+
+    async def test_csv_range(self):
+        response, chunks = await self.stream(start=(self.today - timedelta(days=1)).isoformat(),
+                                             end=self.today.isoformat())
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(b''.join(chunks).decode())))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual({row['registration_number'] for row in rows}, {self.student.registration_number})
+        self.assertEqual(rows[0]['bus'], self.bus.registration_number)
+        self.assertEqual(rows[0]['date'], (self.today - timedelta(days=1)).isoformat())
+
+    async def test_ndjson(self):
+        _, chunks = await self.stream(start=(self.today - timedelta(days=10)).isoformat(), format='ndjson')
+        lines = b''.join(chunks).decode().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(json.loads(lines[0])['first_name'], self.student.user.first_name)
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    async def test_streamed_chunk_by_chunk_under_asgi(self):
+        # A sync iterator would be read to the end by StreamingHttpResponse.__aiter__ before sending
+        response, chunks = await self.stream(start=(self.today - timedelta(days=10)).isoformat(), format='ndjson')
+        self.assertTrue(response.is_async)
+        self.assertEqual([len(chunk.decode().splitlines()) for chunk in chunks], [2, 2, 2])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.export(format='xml').status_code, 400)
+        self.assertEqual(self.export(start='2025-02-30').status_code, 400)
+        self.assertEqual(self.export(start=self.today.isoformat(),
+                                     end=(self.today - timedelta(days=1)).isoformat()).status_code, 400)
+
+    def test_admin_only(self):
+        self.client.force_login(self.student.guardian)
+        response = self.client.get(reverse('export_attendance_report'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_management_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'export.csv')
+            call_command('export_attendance', '--start', (self.today - timedelta(days=10)).isoformat(),
+                         '--school', str(self.school.id), '--output', path, stdout=io.StringIO())
+            with open(path, newline='') as f:
+                self.assertEqual(len(list(csv.DictReader(f))), 6)
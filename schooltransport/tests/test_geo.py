@@ -0,0 +1,101 @@
+"""
+Geo helpers: scalar and NumPy kernels against known coordinates
+"""
+
+import math
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from schooltransport.geo import (
+    EARTH_RADIUS_M, bearing_array, bearing_deg, haversine_array, haversine_m, nearest_points,
+    project_onto_polylines,
+)
+
+ONE_DEGREE_M = 2 * math.pi * EARTH_RADIUS_M / 360  # ~111195 m along a great circle
+
+NAIROBI = (-1.2864, 36.8172)
+MOMBASA = (-4.0435, 39.6682)
+LONDON = (51.5074, -0.1278)
+PARIS = (48.8566, 2.3522)
+
+
+class HaversineTests(SimpleTestCase):
+
+    def test_known_distances(self):
+        self.assertAlmostEqual(haversine_m(0, 0, 0, 1), ONE_DEGREE_M, delta=0.01)
+        self.assertAlmostEqual(haversine_m(0, 0, 1, 0), ONE_DEGREE_M, delta=0.01)
+        self.assertAlmostEqual(haversine_m(*LONDON, *PARIS) / 1000, 343.6, delta=0.5)
+        self.assertAlmostEqual(haversine_m(*NAIROBI, *MOMBASA) / 1000, 440.0, delta=2)
+        self.assertAlmostEqual(haversine_m(0, 0, 0, 180), math.pi * EARTH_RADIUS_M, delta=0.01)
+
+    def test_array_matches_scalar(self):
+        rng = np.random.default_rng(7)
+        lat1, lat2 = rng.uniform(-80, 80, (2, 500))
+        lng1, lng2 = rng.uniform(-180, 180, (2, 500))
+        expected = [haversine_m(*args) for args in zip(lat1, lng1, lat2, lng2)]
+        np.testing.assert_allclose(haversine_array(lat1, lng1, lat2, lng2), expected, rtol=1e-9, atol=1e-6)
+
+    def test_array_broadcasts(self):
+        distances = haversine_array(0.0, 0.0, [0.0, 0.0, 1.0], [0.0, 1.0, 0.0])
+        np.testing.assert_allclose(distances, [0.0, ONE_DEGREE_M, ONE_DEGREE_M], atol=0.01)
+
+
+class BearingTests(SimpleTestCase):
+
+    def test_cardinal_directions(self):
+        self.assertAlmostEqual(bearing_deg(0, 0, 1, 0), 0.0)
+        self.assertAlmostEqual(bearing_deg(0, 0, 0, 1), 90.0)
+        self.assertAlmostEqual(bearing_deg(0, 0, -1, 0), 180.0)
+        self.assertAlmostEqual(bearing_deg(0, 0, 0, -1), 270.0)
+
+    def test_known_bearing(self):
+        # Nairobi to Mombasa heads south-east
+        self.assertAlmostEqual(bearing_deg(*NAIROBI, *MOMBASA), 134.0, delta=0.5)
+
+    def test_array_matches_scalar(self):
+        lat1, lng1 = [0, 10, NAIROBI[0]], [0, 20, NAIROBI[1]]
+        lat2, lng2 = [1, -5, MOMBASA[0]], [1, 40, MOMBASA[1]]
+        expected = [bearing_deg(*args) for args in zip(lat1, lng1, lat2, lng2)]
+        np.testing.assert_allclose(bearing_array(lat1, lng1, lat2, lng2), expected)
+
+
+class NearestPointsTests(SimpleTestCase):
+
+    def test_nearest_candidate_per_query(self):
+        stops_lat, stops_lng = [-1.30, -1.31, -1.32], [36.80, 36.81, 36.82]
+        indexes, distances = nearest_points([-1.3101, -1.3199], [36.8101, 36.8201], stops_lat, stops_lng, chunk=1)
+        self.assertEqual(indexes.tolist(), [1, 2])
+        np.testing.assert_allclose(distances, [
+            haversine_m(-1.3101, 36.8101, -1.31, 36.81),
+            haversine_m(-1.3199, 36.8201, -1.32, 36.82),
+        ])
+
+    def test_no_candidates(self):
+        with self.assertRaises(ValueError):
+            nearest_points([0], [0], [], [])
+
+
+class PolylineProjectionTests(SimpleTestCase):
+
+    def test_projects_each_point_onto_its_own_polyline(self):
+        east = [(0.0, 0.0), (0.0, 0.01), (0.0, 0.02)]
+        north = [(0.0, 0.0), (0.01, 0.0)]
+        points = [(0.001, 0.015), (0.005, -0.002)]
+
+        segment, fraction, offset = project_onto_polylines(points, [east, north])
+
+        self.assertEqual(segment.tolist(), [1, 0])
+        np.testing.assert_allclose(fraction, [0.5, 0.5], atol=1e-6)
+        np.testing.assert_allclose(offset, [0.001 * ONE_DEGREE_M, 0.002 * ONE_DEGREE_M], rtol=1e-4)
+
+    def test_clamps_before_start_and_past_end(self):
+        line = [(0.0, 0.0), (0.0, 0.01)]
+        segment, fraction, offset = project_onto_polylines([(0.0, -0.01), (0.0, 0.03)], [line, line])
+        self.assertEqual(fraction.tolist(), [0.0, 1.0])
+        np.testing.assert_allclose(offset, [0.01 * ONE_DEGREE_M, 0.02 * ONE_DEGREE_M], rtol=1e-4)
+
+    def test_single_vertex_polyline(self):
+        segment, fraction, offset = project_onto_polylines([(0.0, 0.001)], [[(0.0, 0.0)]])
+        self.assertEqual((segment[0], fraction[0]), (0, 0.0))
+        self.assertAlmostEqual(offset[0], haversine_m(0, 0, 0, 0.001), delta=0.01)
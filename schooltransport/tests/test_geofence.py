@@ -0,0 +1,100 @@
+"""
+Geofencing: grid lookups, bus status at school and once-per-trip approach alerts
+"""
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from schooltransport.geo import haversine_m
+from schooltransport.geofence import Fence, FenceGrid, check_fix, get_fence_grid
+from schooltransport.models import Bus, BusLocation, Notification
+from schooltransport.realtime import bus_group
+
+from .base import make_bus, make_school, make_student, make_user
+from .test_route_cache import make_route
+
+# make_school() puts the school at (-1.2865, 36.8172); stops run south from it
+STOPS = [('Kenyatta Market', -1.3100, 36.8000), ('Nyayo Estate', -1.3300, 36.8000)]
+SCHOOL = (-1.2865, 36.8172)
+
+
+@override_settings(ETA_UPDATE_ON_FIX=False, GEOFENCE_ON_FIX=True, GEOFENCE_SCHOOL_RADIUS_M=200,
+                   GEOFENCE_STOP_RADIUS_M=75, GEOFENCE_APPROACH_RADIUS_M=1000, GEOFENCE_GRID_CELL_M=500)
+class GeofenceTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.school = make_school()
+        self.bus = make_bus(self.school)
+        self.route = make_route(self.school, self.bus, stops=STOPS)
+        self.first_stop = self.route.stops.get(order=1)
+        self.student = make_student(self.school, guardian=make_user('guardian'), bus=self.bus)
+        self.student.pickup_stop = self.first_stop
+        self.student.save()
+
+    def drive(self, lat, lng):
+        with self.captureOnCommitCallbacks(execute=True):
+            BusLocation.objects.create(bus=self.bus, latitude=lat, longitude=lng)
+
+    def approach_alerts(self):
+        return Notification.objects.filter(notification_type='approaching', recipient=self.student.guardian)
+
+    def test_grid_matches_brute_force(self):
+        fences = [Fence('stop', i, f'Stop {i}', -1.30 + i * 0.003, 36.80 + (i % 7) * 0.002, 150 + i * 10)
+                  for i in range(40)]
+        grid = FenceGrid(fences, cell_m=250)
+        for i in range(200):
+            lat, lng = -1.305 + i * 0.0007, 36.795 + (i * 37 % 100) * 0.0002
+            expected = {f.id for f in fences
+                        if haversine_m(f.latitude, f.longitude, lat, lng) <= f.radius_m}
+            self.assertEqual({f.id for f in grid.containing(lat, lng)}, expected)
+
+    def test_grid_is_cached(self):
+        get_fence_grid(self.bus.id)
+        with self.assertNumQueries(0):
+            grid = get_fence_grid(self.bus.id)
+        self.assertEqual(len(grid.fences), 1 + 2 * len(STOPS))
+
+    def test_bus_status_follows_school_fence(self):
+        self.drive(-1.2866, 36.8171)
+        self.assertEqual(Bus.objects.get(id=self.bus.id).status, 'at_school')
+        self.drive(-1.2950, 36.8100)
+        self.assertEqual(Bus.objects.get(id=self.bus.id).status, 'on_route')
+
+    def test_approach_alert_once_per_trip(self):
+        self.drive(-1.3000, 36.8000)   # 1.1 km out: nothing yet
+        self.assertFalse(self.approach_alerts().exists())
+
+        self.drive(-1.3050, 36.8000)   # inside the 1 km approach circle
+        self.drive(-1.3100, 36.8000)   # at the stop
+        self.drive(-1.3200, 36.8000)   # left both circles
+        self.drive(-1.3060, 36.8000)   # back inside on the same trip
+        self.assertEqual(self.approach_alerts().count(), 1)
+
+        # Arriving at school and leaving again starts a new trip
+        self.drive(*SCHOOL)
+        self.drive(-1.2950, 36.8100)
+        self.drive(-1.3050, 36.8000)
+        self.assertEqual(self.approach_alerts().count(), 2)
+
+    def test_events_pushed_to_bus_group(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(bus_group(self.bus.id), channel)
+
+        transitions = check_fix(self.bus.id, -1.3100, 36.8000)
+        self.assertEqual(sorted((t, f.kind) for t, f in transitions), [('enter', 'approach'), ('enter', 'stop')])
+
+        events = [async_to_sync(channel_layer.receive)(channel) for _ in transitions]
+        self.assertEqual({e['fence'] for e in events}, {'approach', 'stop'})
+        self.assertTrue(all(e['type'] == 'geofence_event' for e in events))
+
+    def test_route_change_rebuilds_fences(self):
+        get_fence_grid(self.bus.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first_stop.latitude = -1.2000
+            self.first_stop.save()
+        fence = get_fence_grid(self.bus.id).fences[f'stop:{self.first_stop.id}']
+        self.assertEqual(fence.latitude, -1.2000)
@@ -0,0 +1,54 @@
+"""
+Lazy imports: proxies defer the import until first use, preload() forces it
+"""
+
+import os
+import sys
+import tempfile
+
+from django.test import SimpleTestCase
+
+from schooltransport import biometric, geo
+from schooltransport.lazy import LazyModule, is_available, lazy_import, preload
+
+PROBE = 'lazy_import_probe'
+
+
+class LazyImportTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with open(os.path.join(directory.name, f'{PROBE}.py'), 'w') as probe:
+            probe.write('VALUE = 42\n\ndef double(x):\n    return 2 * x\n')
+        sys.path.insert(0, directory.name)
+        self.addCleanup(sys.path.remove, directory.name)
+        self.addCleanup(sys.modules.pop, PROBE, None)
+
+    def test_import_happens_on_first_attribute(self):
+        module = lazy_import(PROBE)
+        self.assertNotIn(PROBE, sys.modules)
+        self.assertIn('not loaded', repr(module))
+
+        self.assertEqual(module.double(module.VALUE), 84)
+        self.assertIn(PROBE, sys.modules)
+        self.assertIs(module.double, sys.modules[PROBE].double)
+        # The namespace is copied over, so later reads skip __getattr__
+        self.assertIn('VALUE', vars(module))
+
+    def test_missing_module_fails_on_use(self):
+        module = lazy_import('no_such_module_here')
+        with self.assertRaises(ImportError):
+            module.anything
+        self.assertFalse(is_available('no_such_module_here'))
+        self.assertTrue(is_available(PROBE))
+
+    def test_preload_skips_missing_modules(self):
+        with self.assertLogs('schooltransport.lazy', 'WARNING'):
+            timings = preload([PROBE, 'no_such_module_here'])
+        self.assertEqual(list(timings), [PROBE])
+        self.assertIn(PROBE, sys.modules)
+
+    def test_heavy_modules_are_proxies(self):
+        for module in (biometric.np, biometric.Image, biometric.cv2, geo.np):
+            self.assertIsInstance(module, LazyModule)
@@ -0,0 +1,93 @@
+"""
+Keyset pagination for the conversation API (messages/get/)
+"""
+
+from django.test import override_settings
+from django.urls import reverse
+
+from schooltransport.models import Message
+
+from .base import QueryBudgetTestCase, make_user
+
+# Session + authenticated user lookups done by every login_required view
+AUTH_QUERIES = 2
+
+
+@override_settings(MESSAGES_PAGE_SIZE=5)
+class GetMessagesTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.guardian = make_user('guardian')
+        self.attendant = make_user('attendant')
+        self.client.force_login(self.guardian)
+        self.url = reverse('get_messages')
+
+    def send(self, count, sender=None, recipient=None):
+        sender = sender or self.attendant
+        recipient = recipient or self.guardian
+        return [
+            Message.objects.create(sender=sender, recipient=recipient, message_text=f'Message {i}')
+            for i in range(count)
+        ]
+
+    def fetch(self, **params):
+        response = self.client.get(self.url, {'recipient_id': self.attendant.id, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_latest_page_in_chronological_order(self):
+        messages = self.send(12)
+        data = self.fetch()
+        self.assertEqual([m['id'] for m in data['messages']], [m.id for m in messages[-5:]])
+        self.assertTrue(data['has_more'])
+        self.assertEqual(data['oldest_id'], messages[-5].id)
+        self.assertEqual(data['newest_id'], messages[-1].id)
+
+    def test_before_id_walks_back_through_history(self):
+        messages = self.send(12)
+        data = self.fetch()
+        seen = [m['id'] for m in data['messages']]
+        while data['has_more']:
+            data = self.fetch(before_id=data['oldest_id'])
+            seen = [m['id'] for m in data['messages']] + seen
+        self.assertEqual(seen, [m.id for m in messages])
+
+    def test_since_id_returns_only_new_messages(self):
+        latest = self.send(3)[-1]
+        new = self.send(2, sender=self.guardian, recipient=self.attendant)
+        data = self.fetch(since_id=latest.id)
+        self.assertEqual([m['id'] for m in data['messages']], [m.id for m in new])
+        self.assertFalse(data['has_more'])
+
+        data = self.fetch(since_id=data['newest_id'])
+        self.assertEqual(data['messages'], [])
+        self.assertEqual(data['newest_id'], new[-1].id)
+
+    def test_only_returned_page_is_marked_read(self):
+        messages = self.send(8)
+        data = self.fetch()
+        self.assertTrue(all(m['is_read'] for m in data['messages']))
+
+        read = set(Message.objects.filter(is_read=True).values_list('id', flat=True))
+        self.assertEqual(read, {m.id for m in messages[-5:]})
+
+    def test_other_conversations_are_excluded(self):
+        self.send(2, sender=make_user('attendant'))
+        own = self.send(1)
+        data = self.fetch()
+        self.assertEqual([m['id'] for m in data['messages']], [own[0].id])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'recipient_id': self.attendant.id, 'since_id': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_poll_cost_does_not_grow_with_history(self):
+        for total in (5, 50):
+            self.send(total - Message.objects.count())
+            newest = Message.objects.latest('id').id
+            self.send(1)
+            with self.subTest(messages=total):
+                # Page query + marking the new message read
+                with self.assertQueryBudget(AUTH_QUERIES + 2):
+                    data = self.fetch(since_id=newest)
+                self.assertEqual(len(data['messages']), 1)
@@ -0,0 +1,105 @@
+"""
+Request instrumentation: histogram percentiles, per-view recording and the admin report
+"""
+
+import json
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from schooltransport.metrics import Histogram, request_metrics, reset_request_metrics
+from schooltransport.middleware import RequestMetricsMiddleware
+
+from .base import make_school, make_user
+
+
+class HistogramTests(SimpleTestCase):
+
+    def test_percentiles_within_bucket_resolution(self):
+        histogram = Histogram(buckets=(10, 20, 50, 100))
+        for value in range(1, 101):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.percentile(50), 50, delta=1)
+        self.assertAlmostEqual(histogram.percentile(95), 95, delta=1)
+        self.assertAlmostEqual(histogram.percentile(99), 99, delta=1)
+        self.assertEqual(histogram.summary()['mean'], 50.5)
+
+    def test_overflow_bucket_reports_max(self):
+        histogram = Histogram(buckets=(10,))
+        histogram.observe(5)
+        histogram.observe(400)
+        self.assertEqual(histogram.percentile(99), 400)
+
+    def test_empty(self):
+        self.assertIsNone(Histogram().percentile(50))
+        self.assertIsNone(Histogram().summary()['p95'])
+
+
+@override_settings(REQUEST_METRICS_ENABLED=True, REQUEST_SLOW_MS=10_000)
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        reset_request_metrics()
+        self.admin = make_school().admin
+
+    def view_stats(self, name):
+        return next(v for v in request_metrics() if v['view'] == name)
+
+    def test_records_time_queries_and_size_per_url_name(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_dashboard'))
+
+        stats = self.view_stats('admin_dashboard')
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['statuses'], {'200': 1})
+        self.assertGreater(stats['queries']['max'], 0)
+        self.assertGreater(stats['duration_ms']['max'], 0)
+        self.assertGreaterEqual(stats['duration_ms']['max'], stats['sql_ms']['max'])
+        self.assertEqual(stats['avg_response_bytes'], len(response.content))
+
+    def test_writes_json_log_line(self):
+        with self.assertLogs('schooltransport.performance', 'INFO') as logs:
+            self.client.get('/no-such-page/')
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((line['view'], line['status'], line['slow']), ('unresolved', 404, False))
+
+    @override_settings(REQUEST_SLOW_MS=0)
+    def test_slow_requests_are_logged(self):
+        with self.assertLogs('schooltransport.middleware', 'WARNING') as logs:
+            self.client.get(reverse('login'))
+        self.assertIn('Slow request: GET /login/ (login)', logs.output[0])
+        self.assertEqual(self.view_stats('login')['slow'], 1)
+
+    async def test_async_requests_stay_on_the_event_loop(self):
+        async def get_response(request):
+            return HttpResponse('ok')
+        self.assertTrue(iscoroutinefunction(RequestMetricsMiddleware(get_response)))
+
+        await sync_to_async(self.client.force_login)(self.admin)
+        self.async_client.cookies = self.client.cookies
+        response = await self.async_client.get(reverse('admin_dashboard'))
+
+        # Queries of the sync view, run on a worker thread, are still counted
+        stats = self.view_stats('admin_dashboard')
+        self.assertEqual(stats['statuses'], {'200': 1})
+        self.assertGreater(stats['queries']['max'], 0)
+        self.assertEqual(stats['avg_response_bytes'], len(response.content))
+
+    def test_report_is_admin_only(self):
+        self.client.force_login(make_user('guardian'))
+        self.assertEqual(self.client.get(reverse('request_metrics')).status_code, 403)
+
+        self.client.force_login(self.admin)
+        self.client.get(reverse('admin_dashboard'))
+        report = self.client.get(reverse('request_metrics')).json()
+
+        views = {v['view']: v for v in report['views']}
+        self.assertEqual(set(views['admin_dashboard']['duration_ms']),
+                         {'count', 'mean', 'p50', 'p95', 'p99', 'max'})
+
+        self.client.post(reverse('request_metrics'))
+        self.assertEqual([v['view'] for v in request_metrics()], ['request_metrics'])
@@ -0,0 +1,208 @@
+"""
+Notification outbox: enqueueing, claiming, leases, retries with backoff,
+giving up and coalescing, delivered through LocalProvider
+"""
+
+from datetime import timedelta
+
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from schooltransport.models import Notification, NotificationOutbox
+from schooltransport.notifications import OutboxDispatcher, create_guardian_notification
+from schooltransport.providers import SMS_LIMIT, get_provider, reset_providers
+
+from .base import make_school, make_student, make_user
+
+LOCAL_PROVIDERS = {channel: 'schooltransport.providers.LocalProvider' for channel in ('email', 'sms', 'push')}
+
+
+@override_settings(NOTIFICATION_PROVIDERS=LOCAL_PROVIDERS, NOTIFICATION_COALESCE_WINDOW=0)
+class OutboxTestCase(TransactionTestCase):
+    """Delivery runs on the dispatcher's worker threads, so data must be committed"""
+
+    def setUp(self):
+        reset_providers()
+        self.addCleanup(reset_providers)
+        self.dispatcher = OutboxDispatcher(workers=2, max_attempts=3, backoff_base=10, backoff_max=60)
+        self.addCleanup(self.dispatcher.executor.shutdown, wait=True)
+        self.guardian = make_user('guardian', phone_number='+254711000001')
+        self.student = make_student(make_school(), guardian=self.guardian)
+
+    def notify(self, message='Amani boarded the bus'):
+        return create_guardian_notification(self.student, message, 'boarded')
+
+    def entry(self, channel='email', **fields):
+        notification = Notification.objects.create(
+            recipient=self.guardian, student=self.student, notification_type='boarded',
+            title='Student Transportation Alert', message=fields.get('body', 'Amani boarded the bus'),
+        )
+        fields.setdefault('destination', self.guardian.email)
+        fields.setdefault('body', notification.message)
+        return NotificationOutbox.objects.create(
+            notification=notification, recipient=self.guardian, channel=channel, **fields
+        )
+
+    def sent(self, channel='email'):
+        return [message['body'] for message in get_provider(channel).sent]
+
+
+class OutboxDispatcherTests(OutboxTestCase):
+
+    def test_notification_enqueues_one_entry_per_channel(self):
+        notification = self.notify()
+
+        entries = {entry.channel: entry for entry in notification.outbox_entries.all()}
+        self.assertEqual(set(entries), {'email', 'sms'})  # no FCM token, so no push
+        self.assertEqual(entries['email'].destination, self.guardian.email)
+        self.assertEqual(entries['sms'].destination, '+254711000001')
+        self.assertTrue(all(entry.status == 'pending' for entry in entries.values()))
+        self.assertIsNone(create_guardian_notification(make_student(make_school()), 'No guardian', 'boarded'))
+
+    def test_due_entries_are_sent_once(self):
+        self.notify()
+
+        self.assertEqual(self.dispatcher.run_once(), 2)
+        self.assertEqual(self.sent('email'), ['Amani boarded the bus'])
+        self.assertEqual(self.sent('sms'), ['Amani boarded the bus'])
+        for entry in NotificationOutbox.objects.all():
+            self.assertEqual((entry.status, entry.attempts), ('sent', 1))
+            self.assertIsNotNone(entry.sent_at)
+
+        # Sent entries are never claimed again
+        self.assertEqual(self.dispatcher.run_once(), 0)
+        self.assertEqual(len(self.sent('email')), 1)
+
+    @override_settings(NOTIFICATION_COALESCE_WINDOW=60)
+    def test_entries_wait_out_the_coalescing_window(self):
+        self.notify()
+        self.assertEqual(self.dispatcher.run_once(), 0)
+        self.assertEqual(self.sent('email'), [])
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        entry = self.entry()
+        get_provider('email').fail_destinations.add(self.guardian.email)
+
+        before = timezone.now()
+        with self.assertLogs('schooltransport.notifications', 'WARNING'):
+            self.assertEqual(self.dispatcher.run_once(), 1)
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), ('pending', 1))
+        self.assertIn('refused', entry.last_error)
+        # First retry waits backoff_base seconds plus up to 10% jitter
+        delay = (entry.next_attempt_at - before).total_seconds()
+        self.assertGreaterEqual(delay, 10)
+        self.assertLessEqual(delay, 11.5)
+
+        # Not due yet
+        self.assertEqual(self.dispatcher.run_once(), 0)
+
+        get_provider('email').fail_destinations.clear()
+        NotificationOutbox.objects.filter(id=entry.id).update(next_attempt_at=timezone.now())
+        self.assertEqual(self.dispatcher.run_once(), 1)
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts, entry.last_error), ('sent', 2, None))
+
+    def test_backoff_doubles_up_to_the_maximum(self):
+        for attempts, delay in ((1, 10), (2, 20), (3, 40), (4, 60), (9, 60)):
+            backoff = self.dispatcher.backoff(attempts)
+            self.assertGreaterEqual(backoff, delay)
+            self.assertLessEqual(backoff, delay * 1.1)
+
+    def test_entry_fails_after_max_attempts(self):
+        entry = self.entry(attempts=2)
+        get_provider('email').fail_destinations.add(self.guardian.email)
+
+        with self.assertLogs('schooltransport.notifications', 'ERROR'):
+            self.dispatcher.run_once()
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), ('failed', 3))
+
+        NotificationOutbox.objects.filter(id=entry.id).update(next_attempt_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.dispatcher.run_once(), 0)
+
+    def test_expired_lease_is_reclaimed(self):
+        now = timezone.now()
+        stranded = self.entry(status='sending', next_attempt_at=now - timedelta(seconds=1), body='Stranded')
+        self.entry(status='sending', next_attempt_at=now + timedelta(seconds=60), body='In flight')
+
+        self.assertEqual(self.dispatcher.run_once(), 1)
+        self.assertEqual(self.sent('email'), ['Stranded'])
+        stranded.refresh_from_db()
+        self.assertEqual(stranded.status, 'sent')
+        self.assertEqual(NotificationOutbox.objects.get(body='In flight').status, 'sending')
+
+    def test_entry_that_keeps_crashing_the_dispatcher_fails(self):
+        entry = self.entry(body='Poison')
+        for attempt in range(1, 4):
+            self.assertEqual([e.attempts for e in self.dispatcher.claim_batch()], [attempt])
+            # The dispatcher dies mid-send and the lease runs out
+            NotificationOutbox.objects.filter(id=entry.id).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+        with self.assertLogs('schooltransport.notifications', 'ERROR'):
+            self.assertEqual(self.dispatcher.claim_batch(), [])
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), ('failed', 3))
+        self.assertEqual(self.sent(), [])
+
+    def test_claim_leases_entries(self):
+        entry = self.entry()
+
+        claimed = self.dispatcher.claim_batch()
+        self.assertEqual([e.id for e in claimed], [entry.id])
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'sending')
+        self.assertGreater(entry.next_attempt_at, timezone.now() + timedelta(seconds=60))
+        # A second dispatcher does not pick up leased entries
+        self.assertEqual(self.dispatcher.claim_batch(), [])
+
+
+@override_settings(NOTIFICATION_COALESCE_WINDOW=60)
+class CoalescingTests(OutboxTestCase):
+
+    def due(self, channel='email', **fields):
+        """An entry whose coalescing window has closed"""
+        return self.entry(channel, next_attempt_at=timezone.now() - timedelta(seconds=1), **fields)
+
+    def test_siblings_in_their_window_go_out_with_a_due_entry(self):
+        self.due(body='Amani boarded the bus')
+        self.entry(body='Baraka boarded the bus', next_attempt_at=timezone.now() + timedelta(seconds=60))
+        self.entry(body='Amani boarded the bus', next_attempt_at=timezone.now() + timedelta(seconds=60))
+
+        self.assertEqual(self.dispatcher.run_once(), 3)
+        self.assertEqual(self.sent(), ['Amani boarded the bus\nBaraka boarded the bus'])
+        self.assertEqual(NotificationOutbox.objects.filter(status='sent').count(), 3)
+
+    def test_siblings_waiting_on_a_retry_keep_their_backoff(self):
+        self.due(body='Amani boarded the bus')
+        retrying = self.entry(body='Earlier alert', attempts=1, next_attempt_at=timezone.now() + timedelta(seconds=60))
+
+        self.assertEqual(self.dispatcher.run_once(), 1)
+        self.assertEqual(self.sent(), ['Amani boarded the bus'])
+        retrying.refresh_from_db()
+        self.assertEqual((retrying.status, retrying.attempts), ('pending', 1))
+
+    def test_other_recipients_and_channels_are_separate(self):
+        other = make_user('guardian')
+        self.due(body='Email alert')
+        self.due('sms', destination='+254711000001', body='SMS alert')
+        notification = Notification.objects.create(recipient=other, notification_type='boarded', title='Alert',
+                                                   message='Other guardian')
+        NotificationOutbox.objects.create(notification=notification, recipient=other, channel='email',
+                                          destination=other.email, body='Other guardian',
+                                          next_attempt_at=timezone.now() + timedelta(seconds=60))
+
+        self.assertEqual(self.dispatcher.run_once(), 2)
+        self.assertEqual(self.sent('email'), ['Email alert'])
+        self.assertEqual(self.sent('sms'), ['SMS alert'])
+
+    def test_merged_sms_is_split_at_the_length_limit(self):
+        bodies = [f'Student {n} boarded bus KBX 001A at Kileleshwa stop at 06:4{n}' for n in range(5)]
+        for body in bodies:
+            self.due('sms', destination='+254711000001', body=body)
+
+        self.assertEqual(self.dispatcher.run_once(), 5)
+        messages = self.sent('sms')
+        self.assertGreater(len(messages), 1)
+        self.assertTrue(all(len(message) <= SMS_LIMIT for message in messages))
+        self.assertEqual('; '.join(messages).split('; '), bodies)
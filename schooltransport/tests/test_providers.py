@@ -0,0 +1,88 @@
+"""
+Notification providers: registry selection, metrics and error mapping
+"""
+
+from types import SimpleNamespace
+
+from django.core import mail
+from django.test import SimpleTestCase, override_settings
+
+from schooltransport.providers import (
+    BaseProvider, LocalProvider, SmtpEmailProvider, get_provider, provider_metrics, reset_providers,
+)
+
+
+def delivery(destination, body='Amani boarded the bus', subject='Alert'):
+    return SimpleNamespace(destination=destination, subject=subject, body=body)
+
+
+class BrokenProvider(BaseProvider):
+    channel = 'push'
+
+    def _send_batch(self, deliveries):
+        raise ConnectionError('provider unreachable')
+
+
+class ProviderRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        reset_providers()
+        self.addCleanup(reset_providers)
+
+    @override_settings(NOTIFICATION_PROVIDERS={'sms': 'schooltransport.providers.LocalProvider'})
+    def test_configured_class_is_created_once_per_channel(self):
+        provider = get_provider('sms')
+        self.assertIsInstance(provider, LocalProvider)
+        self.assertEqual(provider.channel, 'sms')
+        self.assertIs(get_provider('sms'), provider)
+
+        # Channels missing from the setting fall back to the defaults
+        self.assertIsInstance(get_provider('email'), SmtpEmailProvider)
+
+        reset_providers()
+        self.assertIsNot(get_provider('sms'), provider)
+
+    def test_unknown_channel(self):
+        with self.assertRaisesMessage(ValueError, 'Unknown delivery channel: fax'):
+            get_provider('fax')
+
+    @override_settings(NOTIFICATION_PROVIDERS={'email': 'schooltransport.providers.LocalProvider'})
+    def test_metrics_are_reported_per_channel(self):
+        provider = get_provider('email')
+        provider.fail_destinations.add('bad@example.com')
+
+        results = provider.send_batch([delivery('a@example.com'), delivery('bad@example.com'),
+                                       delivery('b@example.com')])
+        provider.send_batch([delivery('c@example.com')])
+
+        self.assertEqual([r is None for r in results], [True, False, True])
+        self.assertIsInstance(results[1], RuntimeError)
+        self.assertEqual([m['destination'] for m in provider.sent], ['a@example.com', 'b@example.com', 'c@example.com'])
+
+        metrics = provider_metrics()['email']
+        self.assertEqual((metrics['calls'], metrics['messages'], metrics['errors']), (2, 4, 1))
+        self.assertGreaterEqual(metrics['max_ms'], metrics['avg_ms'])
+
+
+class ErrorMappingTests(SimpleTestCase):
+
+    def test_provider_exception_fails_every_delivery(self):
+        provider = BrokenProvider()
+        results = provider.send_batch([delivery('token-1'), delivery('token-2')])
+
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(isinstance(r, ConnectionError) for r in results))
+        self.assertEqual(provider.metrics.as_dict()['errors'], 2)
+
+    def test_smtp_provider_reuses_one_connection(self):
+        provider = SmtpEmailProvider()
+        self.addCleanup(provider.close)
+
+        results = provider.send_batch([delivery('a@example.com'), delivery('b@example.com', subject='')])
+
+        self.assertEqual(results, [None, None])
+        self.assertEqual([m.to for m in mail.outbox], [['a@example.com'], ['b@example.com']])
+        self.assertEqual(mail.outbox[1].subject, 'Student Transportation Alert')
+        connection = provider._connection
+        provider.send_batch([delivery('c@example.com')])
+        self.assertIs(provider._connection, connection)
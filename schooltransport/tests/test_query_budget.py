@@ -0,0 +1,103 @@
+"""
+Query budgets for guardian views and fleet serialization: the number of SQL
+queries must not grow with the number of children, buses or rows.
+"""
+
+from django.urls import reverse
+
+from schooltransport.models import Bus, BusLocation, Route, StudentAttendance
+from schooltransport.serializers import BusSerializer
+
+from .base import QueryBudgetTestCase, make_bus, make_school, make_student, make_user
+
+# Session + authenticated user lookups done by every login_required view
+AUTH_QUERIES = 2
+
+
+class GuardianViewQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.school = make_school()
+        self.guardian = make_user('guardian')
+        self.client.force_login(self.guardian)
+
+    def add_family(self, children, attendance_per_child=0):
+        students = []
+        for _ in range(children):
+            student = make_student(self.school, guardian=self.guardian, bus=make_bus(self.school))
+            for i in range(attendance_per_child):
+                StudentAttendance.objects.create(
+                    student=student,
+                    bus=student.bus,
+                    status='boarded' if i % 2 == 0 else 'alighted',
+                )
+            students.append(student)
+        return students
+
+    def assertBudgetAtEveryScale(self, url, budget, attendance_per_child=0):
+        """Request the page with 1, then 4, then 10 children on separate buses"""
+        for total_children in (1, 4, 10):
+            self.add_family(total_children - self.guardian.students.count(), attendance_per_child)
+            with self.subTest(children=total_children):
+                with self.assertQueryBudget(budget):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_guardian_dashboard(self):
+        self.assertBudgetAtEveryScale(reverse('guardian_dashboard'), AUTH_QUERIES + 1)
+
+    def test_guardian_landing(self):
+        self.assertBudgetAtEveryScale(reverse('guardian_landing'), AUTH_QUERIES + 1)
+
+    def test_guardian_landing_shows_active_route(self):
+        student, _ = self.add_family(2)
+        for name, is_active in (('Old Route', False), ('Westlands Loop', True)):
+            Route.objects.create(school=self.school, bus=student.bus, name=name, start_location='Westlands',
+                                 end_location='School', estimated_duration=40, is_active=is_active)
+
+        response = self.client.get(reverse('guardian_landing'))
+        self.assertContains(response, 'Westlands Loop')
+        self.assertNotContains(response, 'Old Route')
+        self.assertContains(response, 'Not assigned')  # the second child's bus has no route
+
+    def test_guardian_trip_history(self):
+        # Attendance page + segmented bus trips
+        self.assertBudgetAtEveryScale(reverse('guardian_trips'), AUTH_QUERIES + 2, attendance_per_child=3)
+
+    def test_student_status(self):
+        student = self.add_family(1, attendance_per_child=2)[0]
+        url = reverse('student_status', args=[student.id])
+        # ETag lookup of the student's bus + student, attendance, location
+        with self.assertQueryBudget(AUTH_QUERIES + 4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+
+class BusSerializerQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.school = make_school()
+
+    def test_fleet_serialization_is_constant(self):
+        for fleet_size in (1, 5, 20):
+            while self.school.buses.count() < fleet_size:
+                bus = make_bus(self.school)
+                for i in range(3):
+                    BusLocation.objects.create(bus=bus, latitude=-1.28 + i * 0.001, longitude=36.81)
+            with self.subTest(buses=fleet_size):
+                # Buses, then the latest location of every bus
+                with self.assertQueryBudget(2):
+                    data = BusSerializer(self.school.buses.all(), many=True).data
+                self.assertEqual(len(data), fleet_size)
+
+    def test_latest_location_per_bus(self):
+        bus = make_bus(self.school)
+        idle_bus = make_bus(self.school)
+        BusLocation.objects.create(bus=bus, latitude=-1.0, longitude=36.0)
+        newest = BusLocation.objects.create(bus=bus, latitude=-1.5, longitude=36.5)
+
+        data = {row['id']: row for row in BusSerializer(Bus.objects.all(), many=True).data}
+
+        self.assertEqual(data[bus.id]['current_location']['id'], newest.id)
+        self.assertIsNone(data[idle_bus.id]['current_location'])
+        self.assertIsNone(BusSerializer(idle_bus).data['current_location'])
@@ -0,0 +1,204 @@
+"""
+Real-time publishing: saved rows reach their channel layer groups after
+commit, and the guardian SSE stream and tracking sockets relay them
+"""
+
+import json
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from schooltransport.models import BusLocation, Message, Notification
+from schooltransport.realtime import bus_group, publish_location, user_group
+from schooltransport.routing import websocket_urlpatterns
+from schooltransport.writer import stop_writer
+
+from .base import make_bus, make_school, make_student, make_user
+
+
+class ChannelLayerTestCase(TestCase):
+    """Subscribes a fresh channel to groups of the in-memory channel layer"""
+
+    def setUp(self):
+        self.channel_layer = get_channel_layer()
+        async_to_sync(self.channel_layer.flush)()
+        self.addCleanup(async_to_sync(self.channel_layer.flush))
+
+    def subscribe(self, *groups):
+        channel = async_to_sync(self.channel_layer.new_channel)()
+        for group in groups:
+            async_to_sync(self.channel_layer.group_add)(group, channel)
+        return channel
+
+    def receive(self, channel):
+        return async_to_sync(self.channel_layer.receive)(channel)
+
+    def pending(self, channel):
+        """Number of events waiting on a channel"""
+        return self.channel_layer.channels[channel].qsize() if channel in self.channel_layer.channels else 0
+
+
+class PublishTests(ChannelLayerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.guardian = make_user('guardian')
+        self.bus = make_bus(make_school())
+
+    def test_notification_is_published_after_commit(self):
+        channel = self.subscribe(user_group(self.guardian.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = Notification.objects.create(
+                recipient=self.guardian, bus=self.bus, notification_type='boarded',
+                title='Student Transportation Alert', message='Amani boarded the bus',
+            )
+            self.assertEqual(self.pending(channel), 0)
+
+        event = self.receive(channel)
+        self.assertEqual(event['type'], 'send_notification')
+        self.assertEqual((event['id'], event['bus_id'], event['message']),
+                         (notification.id, self.bus.id, 'Amani boarded the bus'))
+
+    def test_uncommitted_notification_is_not_published(self):
+        channel = self.subscribe(user_group(self.guardian.id))
+
+        with self.captureOnCommitCallbacks(execute=False):
+            Notification.objects.create(recipient=self.guardian, notification_type='boarded',
+                                        title='Alert', message='Never committed')
+        self.assertEqual(self.pending(channel), 0)
+
+    def test_message_reaches_the_recipient_only(self):
+        recipient, sender = self.guardian, self.bus.attendant
+        channel = self.subscribe(user_group(recipient.id))
+        sender_channel = self.subscribe(user_group(sender.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            message = Message.objects.create(sender=sender, recipient=recipient, bus=self.bus,
+                                             message_text='Running ten minutes late')
+
+        event = self.receive(channel)
+        self.assertEqual(event['type'], 'new_message')
+        self.assertEqual((event['id'], event['sender_id']), (message.id, sender.id))
+        self.assertEqual(self.pending(sender_channel), 0)
+
+    @override_settings(ETA_UPDATE_ON_FIX=False, GEOFENCE_ON_FIX=False, TRIP_SEGMENT_ON_FIX=False)
+    def test_location_goes_to_the_bus_group(self):
+        channel = self.subscribe(bus_group(self.bus.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            location = BusLocation.objects.create(bus=self.bus, latitude=-1.29, longitude=36.82, speed=30)
+            publish_location(location)
+
+        event = self.receive(channel)
+        self.assertEqual(event['type'], 'location_update')
+        self.assertEqual((event['bus_id'], event['latitude'], event['speed']), (self.bus.id, -1.29, 30))
+
+
+@override_settings(SSE_HEARTBEAT_INTERVAL=0.05, SSE_MAX_DURATION=5)
+class GuardianEventStreamTests(ChannelLayerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.guardian = make_user('guardian')
+        self.bus = make_bus(make_school())
+        make_student(self.bus.school, guardian=self.guardian, bus=self.bus)
+        self.async_client.force_login(self.guardian)
+
+    @staticmethod
+    async def next_event(stream):
+        """The next chunk that is not a keep-alive comment"""
+        async for chunk in stream:
+            chunk = chunk.decode()
+            if not chunk.startswith(':'):
+                return chunk
+
+    async def test_relays_bus_and_guardian_events(self):
+        response = await self.async_client.get(reverse('guardian_event_stream'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(response.is_async)
+
+        stream = response.streaming_content
+        try:
+            self.assertTrue((await self.next_event(stream)).startswith('retry: '))
+
+            await self.channel_layer.group_send(bus_group(self.bus.id), {
+                'type': 'location_update', 'bus_id': self.bus.id, 'latitude': -1.29, 'longitude': 36.82,
+                'speed': 30, 'heading': 90, 'timestamp': '2025-03-14T06:45:00+03:00',
+            })
+            event, data = (await self.next_event(stream)).split('\n')[:2]
+            self.assertEqual(event, 'event: location')
+            self.assertEqual(json.loads(data.removeprefix('data: '))['bus_id'], self.bus.id)
+
+            await self.channel_layer.group_send(user_group(self.guardian.id), {
+                'type': 'send_notification', 'id': 1, 'notification_type': 'boarded', 'title': 'Alert',
+                'message': 'Amani boarded the bus', 'student_id': None, 'bus_id': self.bus.id,
+                'timestamp': '2025-03-14T06:45:00+03:00',
+            })
+            self.assertTrue((await self.next_event(stream)).startswith('event: notification\n'))
+            self.assertTrue((await self.next_event(stream)).startswith('event: checkin\n'))
+        finally:
+            await stream.aclose()
+
+    async def test_requires_login(self):
+        response = await AsyncClient().get(reverse('guardian_event_stream'))
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(ETA_UPDATE_ON_FIX=False, GEOFENCE_ON_FIX=False, TRIP_SEGMENT_ON_FIX=False)
+class BusTrackingConsumerTests(TransactionTestCase):
+
+    def tearDown(self):
+        stop_writer()
+
+    async def test_fix_is_broadcast_with_an_integer_bus_id(self):
+        bus = await sync_to_async(lambda: make_bus(make_school()))()
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/bus/{bus.id}/tracking/')
+        communicator.scope['user'] = await sync_to_async(lambda: bus.driver)()
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.send_to(text_data=json.dumps({
+            'type': 'location_update', 'latitude': -1.29, 'longitude': 36.82, 'speed': 30,
+        }))
+        # The dashboards compare this with the numeric id from the bus API
+        self.assertEqual(json.loads(await communicator.receive_from())['bus_id'], bus.id)
+        await communicator.disconnect()
+
+
+class WriterPublishTests(TransactionTestCase):
+    """Events published by writes the consumers queue on the database writer"""
+
+    def tearDown(self):
+        stop_writer()
+
+    async def connect(self, path, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    @override_settings(DATABASE_WRITE_QUEUE=True)
+    async def test_checkin_reaches_the_guardian_socket(self):
+        guardian = await sync_to_async(make_user)('guardian')
+        bus = await sync_to_async(lambda: make_bus(make_school()))()
+        student = await sync_to_async(make_student)(bus.school, guardian=guardian, bus=bus)
+        attendant = await sync_to_async(lambda: bus.attendant)()
+
+        notifications = await self.connect('/ws/notifications/', guardian)
+        checkin = await self.connect(f'/ws/bus/{bus.id}/checkin/', attendant)
+        await checkin.send_to(text_data=json.dumps({
+            'type': 'student_boarded', 'student_id': student.id, 'student_name': 'Amani', 'status': 'boarded',
+        }))
+
+        # Published from the writer's on_commit hooks; must wake this event loop
+        event = json.loads(await notifications.receive_from(timeout=2))
+        self.assertEqual((event['type'], event['message']), ('notification', 'Amani has boarded the bus'))
+        await checkin.disconnect()
+        await notifications.disconnect()
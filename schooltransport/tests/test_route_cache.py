@@ -0,0 +1,106 @@
+"""
+Route cache: precomputed geometry, cache hits and invalidation on writes
+"""
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from schooltransport.geo import haversine_m
+from schooltransport.models import Route, RouteStop
+from schooltransport.route_cache import get_route_data
+
+from .base import make_bus, make_school
+
+# (name, latitude, longitude) along Langata Road, Nairobi
+STOPS = [
+    ('Madaraka', -1.3090, 36.8150),
+    ('Nyayo Stadium', -1.3050, 36.8250),
+    ('Wilson Airport', -1.3190, 36.8140),
+]
+
+
+def make_route(school, bus, stops=STOPS, **extra):
+    route = Route.objects.create(
+        school=school, bus=bus, name=extra.pop('name', 'Langata Road'),
+        start_location=stops[0][0], end_location=stops[-1][0], estimated_duration=40, **extra
+    )
+    for order, (name, lat, lng) in enumerate(stops, start=1):
+        RouteStop.objects.create(route=route, name=name, latitude=lat, longitude=lng,
+                                 order=order, estimated_arrival_time=order * 10)
+    return route
+
+
+class RouteCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.school = make_school()
+        self.bus = make_bus(self.school)
+
+    def create(self, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return make_route(*args, **kwargs)
+
+    def test_haversine(self):
+        # One degree of latitude is about 111.2 km
+        self.assertAlmostEqual(haversine_m(0, 36.8, 1, 36.8), 111195, delta=5)
+        self.assertEqual(haversine_m(-1.3, 36.8, -1.3, 36.8), 0)
+
+    def test_geometry(self):
+        self.create(self.school, self.bus)
+        data = get_route_data(self.bus.id)
+
+        legs = [haversine_m(a[1], a[2], b[1], b[2]) for a, b in zip(STOPS, STOPS[1:])]
+        self.assertEqual([s['distance_from_start_m'] for s in data['stops']],
+                         [0.0, round(legs[0], 1), round(sum(legs), 1)])
+        self.assertEqual(data['total_distance_m'], round(sum(legs), 1))
+        self.assertEqual(data['bounding_box'], {
+            'min_lat': -1.3190, 'min_lng': 36.8140, 'max_lat': -1.3050, 'max_lng': 36.8250,
+        })
+
+    def test_cached_until_a_stop_changes(self):
+        route = self.create(self.school, self.bus)
+        get_route_data(self.bus.id)
+        with self.assertNumQueries(0):
+            get_route_data(self.bus.id)
+
+        stop = route.stops.get(order=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            stop.name = 'Wilson Airport Gate'
+            stop.save()
+        self.assertEqual(get_route_data(self.bus.id)['stops'][-1]['name'], 'Wilson Airport Gate')
+
+    def test_missing_route_is_cached(self):
+        self.assertIsNone(get_route_data(self.bus.id)['route'])
+        with self.assertNumQueries(0):
+            get_route_data(self.bus.id)
+
+        self.create(self.school, self.bus)
+        self.assertEqual(get_route_data(self.bus.id)['route']['name'], 'Langata Road')
+
+    def test_reassigning_route_clears_both_buses(self):
+        route = self.create(self.school, self.bus)
+        other_bus = make_bus(self.school)
+        get_route_data(self.bus.id)
+        get_route_data(other_bus.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            route.bus = other_bus
+            route.save()
+        self.assertIsNone(get_route_data(self.bus.id)['route'])
+        self.assertEqual(get_route_data(other_bus.id)['route']['id'], route.id)
+
+    def test_get_bus_route_view(self):
+        self.create(self.school, self.bus)
+        self.client.force_login(self.bus.driver)
+        url = reverse('get_bus_route', args=[self.bus.id])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['route']['name'], 'Langata Road')
+        self.assertEqual([s['name'] for s in data['stops']], [name for name, _, _ in STOPS])
+        self.assertGreater(data['total_distance_m'], 0)
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
@@ -0,0 +1,79 @@
+"""
+Seed dataset generator: sizes, historical timestamps, determinism and reruns
+"""
+
+from datetime import date
+
+from django.test import TestCase, override_settings
+
+from schooltransport.models import (
+    Bus, BusLocation, DailyAttendanceSummary, Notification, RouteStop, School, Student, StudentAttendance,
+)
+from schooltransport.seeding import PREFIX, seed_dataset
+
+from .base import make_bus, make_school, make_student, make_user
+
+END = date(2025, 3, 14)  # a Friday: the 7 days before it hold 5 weekdays
+SMALL = dict(schools=1, buses_per_school=2, students_per_bus=3, stops_per_route=3, days=7, fixes_per_trip=4,
+             end_date=END, chunk=7)
+
+
+def history(seed):
+    seed_dataset(seed=seed, **SMALL)
+    return list(StudentAttendance.objects.filter(student__school__admin__username__startswith=PREFIX)
+                .order_by('timestamp', 'student__registration_number', 'status')
+                .values_list('student__registration_number', 'status', 'timestamp', 'biometric_verified'))
+
+
+@override_settings(ETA_UPDATE_ON_FIX=False, GEOFENCE_ON_FIX=False, TRIP_SEGMENT_ON_FIX=False)
+class SeedDatasetTests(TestCase):
+
+    def test_fleet_and_history_sizes(self):
+        counts = seed_dataset(**SMALL)
+
+        self.assertEqual(Bus.objects.filter(registration_number__startswith='SEED ').count(), 2)
+        self.assertEqual(RouteStop.objects.filter(route__bus__registration_number__startswith='SEED ').count(), 6)
+        students = Student.objects.filter(registration_number__startswith='SEED/')
+        self.assertEqual(students.count(), 6)
+        self.assertFalse(students.filter(pickup_stop__isnull=True).exists())
+        self.assertFalse(students.filter(guardian__isnull=True).exists())
+
+        # 2 buses x 5 weekdays x 2 trips x 4 fixes
+        self.assertEqual(counts['bus_locations'], 80)
+        self.assertEqual(BusLocation.objects.count(), 80)
+        attendance = StudentAttendance.objects.count()
+        self.assertEqual(counts['student_attendance'], attendance)
+        self.assertEqual(attendance % 4, 0)  # boarded and alighted, twice a day
+        self.assertEqual(Notification.objects.count(), attendance)
+        self.assertEqual(counts['daily_attendance_summaries'], DailyAttendanceSummary.objects.count())
+
+    def test_timestamps_are_historical(self):
+        seed_dataset(**SMALL)
+
+        days = set(StudentAttendance.objects.values_list('date', flat=True))
+        self.assertTrue(days)
+        self.assertTrue(all(date(2025, 3, 10) <= day <= END for day in days))
+        self.assertLessEqual(BusLocation.objects.latest('timestamp').timestamp.date(), END)
+        self.assertLessEqual(Notification.objects.latest('created_at').created_at.date(), END)
+        # auto_now_add is switched back on once seeding is done
+        self.assertTrue(BusLocation._meta.get_field('timestamp').auto_now_add)
+
+    def test_rerun_replaces_the_dataset_deterministically(self):
+        first = history(seed=7)
+        second = history(seed=7)
+        self.assertEqual(first, second)
+        self.assertEqual(School.objects.filter(registration_number__startswith='SEED/').count(), 1)
+        self.assertEqual(StudentAttendance.objects.count(), len(second))
+        self.assertNotEqual(history(seed=8), second)
+
+    def test_other_data_is_untouched(self):
+        school = make_school()
+        bus = make_bus(school)
+        student = make_student(school, guardian=make_user('guardian'), bus=bus)
+        StudentAttendance.objects.create(student=student, bus=bus, status='boarded')
+
+        seed_dataset(**SMALL)
+        seed_dataset(**SMALL)
+
+        self.assertTrue(School.objects.filter(id=school.id).exists())
+        self.assertEqual(StudentAttendance.objects.filter(student=student).count(), 1)
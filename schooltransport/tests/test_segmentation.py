@@ -0,0 +1,192 @@
+"""
+Trip segmentation: trips, dwell stops and end conditions from a stream of fixes
+"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from schooltransport.geo import haversine_m
+from schooltransport.models import BusLocation, BusTrip
+from schooltransport.segmentation import rebuild_trips, segment_fix
+
+from .base import make_bus, make_school, make_student, make_user
+from .test_route_cache import make_route
+
+# make_school() puts the school at (-1.2865, 36.8172)
+STOPS = [('Nyayo Estate', -1.3300, 36.8000), ('Kenyatta Market', -1.3100, 36.8000)]
+SCHOOL = (-1.2865, 36.8172)
+
+
+def line(start, end, steps):
+    """`steps` + 1 evenly spaced points from start to end"""
+    return [(start[0] + (end[0] - start[0]) * i / steps, start[1] + (end[1] - start[1]) * i / steps)
+            for i in range(steps + 1)]
+
+
+@override_settings(ETA_UPDATE_ON_FIX=False, GEOFENCE_ON_FIX=False, TRIP_SEGMENT_ON_FIX=False,
+                   GEOFENCE_SCHOOL_RADIUS_M=200, GEOFENCE_STOP_RADIUS_M=75, TRIP_GAP_SECONDS=600,
+                   TRIP_STOP_SPEED_KMH=3, TRIP_DWELL_SECONDS=30, TRIP_PARKED_SECONDS=900,
+                   TRIP_MIN_DISTANCE_M=200)
+class SegmentationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.school = make_school()
+        self.bus = make_bus(self.school)
+        self.route = make_route(self.school, self.bus, stops=STOPS)
+        self.start = timezone.now().replace(hour=6, minute=30, second=0, microsecond=0)
+        self.clock = self.start
+
+    def feed(self, points, every=30, speed=None):
+        trip = None
+        for lat, lng in points:
+            trip = segment_fix(self.bus.id, lat, lng, speed, self.clock)
+            self.clock += timedelta(seconds=every)
+        return trip
+
+    def wait(self, seconds, point, every=30):
+        self.feed([point] * (seconds // every), every=every, speed=0)
+
+    def test_morning_run_ends_at_school_with_dwell_stop(self):
+        home, market = STOPS[0][1:], STOPS[1][1:]
+        self.feed(line(home, market, 10))
+        self.wait(90, market)
+        self.feed(line(market, SCHOOL, 10)[1:])
+
+        trip = BusTrip.objects.get()
+        self.assertEqual(trip.end_reason, 'school')
+        self.assertEqual(trip.started_at, self.start)
+        self.assertEqual((trip.start_latitude, trip.start_longitude), home)
+        self.assertIsNotNone(trip.ended_at)
+
+        expected = haversine_m(*home, *market) + sum(
+            haversine_m(*a, *b) for a, b in zip(line(market, SCHOOL, 10), line(market, SCHOOL, 10)[1:])
+        )
+        # The last leg is counted up to the first fix inside the school fence
+        self.assertAlmostEqual(trip.distance_m, expected, delta=haversine_m(*market, *SCHOOL) / 10)
+        self.assertGreater(trip.max_speed_kmh, 20)
+        self.assertEqual(trip.duration_seconds, int((trip.ended_at - trip.started_at).total_seconds()))
+
+        stop = trip.stops.get()
+        self.assertEqual(trip.stop_count, 1)
+        self.assertEqual(stop.route_stop.name, 'Kenyatta Market')
+        self.assertGreaterEqual(stop.duration_seconds, 90)
+        self.assertEqual(trip.dwell_seconds, stop.duration_seconds)
+
+    def test_idle_bus_starts_no_trip(self):
+        self.wait(300, STOPS[0][1:])
+        self.assertFalse(BusTrip.objects.exists())
+
+    def test_gap_ends_trip_and_next_movement_starts_another(self):
+        home, market = STOPS[0][1:], STOPS[1][1:]
+        self.feed(line(home, market, 10))
+        self.clock += timedelta(seconds=1200)
+        self.feed(line(market, home, 10))
+
+        first, second = BusTrip.objects.order_by('started_at')
+        self.assertEqual(first.end_reason, 'gap')
+        self.assertEqual((first.last_latitude, first.last_longitude), market)
+        self.assertIsNone(second.ended_at)
+
+    def test_parked_bus_ends_trip_when_it_stopped(self):
+        home, market = STOPS[0][1:], STOPS[1][1:]
+        self.feed(line(home, market, 10))
+        stopped_at = self.clock
+        self.wait(960, market)
+
+        trip = BusTrip.objects.get()
+        self.assertEqual(trip.end_reason, 'parked')
+        self.assertEqual(trip.ended_at, stopped_at)
+        self.assertEqual(trip.stop_count, 0)
+
+    def test_short_trips_are_dropped(self):
+        home = STOPS[0][1:]
+        self.feed(line(home, (home[0] + 0.001, home[1]), 4))
+        self.wait(960, (home[0] + 0.001, home[1]))
+        self.assertFalse(BusTrip.objects.exists())
+
+    def test_out_of_order_fixes_are_ignored(self):
+        home, market = STOPS[0][1:], STOPS[1][1:]
+        self.feed(line(home, market, 4))
+        before = BusTrip.objects.get()
+        segment_fix(self.bus.id, *home, None, self.start + timedelta(seconds=45))
+        after = BusTrip.objects.get()
+        self.assertEqual((after.fix_count, after.distance_m), (before.fix_count, before.distance_m))
+
+    def test_rebuild_replays_location_history(self):
+        for i, (lat, lng) in enumerate(line(STOPS[0][1:], SCHOOL, 20)):
+            fix = BusLocation.objects.create(bus=self.bus, latitude=lat, longitude=lng)
+            BusLocation.objects.filter(id=fix.id).update(timestamp=self.start + timedelta(seconds=30 * i))
+
+        self.assertEqual(rebuild_trips(self.bus.id), 1)
+        self.assertEqual(BusTrip.objects.get().end_reason, 'school')
+
+    def test_rebuild_starts_each_run_at_its_own_first_fix(self):
+        # Two school days: morning home -> school, afternoon school -> home,
+        # with no fixes while the bus waits at school or overnight
+        home = STOPS[0][1:]
+        runs = []
+        for day in range(2):
+            for hour, points in ((6, line(home, SCHOOL, 20)), (16, line(SCHOOL, home, 20))):
+                started = self.start.replace(hour=hour) + timedelta(days=day)
+                runs.append(started)
+                for i, (lat, lng) in enumerate(points):
+                    fix = BusLocation.objects.create(bus=self.bus, latitude=lat, longitude=lng, speed=30)
+                    BusLocation.objects.filter(id=fix.id).update(timestamp=started + timedelta(seconds=30 * i))
+
+        self.assertEqual(rebuild_trips(self.bus.id), 4)
+        trips = list(BusTrip.objects.order_by('started_at'))
+        self.assertEqual([trip.started_at for trip in trips], runs)
+        self.assertEqual([trip.end_reason for trip in trips], ['school', 'gap', 'school', ''])
+        for trip in trips:
+            self.assertLessEqual(trip.duration_seconds, 20 * 30)
+
+    @override_settings(TRIP_SEGMENT_ON_FIX=True)
+    def test_new_fixes_are_segmented(self):
+        for lat, lng in line(STOPS[0][1:], STOPS[1][1:], 3):
+            with self.captureOnCommitCallbacks(execute=True):
+                BusLocation.objects.create(bus=self.bus, latitude=lat, longitude=lng, speed=30)
+        trip = BusTrip.objects.get()
+        self.assertIsNone(trip.ended_at)
+        self.assertEqual(trip.fix_count, 4)
+
+    def test_bus_trips_api(self):
+        self.feed(line(STOPS[0][1:], SCHOOL, 20))
+        guardian = make_user('guardian')
+        make_student(self.school, guardian=guardian, bus=self.bus)
+        self.client.force_login(guardian)
+
+        response = self.client.get(reverse('bus_trips_api', args=[self.bus.id]))
+
+        self.assertEqual(response.status_code, 200)
+        [trip] = response.json()['trips']
+        self.assertEqual(trip['end_reason'], 'school')
+        self.assertGreater(trip['distance_m'], 4000)
+        self.assertIsNone(response.json()['next_cursor'])
+
+    def test_bus_trips_api_is_limited_to_the_bus(self):
+        self.feed(line(STOPS[0][1:], SCHOOL, 20))
+        url = reverse('bus_trips_api', args=[self.bus.id])
+
+        for user in (self.bus.driver, self.bus.attendant, self.school.admin):
+            self.client.force_login(user)
+            self.assertEqual(len(self.client.get(url).json()['trips']), 1, user.username)
+
+        # Another guardian, another school's admin, another bus's driver
+        for user in (make_user('guardian'), make_school().admin, make_bus(self.school).driver):
+            self.client.force_login(user)
+            with self.assertLogs('django.request', 'WARNING'):
+                self.assertEqual(self.client.get(url).status_code, 404, user.username)
+
+    def test_driver_history_lists_trips(self):
+        self.feed(line(STOPS[0][1:], SCHOOL, 20))
+        self.client.force_login(self.bus.driver)
+
+        response = self.client.get(reverse('driver_trips'))
+
+        self.assertContains(response, 'Arrived at School')
+        self.assertEqual(list(response.context['bus_trips']), list(BusTrip.objects.all()))
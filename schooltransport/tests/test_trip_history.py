@@ -0,0 +1,107 @@
+"""
+Cursor pagination and streaming for driver/guardian trip history
+"""
+
+import json
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from schooltransport.models import StudentAttendance
+from schooltransport.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+from .base import make_bus, make_school, make_student, make_user
+
+
+@override_settings(TRIP_HISTORY_PAGE_SIZE=4, TRIP_STREAM_CHUNK_SIZE=3)
+class TripHistoryTests(TestCase):
+
+    def setUp(self):
+        school = make_school()
+        self.bus = make_bus(school)
+        self.guardian = make_user('guardian')
+        self.student = make_student(school, guardian=self.guardian, bus=self.bus)
+        make_student(school, guardian=make_user('guardian'), bus=self.bus)
+
+    def add_trips(self, count):
+        """Attendance rows in time order, with pairs sharing a timestamp"""
+        start = timezone.now() - timedelta(days=30)
+        trips = []
+        for i in range(count):
+            trip = StudentAttendance.objects.create(student=self.student, bus=self.bus, status='boarded')
+            trip.timestamp = start + timedelta(hours=i // 2)
+            trip.date = trip.timestamp.date()
+            trip.save(update_fields=['timestamp', 'date'])
+            trips.append(trip)
+        return trips
+
+    def walk_api(self):
+        ids, cursor = [], None
+        while True:
+            params = {'cursor': cursor} if cursor else {}
+            data = self.client.get(reverse('trip_history_api'), params).json()
+            ids.extend(trip['id'] for trip in data['trips'])
+            cursor = data['next_cursor']
+            if not cursor:
+                return ids
+
+    def test_cursor_round_trip(self):
+        now = timezone.now()
+        self.assertEqual(decode_cursor(encode_cursor(now, 42)), (now, 42))
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('not a cursor')
+
+    def test_pages_cover_history_once_with_tied_timestamps(self):
+        trips = self.add_trips(11)
+        self.client.force_login(self.guardian)
+        self.assertEqual(self.walk_api(), [t.id for t in reversed(trips)])
+
+    def test_driver_pages(self):
+        self.add_trips(6)
+        self.client.force_login(self.bus.driver)
+        response = self.client.get(reverse('driver_trips'))
+        self.assertEqual(len(response.context['trips']), 4)
+        self.assertContains(response, self.bus.registration_number)
+
+        response = self.client.get(reverse('driver_trips'), {'cursor': response.context['next_cursor']})
+        self.assertEqual(len(response.context['trips']), 2)
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_guardian_sees_only_own_students(self):
+        other = StudentAttendance.objects.create(
+            student=self.bus.students.exclude(id=self.student.id).get(), bus=self.bus, status='boarded'
+        )
+        trips = self.add_trips(2)
+        self.client.force_login(self.guardian)
+        response = self.client.get(reverse('guardian_trips'))
+        self.assertEqual([t.id for t in response.context['trips']], [t.id for t in reversed(trips)])
+        self.assertNotIn(other.id, self.walk_api())
+
+    async def test_stream_date_range(self):
+        # Read through the ASGI test client, as Daphne serves it
+        trips = await sync_to_async(self.add_trips)(10)
+        await sync_to_async(self.async_client.force_login)(self.guardian)
+        response = await self.async_client.get(reverse('trip_history_api'), {
+            'start': trips[2].date.isoformat(),
+            'end': trips[-1].date.isoformat(),
+        })
+        self.assertTrue(response.streaming)
+        # Sent a cursor chunk at a time instead of being buffered whole
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertGreater(len(chunks), 2)
+        data = json.loads(b''.join(chunks))
+        expected = [t.id for t in reversed(trips) if t.date >= trips[2].date]
+        self.assertEqual([trip['id'] for trip in data['trips']], expected)
+
+    def test_invalid_parameters(self):
+        self.client.force_login(self.guardian)
+        self.assertEqual(self.client.get(reverse('trip_history_api'), {'cursor': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('trip_history_api'), {'start': '2024-13-45'}).status_code, 400)
+
+    def test_other_roles_forbidden(self):
+        self.client.force_login(make_user('admin'))
+        self.assertEqual(self.client.get(reverse('trip_history_api')).status_code, 403)
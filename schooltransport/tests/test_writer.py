@@ -0,0 +1,118 @@
+"""
+SQLite production profile and the single database writer
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+
+from django.db import connections, transaction
+from django.test import TransactionTestCase
+
+from schooltransport.models import School
+from schooltransport.writer import DatabaseWriter, run_write, stop_writer
+
+from .base import make_school
+
+
+class SqlitePragmaTests(TransactionTestCase):
+
+    def test_new_connections_get_production_pragmas(self):
+        default = connections['default']
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = {**default.settings_dict, 'NAME': os.path.join(directory, 'pragmas.sqlite3')}
+            connection = type(default)(settings_dict, alias='pragma_test')
+            try:
+                with connection.cursor() as cursor:
+                    values = {}
+                    for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'temp_store'):
+                        cursor.execute(f'PRAGMA {pragma}')
+                        values[pragma] = cursor.fetchone()[0]
+            finally:
+                connection.close()
+
+        self.assertEqual(values, {
+            'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000, 'cache_size': -65536, 'temp_store': 2,
+        })
+
+
+class DatabaseWriterTests(TransactionTestCase):
+
+    def setUp(self):
+        self.school = make_school()
+        self.writer = DatabaseWriter(batch_size=10)
+
+    def tearDown(self):
+        self.writer.stop(timeout=5)
+
+    def rename(self, name):
+        School.objects.filter(id=self.school.id).update(name=name)
+        return name
+
+    def fail(self):
+        School.objects.filter(id=self.school.id).update(name='rolled back')
+        raise ValueError('bad write')
+
+    def test_queued_writes_commit_in_order(self):
+        futures = [self.writer.submit(self.rename, f'School v{i}') for i in range(25)]
+        self.assertEqual([f.result(timeout=5) for f in futures], [f'School v{i}' for i in range(25)])
+        self.school.refresh_from_db()
+        self.assertEqual(self.school.name, 'School v24')
+
+    def test_failing_write_only_rolls_back_itself(self):
+        # Each write has its own savepoint, whether or not they share a batch
+        futures = [self.writer.submit(self.rename, 'before'), self.writer.submit(self.fail),
+                   self.writer.submit(self.rename, 'after')]
+
+        self.assertEqual(futures[0].result(timeout=5), 'before')
+        with self.assertRaisesMessage(ValueError, 'bad write'):
+            futures[1].result(timeout=5)
+        self.assertEqual(futures[2].result(timeout=5), 'after')
+        self.school.refresh_from_db()
+        self.assertEqual(self.school.name, 'after')
+
+    def test_stop_drains_the_queue(self):
+        futures = [self.writer.submit(self.rename, f'School v{i}') for i in range(5)]
+        self.writer.stop(timeout=5)
+        self.assertTrue(all(f.done() for f in futures))
+        self.assertFalse(self.writer.thread.is_alive())
+
+
+class WriterHookTests(TransactionTestCase):
+    """on_commit callbacks registered by queued writes"""
+
+    def setUp(self):
+        self.school = make_school()
+        self.hooks = []
+
+    def tearDown(self):
+        stop_writer()
+
+    def rename(self, name, fail=False):
+        School.objects.filter(id=self.school.id).update(name=name)
+        transaction.on_commit(lambda: self.hooks.append((name, threading.current_thread().name)))
+        if fail:
+            raise ValueError('bad write')
+        return name
+
+    async def test_hooks_run_in_order_off_the_writer_thread(self):
+        for i in range(3):
+            await run_write(self.rename, f'School v{i}')
+        with self.assertRaisesMessage(ValueError, 'bad write'):
+            await run_write(self.rename, 'rolled back', fail=True)
+        await run_write(self.rename, 'School v3')
+
+        # The last write's result is returned before its hooks have run
+        for _ in range(100):
+            if len(self.hooks) == 4:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual([name for name, _ in self.hooks], ['School v0', 'School v1', 'School v2', 'School v3'])
+        self.assertTrue(all(thread.startswith('database-writer-hooks') for _, thread in self.hooks))
+
+    def test_sync_submit_runs_hooks_on_the_writer(self):
+        writer = DatabaseWriter()
+        self.addCleanup(writer.stop, timeout=5)
+        writer.submit(self.rename, 'School v1').result(timeout=5)
+        self.assertEqual(self.hooks, [('School v1', 'database-writer')])
@@ -16,6 +16,7 @@ urlpatterns = [
     path('guardian/dashboard/', views.guardian_dashboard, name='guardian_dashboard'),
     path('guardian/', views.guardian_landing, name='guardian_landing'),
     path('guardian/student/<int:student_id>/status/', views.student_status, name='student_status'),
+    path('guardian/events/', views.guardian_event_stream, name='guardian_event_stream'),
     
     # Driver URLs
     path('driver/dashboard/', views.driver_dashboard, name='driver_dashboard'),
@@ -44,6 +45,9 @@ urlpatterns = [
     
     # API endpoints
     path('api/bus/<int:bus_id>/attendant/', views.get_bus_attendant, name='get_bus_attendant'),
+    path('api/bus/<int:bus_id>/eta/', views.get_bus_eta, name='get_bus_eta'),
+    path('api/trips/', views.trip_history_api, name='trip_history_api'),
+    path('api/bus/<int:bus_id>/trips/', views.bus_trips_api, name='bus_trips_api'),
     
     # Admin URLs
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
@@ -52,5 +56,8 @@ urlpatterns = [
     path('admin/buses/', views.manage_buses, name='manage_buses'),
     path('admin/users/', views.manage_users, name='manage_users'),
     path('admin/attendance/', views.view_attendance_reports, name='attendance_reports'),
+    path('admin/attendance/export/', views.export_attendance_report, name='export_attendance_report'),
+    path('admin/metrics/requests/', views.request_metrics_report, name='request_metrics'),
+    path('metrics/', views.metrics_endpoint, name='metrics'),
     path('guardian/trips/', views.guardian_trip_history, name='guardian_trips'),
 ]
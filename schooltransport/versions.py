@@ -0,0 +1,75 @@
+"""
+Cache Version Counters
+Per-object version tokens kept in the Django cache and replaced by signal
+handlers whenever the underlying rows change. Polling endpoints build their
+ETag from these tokens, so an unchanged response is answered with
+304 Not Modified before any of its queries run.
+
+Tokens live in the default cache; with several server processes it must be
+a shared backend (e.g. Redis or Memcached) for the ETags to stay consistent,
+otherwise a bump in one process is never seen by the others and they keep
+answering 304 for stale data. check_shared_cache() enforces that outside DEBUG.
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+KEY_PREFIX = 'version'
+
+# Cache backends whose contents only the current process sees
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def check_shared_cache():
+    """Refuse a process-local default cache unless DEBUG or ALLOW_PROCESS_LOCAL_CACHE is on"""
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.DEBUG or settings.ALLOW_PROCESS_LOCAL_CACHE or backend not in PROCESS_LOCAL_CACHES:
+        return
+    raise ImproperlyConfigured(
+        f'CACHES uses {backend}, so ETag version tokens are not shared between server processes. '
+        'Set REDIS_URL (or configure another shared cache), or ALLOW_PROCESS_LOCAL_CACHE=1 '
+        'when only one server process runs.'
+    )
+
+
+def version_key(scope, obj_id):
+    return f'{KEY_PREFIX}:{scope}:{obj_id}'
+
+
+def _new_token():
+    return uuid.uuid4().hex[:12]
+
+
+def bump_version(scope, *ids):
+    """Give each object a new token once the current transaction commits"""
+    keys = [version_key(scope, obj_id) for obj_id in ids if obj_id is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.set_many({key: _new_token() for key in keys}, timeout=None))
+
+
+def get_versions(*pairs):
+    """Current tokens for (scope, id) pairs, creating missing ones"""
+    keys = [version_key(scope, obj_id) for scope, obj_id in pairs]
+    tokens = cache.get_many(keys)
+
+    missing = [key for key in keys if key not in tokens]
+    if missing:
+        # add() keeps a token another process created first
+        for key in missing:
+            cache.add(key, _new_token(), timeout=None)
+        tokens.update(cache.get_many(missing))
+    return [tokens.get(key, '') for key in keys]
+
+
+def versions_etag(*pairs, extra=''):
+    """ETag value combining the tokens for `pairs` with any request-specific text"""
+    parts = get_versions(*pairs) + [str(extra)]
+    return hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
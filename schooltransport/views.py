@@ -2,23 +2,39 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.http import JsonResponse, HttpResponse
-from django.views.decorators.http import require_http_methods
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import condition, require_http_methods
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Q
+from django.db.models import F, OuterRef, Q, Subquery, Sum
 from django.utils import timezone
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+import asyncio
+import hmac
 import json
-import requests
-from datetime import timedelta
+from datetime import date, timedelta
 
 from .models import (
     UserProfile, School, Bus, Student, StudentAttendance,
-    BusLocation, Notification, Route, RouteStop
+    BusLocation, Notification, Route, RouteStop, DailyAttendanceSummary, BusTrip
 )
 from .serializers import (
     UserProfileSerializer, BusSerializer, StudentSerializer,
     BusLocationSerializer, NotificationSerializer
 )
+from .attendance import school_day_summaries
+from .eta import get_bus_eta as get_bus_eta_data
+from .exports import EXPORT_FORMATS, async_lines, attendance_export_rows, export_lines
+from .metrics import prometheus_text, request_metrics, reset_request_metrics
+from .notifications import create_guardian_notification
+from .pagination import InvalidCursor, paginate
+from .realtime import bus_group, publish_location, user_group
+from .route_cache import get_route_data
+from .versions import bump_version, versions_etag
 
 
 def home(request):
@@ -143,11 +159,17 @@ def logout_view(request):
 def guardian_dashboard(request):
     """Guardian dashboard showing their students and bus tracking"""
     guardian = request.user
-    students = Student.objects.filter(guardian=guardian)
+    
+    # One query for students, their buses and crews; the page loads each
+    # student's status through student_status
+    students = list(
+        Student.objects.filter(guardian=guardian)
+        .select_related('user', 'school', 'bus__driver', 'bus__attendant__profile')
+    )
     
     context = {
         'students': students,
-        'buses': [student.bus for student in students if student.bus]
+        'buses': list({student.bus_id: student.bus for student in students if student.bus}.values())
     }
     return render(request, 'guardian/dashboard.html', context)
 
@@ -156,7 +178,10 @@ def guardian_dashboard(request):
 def guardian_landing(request):
     """Landing page for guardians (profile, students, trip history)"""
     guardian = request.user
-    students = Student.objects.filter(guardian=guardian)
+    active_route = Route.objects.filter(bus=OuterRef('bus'), is_active=True).order_by('id')
+    students = Student.objects.filter(guardian=guardian).select_related('user', 'school', 'bus').annotate(
+        route_name=Subquery(active_route.values('name')[:1])
+    )
     context = {
         'user': guardian,
         'students': students,
@@ -164,10 +189,28 @@ def guardian_landing(request):
     return render(request, 'guardian/landing.html', context)
 
 
+def _student_status_etag(request, student_id):
+    bus_id = Student.objects.filter(
+        id=student_id, guardian=request.user
+    ).values_list('bus_id', flat=True).first()
+    if bus_id is None:
+        return None
+    return versions_etag(
+        ('student', student_id), ('attendance', student_id), ('bus', bus_id), ('location', bus_id),
+        extra=f'{request.user.id}:{timezone.now().date()}'
+    )
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_student_status_etag)
 def student_status(request, student_id):
     """Get real-time status of a student's bus with GUI"""
-    student = get_object_or_404(Student, id=student_id, guardian=request.user)
+    student = get_object_or_404(
+        Student.objects.select_related('school', 'bus__driver'),
+        id=student_id,
+        guardian=request.user
+    )
     
     if not student.bus:
         return render(request, 'guardian/student_status.html', {
@@ -304,7 +347,10 @@ def update_bus_location(request):
         # Update bus current location
         bus.current_latitude = data['latitude']
         bus.current_longitude = data['longitude']
-        bus.save()
+        bus.save(update_fields=['current_latitude', 'current_longitude', 'updated_at'])
+        
+        # Broadcast to WebSocket/SSE subscribers of this bus
+        publish_location(location)
         
         return JsonResponse({
             'message': 'Location updated successfully',
@@ -314,37 +360,22 @@ def update_bus_location(request):
         return JsonResponse({'error': str(e)}, status=400)
 
 
+def _bus_route_etag(request, bus_id):
+    return versions_etag(('route', bus_id), extra=request.user.id)
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_bus_route_etag)
 def get_bus_route(request, bus_id):
-    """Get the current bus route with all stops"""
+    """Get the current bus route with all stops, distances along the route and bounding box"""
     bus = get_object_or_404(Bus, id=bus_id, driver=request.user)
-    route = bus.routes.filter(is_active=True).first()
+    route_data = get_route_data(bus.id)
     
-    if not route:
+    if not route_data['route']:
         return JsonResponse({'error': 'No active route'}, status=404)
     
-    stops = route.stops.all()
-    
-    return JsonResponse({
-        'route': {
-            'id': route.id,
-            'name': route.name,
-            'start': route.start_location,
-            'end': route.end_location,
-            'estimated_duration': route.estimated_duration
-        },
-        'stops': [
-            {
-                'id': stop.id,
-                'name': stop.name,
-                'latitude': stop.latitude,
-                'longitude': stop.longitude,
-                'order': stop.order,
-                'estimated_arrival_time': stop.estimated_arrival_time
-            }
-            for stop in stops
-        ]
-    })
+    return JsonResponse(route_data)
 
 
 # ==================== BIOMETRIC & ATTENDANCE VIEWS ====================
@@ -427,7 +458,8 @@ def verify_and_checkin(request):
         send_notification_to_guardian(
             matched_student,
             f"{matched_student.user.get_full_name()} has boarded bus {bus.registration_number}",
-            'boarded'
+            'boarded',
+            bus=bus
         )
         
         return JsonResponse({
@@ -482,7 +514,8 @@ def verify_and_checkout(request):
         send_notification_to_guardian(
             matched_student,
             f"{matched_student.user.get_full_name()} has alighted from bus {bus.registration_number}",
-            'alighted'
+            'alighted',
+            bus=bus
         )
         
         return JsonResponse({
@@ -496,99 +529,23 @@ def verify_and_checkout(request):
 
 # ==================== NOTIFICATION VIEWS ====================
 
-def send_notification_to_guardian(student, message, notification_type):
+def send_notification_to_guardian(student, message, notification_type, bus=None):
     """
     Send notification to student's guardian
-    Supports: Email, SMS (via Twilio), and Push Notifications (via Firebase)
+    The Notification row and its email/SMS/push outbox entries are written in
+    one transaction; delivery happens in the background dispatcher
+    (python manage_app.py dispatch_notifications).
     """
-    guardian = student.guardian
-    
-    if not guardian:
-        return
-    
-    # Create notification in database
-    notification = Notification.objects.create(
-        recipient=guardian,
-        student=student,
-        title=f"Student Transportation Alert",
-        message=message,
-        notification_type=notification_type
-    )
-    
-    # Send email
-    send_email_notification(guardian, message)
-    
-    # Send SMS (optional)
-    if guardian.profile.phone_number:
-        send_sms_notification(guardian.profile.phone_number, message)
-    
-    # Send push notification if FCM token exists
-    if notification.fcm_token:
-        send_push_notification(notification.fcm_token, message)
+    return create_guardian_notification(student, message, notification_type, bus=bus)
 
 
-def send_email_notification(user, message):
-    """Send email notification"""
-    from django.core.mail import send_mail
-    
-    try:
-        send_mail(
-            'Student Transportation Alert',
-            message,
-            'noreply@safarisalama.com',
-            [user.email],
-            fail_silently=True,
-        )
-    except Exception as e:
-        print(f"Email notification error: {e}")
-
-
-def send_sms_notification(phone_number, message):
-    """
-    Send SMS notification using Twilio
-    Install: pip install twilio
-    """
-    try:
-        from twilio.rest import Client
-        
-        # Get Twilio credentials from environment
-        account_sid = 'YOUR_TWILIO_ACCOUNT_SID'
-        auth_token = 'YOUR_TWILIO_AUTH_TOKEN'
-        twilio_phone = 'YOUR_TWILIO_PHONE_NUMBER'
-        
-        client = Client(account_sid, auth_token)
-        message_obj = client.messages.create(
-            body=message[:160],  # SMS limit
-            from_=twilio_phone,
-            to=phone_number
-        )
-    except Exception as e:
-        print(f"SMS notification error: {e}")
-
-
-def send_push_notification(fcm_token, message):
-    """
-    Send push notification using Firebase Cloud Messaging
-    Install: pip install firebase-admin
-    """
-    try:
-        import firebase_admin
-        from firebase_admin import messaging
-        
-        message_obj = messaging.Message(
-            notification=messaging.Notification(
-                title='Student Transportation',
-                body=message
-            ),
-            token=fcm_token,
-        )
-        
-        response = messaging.send(message_obj)
-    except Exception as e:
-        print(f"Push notification error: {e}")
+def _notifications_etag(request):
+    return versions_etag(('notifications', request.user.id))
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_notifications_etag)
 def get_notifications(request):
     """Get user's notifications"""
     notifications = Notification.objects.filter(
@@ -616,6 +573,92 @@ def mark_notification_read(request, notification_id):
     return JsonResponse({'message': 'Notification marked as read'})
 
 
+# ==================== REAL-TIME STREAM ====================
+
+# Channel layer event type -> SSE event name. Boarded/alighted notifications
+# are additionally sent as 'checkin' events.
+SSE_EVENT_NAMES = {
+    'send_notification': 'notification',
+    'location_update': 'location',
+    'new_message': 'new_message',
+    'eta_update': 'eta',
+    'geofence_event': 'geofence',
+}
+CHECKIN_NOTIFICATION_TYPES = ('boarded', 'alighted')
+
+
+def _sse(event_name, payload):
+    return f"event: {event_name}\ndata: {json.dumps(payload, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def _guardian_events(groups):
+    """
+    Relay channel layer events for the given groups as Server-Sent Events.
+    The stream ends after SSE_MAX_DURATION seconds; EventSource reconnects
+    on its own, which also picks up changes in the guardian's buses.
+    """
+    channel_layer = get_channel_layer()
+    channel = await channel_layer.new_channel()
+    for group in groups:
+        await channel_layer.group_add(group, channel)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.SSE_MAX_DURATION
+
+    try:
+        yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+        while loop.time() < deadline:
+            try:
+                event = await asyncio.wait_for(channel_layer.receive(channel),
+                                               timeout=settings.SSE_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            event_name = SSE_EVENT_NAMES.get(event.get('type'))
+            if event_name is None:
+                continue
+
+            payload = {key: value for key, value in event.items() if key != 'type'}
+            yield _sse(event_name, payload)
+            if event_name == 'notification' and payload.get('notification_type') in CHECKIN_NOTIFICATION_TYPES:
+                yield _sse('checkin', payload)
+    finally:
+        for group in groups:
+            await channel_layer.group_discard(group, channel)
+
+
+def _guardian_stream_groups(request):
+    """Channel groups for the logged-in guardian, or None if not logged in"""
+    user = request.user
+    if not user.is_authenticated:
+        return None
+
+    bus_ids = Student.objects.filter(
+        guardian=user, bus__isnull=False
+    ).values_list('bus_id', flat=True).distinct()
+    return [user_group(user.id)] + [bus_group(bus_id) for bus_id in bus_ids]
+
+
+async def guardian_event_stream(request):
+    """
+    Server-Sent Events stream for guardians: bus positions, check-ins,
+    notifications and new messages over one long-lived connection.
+    Serve with Daphne (ASGI); replaces the dashboard/landing polling loops.
+    """
+    if request.method != 'GET':
+        return HttpResponse(status=405, headers={'Allow': 'GET'})
+
+    groups = await sync_to_async(_guardian_stream_groups)(request)
+    if groups is None:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    response = StreamingHttpResponse(_guardian_events(groups), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+
 # ==================== ADMIN VIEWS ====================
 
 @login_required
@@ -631,33 +674,256 @@ def admin_dashboard(request):
         'total_students': school.students.count(),
         'total_buses': school.buses.count(),
         'total_drivers': school.buses.values('driver').distinct().count(),
-        'today_attendance': StudentAttendance.objects.filter(
-            student__school=school,
+        'today_attendance': DailyAttendanceSummary.objects.filter(
+            school=school,
             date=timezone.now().date()
-        ).count()
+        ).aggregate(total=Sum(F('boarded') + F('alighted')))['total'] or 0
     }
     return render(request, 'admin/dashboard.html', context)
 
 
+def _visible_buses(user):
+    """
+    Buses whose live position, ETAs and trips a user may see: the bus they
+    drive or attend, buses carrying their children, and their school's buses
+    """
+    return Bus.objects.filter(
+        Q(driver=user) | Q(attendant=user) | Q(school__admin=user) |
+        Q(id__in=Student.objects.filter(guardian=user, bus__isnull=False).values('bus'))
+    )
+
+
+def _trip_history_scope(user):
+    """StudentAttendance visible to a driver (their bus) or guardian (their students)"""
+    role = getattr(getattr(user, 'profile', None), 'user_type', None)
+
+    if role == 'driver':
+        bus = Bus.objects.filter(driver=user).first()
+        if not bus:
+            return StudentAttendance.objects.none(), None
+        return StudentAttendance.objects.filter(bus=bus), bus
+
+    if role == 'guardian':
+        return StudentAttendance.objects.filter(student__guardian=user), None
+
+    return None, None
+
+
 @login_required
 def driver_trip_history(request):
-    """Driver trip history (shows StudentAttendance entries for the driver's bus)"""
-    driver = request.user
-    bus = Bus.objects.filter(driver=driver).first()
+    """Driver trip history (shows StudentAttendance entries for the driver's bus), newest first"""
+    trips, bus = _trip_history_scope(request.user)
     if not bus:
         return render(request, 'driver/trip_history.html', {'trips': []})
 
-    trips = StudentAttendance.objects.filter(bus=bus).select_related('student').order_by('-timestamp')[:100]
-    return render(request, 'driver/trip_history.html', {'trips': trips, 'bus': bus})
+    try:
+        page, next_cursor = paginate(
+            trips.select_related('student__user'),
+            cursor=request.GET.get('cursor'),
+            page_size=settings.TRIP_HISTORY_PAGE_SIZE
+        )
+    except InvalidCursor:
+        return redirect('driver_trips')
+
+    return render(request, 'driver/trip_history.html', {
+        'trips': page,
+        'bus': bus,
+        'bus_trips': BusTrip.objects.filter(bus=bus)[:settings.TRIP_SUMMARY_COUNT],
+        'next_cursor': next_cursor,
+        'paged': bool(request.GET.get('cursor')),
+    })
 
 
 @login_required
 def guardian_trip_history(request):
-    """Guardian trip history (shows StudentAttendance entries for guardian's students)"""
-    guardian = request.user
-    students = Student.objects.filter(guardian=guardian)
-    trips = StudentAttendance.objects.filter(student__in=students).select_related('student', 'bus').order_by('-timestamp')[:100]
-    return render(request, 'guardian/trip_history.html', {'trips': trips})
+    """Guardian trip history (shows StudentAttendance entries for guardian's students), newest first"""
+    try:
+        page, next_cursor = paginate(
+            StudentAttendance.objects.filter(
+                student__guardian=request.user
+            ).select_related('student__user', 'bus'),
+            cursor=request.GET.get('cursor'),
+            page_size=settings.TRIP_HISTORY_PAGE_SIZE
+        )
+    except InvalidCursor:
+        return redirect('guardian_trips')
+
+    bus_trips = BusTrip.objects.filter(
+        bus__in=Student.objects.filter(guardian=request.user).values('bus')
+    ).select_related('bus')[:settings.TRIP_SUMMARY_COUNT]
+
+    return render(request, 'guardian/trip_history.html', {
+        'trips': page,
+        'bus_trips': bus_trips,
+        'next_cursor': next_cursor,
+        'paged': bool(request.GET.get('cursor')),
+    })
+
+
+TRIP_FIELDS = (
+    'id', 'status', 'timestamp', 'date', 'biometric_verified', 'student_id',
+    'student__user__first_name', 'student__user__last_name',
+    'bus_id', 'bus__registration_number',
+)
+
+
+def _stream_trips(trips):
+    """JSON document written row by row from a server-side cursor"""
+    yield '{"success": true, "trips": ['
+    for i, row in enumerate(trips.iterator(chunk_size=settings.TRIP_STREAM_CHUNK_SIZE)):
+        trip = {
+            'id': row['id'],
+            'student_id': row['student_id'],
+            'student_name': f"{row['student__user__first_name']} {row['student__user__last_name']}".strip(),
+            'bus_id': row['bus_id'],
+            'bus': row['bus__registration_number'],
+            'status': row['status'],
+            'biometric_verified': row['biometric_verified'],
+            'date': row['date'],
+            'timestamp': row['timestamp'],
+        }
+        yield (',' if i else '') + json.dumps(trip, cls=DjangoJSONEncoder)
+    yield ']}'
+
+
+@login_required
+@require_http_methods(["GET"])
+def trip_history_api(request):
+    """
+    Trip history for the logged-in driver or guardian as JSON, newest first.
+    With `start`/`end` (YYYY-MM-DD) the whole range is streamed; otherwise
+    one page is returned with a `next_cursor` for the following page.
+    """
+    trips, _ = _trip_history_scope(request.user)
+    if trips is None:
+        return JsonResponse({'success': False, 'error': 'Only drivers and guardians have trip history'}, status=403)
+
+    start = request.GET.get('start')
+    end = request.GET.get('end')
+
+    try:
+        if start or end:
+            if start:
+                trips = trips.filter(date__gte=start)
+            if end:
+                trips = trips.filter(date__lte=end)
+            rows = trips.order_by('-timestamp', '-id').values(*TRIP_FIELDS)
+            return StreamingHttpResponse(async_lines(_stream_trips(rows), settings.TRIP_STREAM_CHUNK_SIZE),
+                                         content_type='application/json')
+
+        page, next_cursor = paginate(
+            trips.select_related('student__user', 'bus'),
+            cursor=request.GET.get('cursor'),
+            page_size=settings.TRIP_HISTORY_PAGE_SIZE
+        )
+    except (InvalidCursor, ValidationError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'trips': [{
+            'id': trip.id,
+            'student_id': trip.student_id,
+            'student_name': trip.student.user.get_full_name(),
+            'bus_id': trip.bus_id,
+            'bus': trip.bus.registration_number if trip.bus else None,
+            'status': trip.status,
+            'biometric_verified': trip.biometric_verified,
+            'date': trip.date,
+            'timestamp': trip.timestamp,
+        } for trip in page],
+        'next_cursor': next_cursor,
+    })
+
+
+def _bus_trip_summary(trip):
+    return {
+        'id': trip.id,
+        'started_at': trip.started_at,
+        'ended_at': trip.ended_at,
+        'end_reason': trip.end_reason or None,
+        'start': {'latitude': trip.start_latitude, 'longitude': trip.start_longitude},
+        'end': {'latitude': trip.last_latitude, 'longitude': trip.last_longitude},
+        'distance_m': round(trip.distance_m, 1),
+        'duration_seconds': trip.duration_seconds,
+        'max_speed_kmh': round(trip.max_speed_kmh, 1),
+        'stop_count': trip.stop_count,
+        'dwell_seconds': trip.dwell_seconds,
+        'stops': [{
+            'route_stop_id': stop.route_stop_id,
+            'route_stop': stop.route_stop.name if stop.route_stop else None,
+            'latitude': stop.latitude,
+            'longitude': stop.longitude,
+            'started_at': stop.started_at,
+            'duration_seconds': stop.duration_seconds,
+        } for stop in trip.stops.all()],
+    }
+
+
+@login_required
+@require_http_methods(["GET"])
+def bus_trips_api(request, bus_id):
+    """
+    Segmented trips of a bus (summaries and their stops), newest first, one
+    page per cursor. Only for the bus's crew, guardians and school admin.
+    """
+    if not _visible_buses(request.user).filter(id=bus_id).exists():
+        return JsonResponse({'success': False, 'error': 'Bus not found'}, status=404)
+
+    try:
+        page, next_cursor = paginate(
+            BusTrip.objects.filter(bus_id=bus_id).prefetch_related('stops__route_stop'),
+            cursor=request.GET.get('cursor'),
+            page_size=settings.TRIP_HISTORY_PAGE_SIZE,
+            field='started_at'
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'trips': [_bus_trip_summary(trip) for trip in page],
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+@require_http_methods(["GET", "POST"])
+def request_metrics_report(request):
+    """
+    Per-view latency percentiles collected by RequestMetricsMiddleware in this
+    worker process (admin only). POST clears them.
+    """
+    if request.user.profile.user_type != 'admin':
+        return JsonResponse({'success': False, 'error': 'Admins only'}, status=403)
+
+    if request.method == 'POST':
+        reset_request_metrics()
+        return JsonResponse({'success': True, 'views': []})
+
+    return JsonResponse({
+        'success': True,
+        'slow_threshold_ms': settings.REQUEST_SLOW_MS,
+        'views': request_metrics(),
+    })
+
+
+@require_http_methods(["GET"])
+def metrics_endpoint(request):
+    """
+    Request and WebSocket metrics of this worker in the Prometheus text format.
+    Scrapers send `Authorization: Bearer <METRICS_TOKEN>`; school admins can
+    open it from a logged-in session.
+    """
+    token = settings.METRICS_TOKEN
+    header = request.headers.get('Authorization', '')
+    authorized = bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+    if not authorized:
+        profile = getattr(request.user, 'profile', None) if request.user.is_authenticated else None
+        if getattr(profile, 'user_type', None) != 'admin':
+            return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+
+    return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 @login_required
@@ -870,14 +1136,69 @@ def view_attendance_reports(request):
         return redirect('login')
     
     school = School.objects.get(admin=request.user)
-    date = request.GET.get('date', timezone.now().date())
+    try:
+        report_date = date.fromisoformat(request.GET['date']) if request.GET.get('date') else timezone.localdate()
+        bus_id = int(request.GET['bus']) if request.GET.get('bus') else None
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    # One row per bus from the maintained daily summary, plus, today, buses
+    # where nobody has boarded yet (their whole roster is absent)
+    summaries = school_day_summaries(school, report_date)
+    totals = {
+        field: sum(getattr(summary, field) for summary in summaries)
+        for field in ('enrolled', 'boarded', 'alighted', 'absent', 'biometric_failures')
+    }
+    
+    # Individual events are only loaded when a single bus is requested
+    attendance = StudentAttendance.objects.none()
+    if bus_id:
+        attendance = StudentAttendance.objects.filter(
+            student__school=school,
+            bus_id=bus_id,
+            date=report_date
+        ).select_related('student__user', 'bus')
+    
+    return render(request, 'admin/attendance_reports.html', {
+        'school': school,
+        'date': report_date,
+        'summaries': summaries,
+        'totals': totals,
+        'attendance': attendance,
+    })
+
+
+@login_required
+@require_http_methods(["GET"])
+def export_attendance_report(request):
+    """
+    Stream the school's attendance for a date range as CSV or NDJSON (admin only)
+    Query: start, end (YYYY-MM-DD, default today), format (csv|ndjson), bus
+    """
+    if request.user.profile.user_type != 'admin':
+        return redirect('login')
+    
+    school = School.objects.get(admin=request.user)
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'success': False, 'error': f'Unsupported format: {export_format}'}, status=400)
     
-    attendance = StudentAttendance.objects.filter(
-        student__school=school,
-        date=date
-    ).select_related('student', 'bus')
+    try:
+        today = timezone.now().date()
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else today
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else today
+        bus_id = int(request.GET['bus']) if request.GET.get('bus') else None
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
     
-    return render(request, 'admin/attendance_reports.html', {'attendance': attendance})
+    if start > end:
+        return JsonResponse({'success': False, 'error': 'start must not be after end'}, status=400)
+    
+    rows = attendance_export_rows(start, end, school=school, bus_id=bus_id)
+    response = StreamingHttpResponse(async_lines(export_lines(rows, export_format), settings.EXPORT_CHUNK_SIZE),
+                                     content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="attendance_{start}_{end}.{export_format}"'
+    return response
 
 
 # ==================== BIOMETRIC VIEWS ====================
@@ -1050,44 +1371,81 @@ def send_message(request):
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
+def _messages_etag(request):
+    return versions_etag(('messages', request.user.id), extra=request.GET.urlencode())
+
+
 @login_required
 @require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_messages_etag)
 def get_messages(request):
-    """Get conversation with a specific user"""
+    """
+    Get conversation with a specific user, one page at a time.
+    Without a cursor the latest page is returned. `since_id` returns messages
+    newer than that id (for polling) and `before_id` the page before it (for
+    scrolling back). Only messages in the returned page are marked as read.
+    """
     try:
         recipient_id = request.GET.get('recipient_id')
         
         if not recipient_id:
             return JsonResponse({'success': False, 'error': 'Recipient not specified'}, status=400)
         
+        try:
+            since_id = int(request.GET['since_id']) if request.GET.get('since_id') else None
+            before_id = int(request.GET['before_id']) if request.GET.get('before_id') else None
+            limit = int(request.GET.get('limit', settings.MESSAGES_PAGE_SIZE))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid cursor or limit'}, status=400)
+        
+        limit = max(1, min(limit, settings.MESSAGES_MAX_PAGE_SIZE))
+        
         from .models import Message
         
-        # Get all messages between current user and recipient
-        messages = Message.objects.filter(
+        conversation = Message.objects.filter(
             Q(sender=request.user, recipient_id=recipient_id) |
             Q(sender_id=recipient_id, recipient=request.user)
-        ).order_by('timestamp')
+        ).select_related('sender')
         
-        # Mark received messages as read
-        unread_messages = messages.filter(recipient=request.user, is_read=False)
-        unread_messages.update(is_read=True, read_at=timezone.now())
+        # Fetch one extra row to know whether another page exists
+        if since_id is not None:
+            page = list(conversation.filter(id__gt=since_id).order_by('id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit]
+        else:
+            if before_id is not None:
+                conversation = conversation.filter(id__lt=before_id)
+            page = list(conversation.order_by('-id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit][::-1]
+        
+        # Mark received messages in this page as read
+        unread_ids = {msg.id for msg in page if msg.recipient_id == request.user.id and not msg.is_read}
+        if unread_ids:
+            Message.objects.filter(id__in=unread_ids).update(is_read=True, read_at=timezone.now())
+            # The other side's view of these messages changed (bulk update sends no signals)
+            bump_version('messages', int(recipient_id))
         
         # Serialize messages
         message_list = []
-        for msg in messages:
+        for msg in page:
             message_list.append({
                 'id': msg.id,
-                'sender_id': msg.sender.id,
+                'sender_id': msg.sender_id,
                 'sender_name': msg.sender.get_full_name(),
-                'recipient_id': msg.recipient.id,
+                'recipient_id': msg.recipient_id,
                 'message_text': msg.message_text,
                 'timestamp': msg.timestamp.isoformat(),
-                'is_read': msg.is_read
+                'is_read': msg.is_read or msg.id in unread_ids
             })
         
         return JsonResponse({
             'success': True,
-            'messages': message_list
+            'messages': message_list,
+            'has_more': has_more,
+            'oldest_id': page[0].id if page else before_id,
+            'newest_id': page[-1].id if page else since_id
         })
     
     except Exception as e:
@@ -1096,6 +1454,28 @@ def get_messages(request):
 
 @login_required
 @require_http_methods(["GET"])
+def get_bus_eta(request, bus_id):
+    """Estimated arrival times at the bus's remaining stops (crew, guardians and school admin only)"""
+    if not _visible_buses(request.user).filter(id=bus_id).exists():
+        return JsonResponse({'success': False, 'error': 'Bus not found'}, status=404)
+    
+    eta = get_bus_eta_data(bus_id)
+    if eta is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'No ETA available (no active route or no recent GPS fix)'
+        }, status=404)
+    return JsonResponse({'success': True, 'eta': eta})
+
+
+def _bus_attendant_etag(request, bus_id):
+    return versions_etag(('bus', bus_id))
+
+
+@login_required
+@require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_bus_attendant_etag)
 def get_bus_attendant(request, bus_id):
     """Get attendant information for a bus"""
     try:
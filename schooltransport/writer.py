@@ -0,0 +1,168 @@
+"""
+Single Database Writer
+One background thread owns all writes submitted to it. Async consumers
+hand it a function and await the result instead of running the write on
+whichever database_sync_to_async thread is free, so concurrent GPS fixes and
+check-ins queue in memory rather than fighting over SQLite's write lock.
+
+Writes waiting in the queue are committed together: each batch of up to
+DATABASE_WRITE_BATCH functions runs in one transaction, with a savepoint per
+function so one failing write does not undo the others. on_commit callbacks
+(geofence, ETA, trip segmentation, channel layer publishing) are taken off
+the writer after the commit: for writes awaited with run_write() they run in
+order on a separate hook thread, scheduled from the caller's event loop so
+their group_send() calls go back through that loop and wake its receivers.
+Writes submitted from synchronous code run their hooks on the writer thread.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# One thread, so the hooks of consecutive fixes run in commit order
+_hook_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='database-writer-hooks')
+_hook_tasks = set()  # Keeps scheduled hook tasks referenced until they finish
+
+
+def run_hooks(hooks):
+    """Run on_commit callbacks, logging failures like robust=True would"""
+    for _, func, _ in hooks:
+        try:
+            func()
+        except Exception as e:
+            logger.error(f"Error in on_commit hook {func!r}: {e}")
+
+
+run_hooks_async = database_sync_to_async(run_hooks, thread_sensitive=False, executor=_hook_executor)
+
+
+def _start_hooks(hooks):
+    """Event loop side of dispatch_hooks(): run the hooks on the hook thread"""
+    task = asyncio.ensure_future(run_hooks_async(hooks))
+    _hook_tasks.add(task)
+    task.add_done_callback(_hook_tasks.discard)
+
+
+def dispatch_hooks(loop, hooks):
+    """Hand committed on_commit callbacks back to the event loop that submitted the write"""
+    if loop is not None:
+        try:
+            loop.call_soon_threadsafe(_start_hooks, hooks)
+            return
+        except RuntimeError:
+            pass  # The loop has closed; nothing is waiting for the events
+    run_hooks(hooks)
+
+
+class DatabaseWriter:
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.DATABASE_WRITE_BATCH
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='database-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(*args, **kwargs); returns a concurrent.futures.Future"""
+        return self.submit_from(None, func, *args, **kwargs)
+
+    def submit_from(self, loop, func, /, *args, **kwargs):
+        """submit() whose on_commit callbacks are dispatched through `loop`"""
+        future = Future()
+        self.queue.put((future, loop, func, args, kwargs))
+        return future
+
+    def stop(self, timeout=None):
+        """Finish queued writes, close the thread's connection and exit"""
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+
+    def depth(self):
+        return self.queue.qsize()
+
+    def _run(self):
+        try:
+            while True:
+                batch = [self.queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                stop = _STOP in batch
+                self._write([item for item in batch if item is not _STOP])
+                if stop:
+                    return
+        finally:
+            connection.close()
+
+    def _write(self, batch):
+        batch = [item for item in batch if item[0].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for future, loop, func, args, kwargs in batch:
+                    registered = len(connection.run_on_commit)
+                    try:
+                        with transaction.atomic():
+                            result = func(*args, **kwargs)
+                        error = None
+                    except Exception as e:
+                        # The savepoint rollback has dropped this write's hooks
+                        result, error = None, e
+                    outcomes.append((future, loop, result, error, connection.run_on_commit[registered:]))
+                # Taken before the commit so Django does not run them here
+                connection.run_on_commit = []
+        except Exception as e:
+            # The commit itself failed: nothing in the batch was written
+            logger.error(f"Database writer batch of {len(batch)} failed: {e}")
+            connection.close()
+            outcomes = [(item[0], item[1], None, e, []) for item in batch]
+
+        for future, loop, result, error, hooks in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+            if hooks:
+                dispatch_hooks(loop, hooks)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """The process-wide writer, started on first use"""
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.thread.is_alive():
+            _writer = DatabaseWriter()
+        return _writer
+
+
+def stop_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.stop()
+            _writer = None
+
+
+async def run_write(func, *args, **kwargs):
+    """Await func(*args, **kwargs) on the writer thread"""
+    loop = asyncio.get_running_loop()
+    return await asyncio.wrap_future(get_writer().submit_from(loop, func, *args, **kwargs))